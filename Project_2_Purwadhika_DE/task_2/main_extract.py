@@ -1,4 +1,18 @@
+# Startup budget: import < 0.4 s (python -X importtime -c "import main_extract").
+# Import tidak boleh membuka koneksi DB atau memuat pandas/pyarrow/bs4; modul berat
+# di-import di stage yang memakainya. Sebelumnya ~1.1 s, sekarang ~0.25-0.3 s.
+import argparse
 from src.extract_and_load import Extractor
 
 if __name__ == "__main__":
-    Extractor().run_pipeline()
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--backfill", nargs=2, metavar=("START_MONTH", "END_MONTH"),
+                        help="Backfill rentang bulan YYYY-MM YYYY-MM (inklusif)")
+    parser.add_argument("--full-rebuild", action="store_true", default=None,
+                        help="Rebuild clean table dari seluruh RAW (default: incremental dari watermark)")
+    args = parser.parse_args()
+
+    if args.backfill:
+        Extractor().run_backfill(*args.backfill, full_rebuild=args.full_rebuild)
+    else:
+        Extractor().run_pipeline(full_rebuild=args.full_rebuild)
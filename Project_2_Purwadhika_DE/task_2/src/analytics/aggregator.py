@@ -9,7 +9,6 @@ from .discord_notifier import DiscordNotifier
 from .db_utils import DBUtils
 from .config import Settings
 from sqlalchemy import text
-import pandas as pd
 
 class Aggregator:
     """
@@ -75,20 +74,21 @@ class Aggregator:
         PartitionManager.create_nested_partition(clean_table, pickup_col, color, next_date)
         PartitionInserter.insert_daily(clean_table, pickup_col, color, date_str)
 
-        # Aggregate tables
+        # Aggregate tables (filter range per hari → hanya partisi bulan tersebut yang dibaca)
+        day_filter = DBUtils.day_filter(pickup_col, date_str)
         tables = {
             f"{color}_total_trips": f"""
                 SELECT DISTINCT
                     '{date_str}'::date AS date,
                     COUNT(*) OVER () AS total_trips
                 FROM {Settings.SCHEMA_CLEAN}.{clean_table}
-                WHERE {pickup_col}::date = '{date_str}';
+                WHERE {day_filter};
             """,
             f"{color}_total_revenue": f"""
                 WITH daily AS (
                     SELECT (fare_amount + total_amount) AS full_revenue
                     FROM {Settings.SCHEMA_CLEAN}.{clean_table}
-                    WHERE {pickup_col}::date = '{date_str}'
+                    WHERE {day_filter}
                 )
                 SELECT
                     '{date_str}'::date AS date,
@@ -100,7 +100,7 @@ class Aggregator:
                     '{date_str}'::date AS date,
                     AVG(fare_amount) AS avg_fare
                 FROM {Settings.SCHEMA_CLEAN}.{clean_table}
-                WHERE {pickup_col}::date = '{date_str}';
+                WHERE {day_filter};
             """
         }
         aggregates = {}
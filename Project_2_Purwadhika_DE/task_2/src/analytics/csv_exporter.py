@@ -1,5 +1,4 @@
 import os
-import pandas as pd
 from .db_utils import DBUtils
 from .config import Settings
 
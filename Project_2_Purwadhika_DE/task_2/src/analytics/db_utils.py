@@ -1,5 +1,4 @@
 from sqlalchemy import create_engine, text
-import pandas as pd
 from .config import Settings
 from .logger import Logger
 
@@ -22,7 +21,21 @@ class DBUtils:
     engine = engine
 
     @staticmethod
-    def read_sql(sql: str) -> pd.DataFrame:
+    def day_filter(date_col: str, date_str: str) -> str:
+        """
+        Predicate satu hari sebagai range pada kolom timestamp.
+
+        Behavior:
+        - Pengganti "{date_col}::date = '{date_str}'": range pada kolom asli bisa memakai
+          index pickup dan partition pruning clean table (partisi per bulan).
+
+        Returns:
+        - str: "{date_col} >= 'YYYY-MM-DD' AND {date_col} < 'YYYY-MM-DD'::date + 1"
+        """
+        return f"{date_col} >= '{date_str}' AND {date_col} < '{date_str}'::date + 1"
+
+    @staticmethod
+    def read_sql(sql: str) -> "pd.DataFrame":
         """
         Eksekusi query SELECT dan kembalikan hasil sebagai DataFrame.
 
@@ -36,6 +49,7 @@ class DBUtils:
         Returns:
         - pd.DataFrame: Hasil query, kosong jika error.
         """
+        import pandas as pd  # hanya stage export yang membaca ke DataFrame
         try:
             df = pd.read_sql(sql, DBUtils.engine)
             return df
@@ -77,19 +91,19 @@ class DBUtils:
                 last_date = None
 
             max_date_clean = conn.execute(
-                text(f"SELECT MAX({date_col}::date) FROM {Settings.SCHEMA_CLEAN}.{clean_table}")
+                text(f"SELECT MAX({date_col})::date FROM {Settings.SCHEMA_CLEAN}.{clean_table}")
             ).scalar()
 
             if not last_date:
                 next_date = conn.execute(
-                    text(f"SELECT MIN({date_col}::date) FROM {Settings.SCHEMA_CLEAN}.{clean_table}")
+                    text(f"SELECT MIN({date_col})::date FROM {Settings.SCHEMA_CLEAN}.{clean_table}")
                 ).scalar()
             else:
                 next_date = conn.execute(
                     text(f"""
-                        SELECT MIN({date_col}::date)
+                        SELECT MIN({date_col})::date
                         FROM {Settings.SCHEMA_CLEAN}.{clean_table}
-                        WHERE {date_col}::date > :last
+                        WHERE {date_col} >= CAST(:last AS date) + 1
                     """),
                     {"last": last_date}
                 ).scalar()
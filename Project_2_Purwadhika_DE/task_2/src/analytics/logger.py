@@ -1,14 +1,9 @@
 import os
 from datetime import datetime
 import sys
-import io
 
-# Pastikan stdout menggunakan UTF-8
-sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
-
-# Lokasi file log
+# Lokasi file log (folder dibuat saat log pertama kali ditulis)
 LOG_FILE = "resources/logs/analytics.log"
-os.makedirs(os.path.dirname(LOG_FILE), exist_ok=True)
 
 class Logger:
     """
@@ -45,5 +40,6 @@ class Logger:
             print(line.encode(sys.stdout.encoding, errors='replace').decode(sys.stdout.encoding))
 
         # Simpan ke file log
+        os.makedirs(os.path.dirname(LOG_FILE), exist_ok=True)
         with open(LOG_FILE, "a", encoding="utf-8") as f:
             f.write(line + "\n")
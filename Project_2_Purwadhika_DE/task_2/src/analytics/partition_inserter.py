@@ -17,7 +17,8 @@ class PartitionInserter:
         - date_str (str): Tanggal yang diproses, format 'YYYY-MM-DD'.
 
         Behavior:
-        - Insert semua baris dari tabel clean yang memiliki pickup_col = date_str
+        - Insert semua baris dari tabel clean dengan pickup_col di tanggal date_str
+          (range predicate, lihat DBUtils.day_filter)
           ke parent partition table {color}_partitioned di schema aggregate.
         - Commit otomatis via SQLAlchemy engine.
         - Log status sukses atau error.
@@ -30,7 +31,7 @@ class PartitionInserter:
             INSERT INTO {partition_table} 
             SELECT *
             FROM {Settings.SCHEMA_CLEAN}.{clean_table}
-            WHERE {pickup_col}::date = '{date_str}'
+            WHERE {DBUtils.day_filter(pickup_col, date_str)}
         """
         try:
             with DBUtils.engine.begin() as conn:
@@ -1,6 +1,5 @@
-from datetime import datetime
+from datetime import datetime, timedelta
 from calendar import monthrange
-import pandas as pd
 from sqlalchemy import text
 from .logger import Logger
 from .db_utils import DBUtils
@@ -31,12 +30,13 @@ class PartitionManager:
         """
         partition_table = f"{Settings.SCHEMA_AGGREGATE}.{color}_partitioned"
 
-        # Parent
+        # Parent (tanpa index: unique index trip clean tidak bisa dipakai dengan partition key
+        # ekspresi DATE_TRUNC; index ada di monthly child)
         try:
             with DBUtils.engine.begin() as conn:
                 create_parent_sql = f"""
                     CREATE TABLE IF NOT EXISTS {partition_table} (
-                        LIKE {Settings.SCHEMA_CLEAN}.{clean_table} INCLUDING ALL
+                        LIKE {Settings.SCHEMA_CLEAN}.{clean_table} INCLUDING ALL EXCLUDING INDEXES
                     ) PARTITION BY RANGE (DATE_TRUNC('month', {pickup_col}));
                 """
                 conn.execute(text(create_parent_sql))
@@ -74,7 +74,7 @@ class PartitionManager:
                     attach_month_sql = f"""
                         ALTER TABLE {partition_table}
                         ATTACH PARTITION {month_child}
-                        FOR VALUES FROM ('{month_start}') TO ('{month_end + pd.Timedelta(days=1)}');
+                        FOR VALUES FROM ('{month_start}') TO ('{month_end + timedelta(days=1)}');
                     """
                     conn.execute(text(attach_month_sql))
                     Logger.log(f"Monthly child {month_child} attached")
@@ -83,7 +83,7 @@ class PartitionManager:
 
         # Daily child
         day_start = next_date
-        day_end = day_start + pd.Timedelta(days=1)
+        day_end = day_start + timedelta(days=1)
         day_child = f"{month_child}_{day_start.strftime('%d')}"
         try:
             with DBUtils.engine.begin() as conn:
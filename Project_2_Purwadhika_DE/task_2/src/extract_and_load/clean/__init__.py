@@ -1,11 +1,16 @@
-from . import logger
-from . import config
-from . import db_utils
-from . import cleaner
+import importlib
 
+# Submodule di-import saat pertama kali diakses (misal raw.uploader), sehingga
+# import package ini tidak memuat pandas/pyarrow/sqlalchemy.
 __all__ = [
     "logger",
     "config",
     "db_utils",
     "cleaner",
 ]
+
+
+def __getattr__(name):
+    if name in __all__:
+        return importlib.import_module(f".{name}", __name__)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,62 +1,281 @@
+import re
+import time
+from datetime import date
+from psycopg2 import errors as pg_errors
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE
 from .logger import log
-from .config import SCHEMA_RAW, SCHEMA_CLEAN
+from .config import (
+    SCHEMA_RAW, SCHEMA_CLEAN, CLEAN_FULL_REBUILD, CLEAN_WORK_MEM,
+    CLEAN_RETENTION_START, CLEAN_RETENTION_MONTHS, CLEAN_SWAP_LOCK_TIMEOUT, CLEAN_SWAP_RETRIES,
+    CLEAN_INDEX_INCLUDE, CLEAN_PICKUP_BRIN, CLEAN_MAINTENANCE_WORK_MEM, CLEAN_INDEX_EXPLAIN
+)
 from .db_utils import get_connection
 
-def clean_tripdata(src_table, pickup_col, dropoff_col):
+def clean_tripdata(src_table, pickup_col, dropoff_col, full_rebuild=None):
     """
     Jalankan proses cleaning dari RAW → CLEAN untuk tripdata NYC Taxi.
 
-    Steps:
-    1. Drop old clean table dan materialized view.
-    2. Insert data ke clean table (hanya 2024-2025) dengan kolom tracking.
-    3. Hapus duplicate.
-    4. Buat index.
-    5. Buat materialized view.
+    Clean table dipartisi RANGE per bulan pada kolom pickup ({src_table}_clean_YYYYMM)
+    dan hanya berisi pickup di retention window (lihat retention_window).
+
+    Steps (full rebuild, di shadow table {src_table}_shadow_*; tabel live tetap dibaca):
+    1. Buat shadow clean table berpartisi dan insert data retention window dengan kolom
+       tracking, duplicate dibuang saat insert (lihat build_clean_table). Jika gagal,
+       full rebuild dihentikan dan tabel live tidak berubah.
+    2. Buat index sesuai akses analytics (lihat create_indexes).
+    3. Buat dan isi shadow daily summary (lihat refresh_daily_summary).
+    4. Publish: swap shadow → live dan simpan watermark dalam satu transaksi singkat
+       (lihat swap_shadow).
+
+    Steps (incremental, default):
+    1. Buat index yang belum ada (sekali, lihat create_indexes), partisi bulan baru, dan
+       drop partisi di luar retention window.
+    2. Insert baris RAW dengan entry_time > watermark ke clean table yang sudah ada;
+       duplicate dilewati oleh unique index trip (ON CONFLICT DO NOTHING).
+    3. Hitung ulang daily summary hanya untuk tanggal yang mendapat baris baru, dan
+       majukan watermark (satu transaksi dengan 2).
+
+    {src_table}_mv adalah view biasa di atas {src_table}_daily_summary. Clean table,
+    summary dan view tidak pernah hilang atau setengah jadi bagi pembaca: incremental
+    berjalan dalam transaksi, full rebuild di-publish dengan rename swap.
 
     Parameters:
     - src_table (str): Nama tabel raw, misal "yellow_tripdata".
     - pickup_col (str): Nama kolom pickup datetime.
     - dropoff_col (str): Nama kolom dropoff datetime.
+    - full_rebuild (bool, optional): Paksa full rebuild. Default: CLEAN_FULL_REBUILD.
+      Full rebuild juga dipakai jika watermark belum ada atau clean table belum ada /
+      belum dipartisi (tabel lama).
 
     Returns: None
     """
+    if full_rebuild is None:
+        full_rebuild = CLEAN_FULL_REBUILD
     conn, cur = get_connection()
     raw_table = f'"{SCHEMA_RAW}"."{src_table}"'
     clean_table = f'"{SCHEMA_CLEAN}"."{src_table}_clean"'
     mview = f'"{SCHEMA_CLEAN}"."{src_table}_mv"'
+    summary = f'"{SCHEMA_CLEAN}"."{src_table}_daily_summary"'
+
+    window = retention_window()
 
     log(f"=== START CLEANING FROM RAW: {SCHEMA_RAW}.{src_table} ===")
+    log(f"Retention window: pickup in [{window[0]}, {window[1]})")
 
-    drop_clean_table_and_mview(cur, clean_table, mview)
-    insert_clean_table(cur, raw_table, clean_table, pickup_col, dropoff_col)
-    deduplicate_table(cur, clean_table, pickup_col, dropoff_col)
-    create_indexes(cur, clean_table, src_table, pickup_col)
-    create_materialized_view(cur, clean_table, mview, pickup_col, dropoff_col)
+    create_entry_time_index(cur, raw_table, src_table)
+    watermark = get_watermark(cur, src_table)
+    cur.execute("SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)", (clean_table,))
+    row = cur.fetchone()
+    clean_partitioned = row is not None and row[0] == "p"
+
+    if full_rebuild or watermark is None or not clean_partitioned:
+        if not full_rebuild:
+            log("No partitioned clean table or watermark yet, running full rebuild.")
+        last_entry_time = get_max_entry_time(cur, raw_table)
+        shadow = f"{src_table}_shadow"
+        shadow_table = f'"{SCHEMA_CLEAN}"."{shadow}_clean"'
+        shadow_summary = f'"{SCHEMA_CLEAN}"."{shadow}_daily_summary"'
+        drop_shadow(cur, shadow_table, shadow_summary)
+        if not build_clean_table(cur, raw_table, shadow_table, shadow, pickup_col, dropoff_col, window):
+            log(f"Full rebuild aborted, live clean table {clean_table} unchanged.", "ERROR")
+            return
+        create_indexes(cur, shadow_table, shadow, pickup_col, explain_before=False)
+        try:
+            create_summary_table(cur, shadow_table, shadow_summary, shadow, pickup_col, dropoff_col)
+            refresh_daily_summary(cur, shadow_table, shadow_summary, pickup_col, dropoff_col)
+            cur.execute(f"SELECT COUNT(*) FROM {shadow_table}")
+            rows = cur.fetchone()[0]
+            swap_shadow(cur, src_table, clean_table, summary, mview, shadow_summary, last_entry_time, rows)
+        except Exception as e:
+            cur.execute("ROLLBACK")
+            log(f"Error publishing shadow clean table (live table unchanged): {e}", "ERROR")
+    else:
+        try:
+            ensure_daily_summary(cur, clean_table, summary, mview, src_table, pickup_col, dropoff_col)
+        except Exception as e:
+            cur.execute("ROLLBACK")
+            log(f"Error creating daily summary: {e}", "ERROR")
+        create_indexes(cur, clean_table, src_table, pickup_col)
+        clean_incremental(cur, raw_table, clean_table, src_table, pickup_col, dropoff_col, watermark, window, summary)
 
     log(f"=== CLEANING DONE → {SCHEMA_CLEAN}.{src_table}_clean ===")
 
 
-def drop_clean_table_and_mview(cur, clean_table, mview):
-    """Drop table clean dan materialized view jika ada."""
+def add_months(month_start, months):
+    """Awal bulan month_start + months (months boleh negatif)."""
+    index = month_start.year * 12 + month_start.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def retention_window():
+    """
+    Retention window clean table sebagai range pickup [lower, upper).
+
+    Behavior:
+    - lower = CLEAN_RETENTION_START; jika CLEAN_RETENTION_MONTHS > 0, dinaikkan ke
+      awal bulan ke-N terakhir (termasuk bulan ini).
+    - upper = awal bulan depan (pickup di masa depan dianggap data rusak).
+
+    Returns:
+    - tuple: (lower, upper) sebagai datetime.date.
+    """
+    this_month = date.today().replace(day=1)
+    lower = date.fromisoformat(CLEAN_RETENTION_START)
+    if CLEAN_RETENTION_MONTHS > 0:
+        lower = max(lower, add_months(this_month, 1 - CLEAN_RETENTION_MONTHS))
+    return lower, add_months(this_month, 1)
+
+
+def partition_name(src_table, month_start):
+    """Nama partisi bulanan clean table, misal yellow_tripdata_clean_202501."""
+    return f"{src_table}_clean_{month_start:%Y%m}"
+
+
+def list_partitions(cur, table):
+    """Nama partisi (relname) yang ter-attach ke tabel berpartisi."""
+    cur.execute("""
+        SELECT c.relname
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = to_regclass(%s)
+    """, (table,))
+    return {row[0] for row in cur.fetchall()}
+
+
+def index_exists(cur, schema, name):
+    """True jika index schema.name sudah ada (cek katalog, tanpa lock di tabel)."""
+    cur.execute("SELECT to_regclass(%s) IS NOT NULL", (f'"{schema}"."{name}"',))
+    return cur.fetchone()[0]
+
+
+def create_month_partitions(cur, clean_table, src_table, window):
+    """
+    Buat partisi bulanan clean table untuk retention window yang belum ada.
+
+    Behavior:
+    - Partisi yang ada dibaca dari pg_inherits; jika lengkap, tidak ada DDL (jalur
+      incremental steady state tidak mengambil lock di clean table).
+
+    Returns: None
+    """
+    existing = list_partitions(cur, clean_table)
+    month_start, upper = window[0].replace(day=1), window[1]
+    created = 0
+    while month_start < upper:
+        next_month = add_months(month_start, 1)
+        name = partition_name(src_table, month_start)
+        if name not in existing:
+            cur.execute(f"""
+                CREATE TABLE IF NOT EXISTS "{SCHEMA_CLEAN}"."{name}"
+                PARTITION OF {clean_table} FOR VALUES FROM ('{month_start}') TO ('{next_month}');
+            """)
+            created += 1
+        month_start = next_month
+    if created:
+        log(f"Clean partitions created: {created} months ({window[0]:%Y-%m} .. {add_months(upper, -1):%Y-%m}).")
+
+
+def drop_expired_partitions(cur, clean_table, src_table, window):
+    """
+    Drop partisi bulanan yang seluruhnya di luar retention window.
+
+    Behavior:
+    - Retention cukup DROP TABLE partisi (tanpa DELETE dan tanpa dead tuple).
+    - Partisi yang sebagian masih di dalam window dipertahankan.
+
+    Returns:
+    - int: Jumlah baris yang ikut ter-drop.
+    """
+    pattern = re.compile(rf"^{re.escape(src_table)}_clean_(\d{{4}})(\d{{2}})$")
+    dropped = 0
+    for relname in sorted(list_partitions(cur, clean_table)):
+        match = pattern.match(relname)
+        if not match:
+            continue
+        month_start = date(int(match.group(1)), int(match.group(2)), 1)
+        if add_months(month_start, 1) <= window[0]:
+            partition = f'"{SCHEMA_CLEAN}"."{relname}"'
+            cur.execute(f"SELECT COUNT(*) FROM {partition}")
+            rows = cur.fetchone()[0]
+            cur.execute(f"DROP TABLE {partition}")
+            log(f"Retention: dropped partition {relname} ({rows:,} rows).")
+            dropped += rows
+    return dropped
+
+
+def create_entry_time_index(cur, raw_table, src_table):
+    """
+    Buat BRIN index entry_time di RAW table (jika belum ada).
+
+    Behavior:
+    - entry_time naik seiring urutan load (append), sehingga BRIN kecil dan cukup
+      untuk membaca hanya block yang di-load setelah watermark.
+    - Pada RAW table yang dipartisi, index diturunkan ke semua partisi.
+    - Jika index sudah ada, tidak ada DDL (CREATE INDEX IF NOT EXISTS tetap mengambil
+      SHARE lock di RAW table).
+    """
+    if index_exists(cur, SCHEMA_RAW, f"idx_{src_table}_entry_time_brin"):
+        return
     try:
-        log("Dropping existing clean table & mview...")
-        cur.execute(f"DROP MATERIALIZED VIEW IF EXISTS {mview}")
-        cur.execute(f"DROP TABLE IF EXISTS {clean_table} CASCADE")
-        log("✓ Old clean table and materialized view removed.")
+        cur.execute(f"""
+            CREATE INDEX IF NOT EXISTS idx_{src_table}_entry_time_brin
+            ON {raw_table} USING brin (entry_time);
+        """)
     except Exception as e:
-        log(f"Error dropping clean table/mview: {e}", "ERROR")
+        log(f"Error creating entry_time index on {raw_table}: {e}", "WARNING")
 
 
-def insert_clean_table(cur, raw_table, clean_table, pickup_col, dropoff_col):
-    """Insert data ke clean table dengan kolom tracking (entry_time, load_date)."""
-    try:
-        log("Processing & inserting into clean table...")
-        clean_sql = f"""
-            CREATE TABLE {clean_table} AS
+def get_watermark(cur, src_table):
+    """
+    Watermark clean table.
+
+    Returns:
+    - tuple | None: (last_entry_time, rows_cleaned); None jika belum pernah di-clean.
+      last_entry_time None berarti RAW kosong saat watermark disimpan.
+    """
+    cur.execute(
+        f'SELECT last_entry_time, rows_cleaned FROM "{SCHEMA_CLEAN}".clean_watermark WHERE table_name = %s',
+        (src_table,)
+    )
+    return cur.fetchone()
+
+
+def get_max_entry_time(cur, raw_table, after=None):
+    """entry_time RAW terbesar (setelah watermark after, jika diberikan)."""
+    if after is None:
+        cur.execute(f"SELECT MAX(entry_time) FROM {raw_table}")
+    else:
+        cur.execute(f"SELECT MAX(entry_time) FROM {raw_table} WHERE entry_time > %s", (after,))
+    return cur.fetchone()[0]
+
+
+def set_watermark(cur, src_table, last_entry_time, rows_cleaned, mode):
+    """Simpan watermark (upsert) setelah full rebuild atau incremental clean."""
+    cur.execute(f"""
+        INSERT INTO "{SCHEMA_CLEAN}".clean_watermark (table_name, last_entry_time, rows_cleaned, mode, updated_at)
+        VALUES (%s, %s, %s, %s, NOW())
+        ON CONFLICT (table_name) DO UPDATE
+        SET last_entry_time = EXCLUDED.last_entry_time,
+            rows_cleaned = EXCLUDED.rows_cleaned,
+            mode = EXCLUDED.mode,
+            updated_at = NOW()
+    """, (src_table, last_entry_time, rows_cleaned, mode))
+    log(f"Watermark {src_table}: entry_time <= {last_entry_time}, {rows_cleaned:,} clean rows ({mode}).")
+
+
+def clean_select_sql(raw_table, pickup_col, dropoff_col, window):
+    """
+    SELECT cleaning RAW → CLEAN; dipakai full rebuild dan incremental.
+
+    Behavior:
+    - Retention window ditulis sebagai range predicate pada pickup, sehingga
+      partisi RAW (dan index pickup) bisa dipakai.
+    """
+    return f"""
             SELECT
                 "VendorID",
-                "{pickup_col}"::timestamp,
-                "{dropoff_col}"::timestamp,
+                "{pickup_col}",
+                "{dropoff_col}",
                 COALESCE(passenger_count, 1) AS passenger_count,
                 trip_distance,
                 COALESCE(fare_amount, 0) AS fare_amount,
@@ -74,56 +293,322 @@ def insert_clean_table(cur, raw_table, clean_table, pickup_col, dropoff_col):
             FROM {raw_table}
             WHERE "{pickup_col}" IS NOT NULL
               AND "{dropoff_col}" IS NOT NULL
-              AND EXTRACT(YEAR FROM "{pickup_col}"::timestamp) IN (2024, 2025);
-        """
-        cur.execute(clean_sql)
-        log("✓ Clean table created with entry_time and load_date (only 2024-2025).")
+              AND "{pickup_col}" >= '{window[0]}'
+              AND "{pickup_col}" < '{window[1]}'"""
+
+
+def clean_incremental(cur, raw_table, clean_table, src_table, pickup_col, dropoff_col, watermark, window, summary):
+    """
+    Clean baris RAW yang di-load setelah watermark ke clean table yang sudah ada.
+
+    Parameters:
+    - watermark (tuple): (last_entry_time, rows_cleaned) dari get_watermark.
+    - window (tuple): Retention window (lihat retention_window).
+    - summary (str): Daily summary table (lihat ensure_daily_summary).
+
+    Behavior:
+    - Partisi bulan baru dibuat dan partisi di luar window di-drop lebih dulu
+      (baris summary sebelum window ikut dihapus).
+    - Batas atas dibaca dulu (MAX(entry_time) > watermark), sehingga baris yang
+      di-load selama cleaning diproses di run berikutnya.
+    - Insert, refresh summary untuk tanggal yang tersentuh, dan update watermark dalam
+      satu transaksi; jika gagal, rollback dan watermark tidak maju.
+    - Duplicate (dengan baris lama maupun sesama baris baru) dilewati oleh unique
+      index trip (ON CONFLICT DO NOTHING), sehingga baris lama dipertahankan.
+    - Asumsi: load RAW dan cleaning berjalan berurutan (seperti di pipeline), sehingga
+      tidak ada baris dengan entry_time <= watermark yang commit setelah cleaning.
+
+    Returns:
+    - bool: True jika clean table berubah (baris baru atau partisi di-drop).
+    """
+    last_entry_time, rows_cleaned = watermark
+    after = last_entry_time or "-infinity"
+    try:
+        create_month_partitions(cur, clean_table, src_table, window)
+        dropped = drop_expired_partitions(cur, clean_table, src_table, window)
+        rows_cleaned -= dropped
+        if dropped:
+            cur.execute(f"DELETE FROM {summary} WHERE date < %s", (window[0],))
+        upper = get_max_entry_time(cur, raw_table, after)
+        if upper is None:
+            if dropped:
+                set_watermark(cur, src_table, last_entry_time, rows_cleaned, "incremental")
+            log(f"No new RAW rows since {last_entry_time}, clean table is up to date.")
+            return dropped > 0
+
+        log(f"Incremental clean: RAW entry_time in ({last_entry_time}, {upper}]...")
+        create_dedup_index(cur, clean_table, src_table, pickup_col, dropoff_col)
+        start = time.perf_counter()
+        cur.execute("BEGIN")
+        cur.execute(
+            f"WITH ins AS (\n            INSERT INTO {clean_table}"
+            f"{clean_select_sql(raw_table, pickup_col, dropoff_col, window)}"
+            f"\n              AND entry_time > %s AND entry_time <= %s"
+            f"\n            ON CONFLICT DO NOTHING"
+            f'\n            RETURNING "{pickup_col}"::date AS day\n        )'
+            f"\n        SELECT day, COUNT(*) FROM ins GROUP BY day ORDER BY day",
+            (after, upper)
+        )
+        days = cur.fetchall()
+        inserted = sum(count for _, count in days)
+        if days:
+            refresh_daily_summary(cur, clean_table, summary, pickup_col, dropoff_col, [day for day, _ in days])
+        set_watermark(cur, src_table, upper, rows_cleaned + inserted, "incremental")
+        cur.execute("COMMIT")
+        log(f"✓ Incremental clean: {inserted:,} new rows inserted in {time.perf_counter() - start:.2f}s "
+            "(duplicates skipped).")
+        return True
     except Exception as e:
-        log(f"Error creating clean table: {e}", "ERROR")
+        cur.execute("ROLLBACK")
+        log(f"Error in incremental clean: {e}", "ERROR")
+        return False
+
+
+def drop_shadow(cur, shadow_table, shadow_summary):
+    """Drop sisa shadow table/summary dari full rebuild sebelumnya yang gagal."""
+    cur.execute(f"DROP TABLE IF EXISTS {shadow_table} CASCADE")
+    cur.execute(f"DROP TABLE IF EXISTS {shadow_summary}")
+
+
+def swap_shadow(cur, src_table, clean_table, summary, mview, shadow_summary, last_entry_time, rows):
+    """
+    Publish shadow clean table dan summary menggantikan yang live, dalam satu transaksi.
 
+    Parameters:
+    - src_table (str): Nama tabel raw; relasi shadow bernama {src_table}_shadow_*.
+    - last_entry_time (datetime | None): Watermark hasil full rebuild.
+    - rows (int): Jumlah baris shadow clean table.
+
+    Behavior:
+    - View _mv diarahkan ke shadow summary, clean table dan summary lama di-drop, lalu
+      semua relasi {src_table}_shadow_* (tabel, partisi, index) di-rename ke nama live.
+      Hanya operasi katalog, sehingga lock ACCESS EXCLUSIVE ditahan beberapa milidetik;
+      pembaca melihat versi lama sampai commit, lalu versi baru.
+    - Clean table lama di-drop tanpa CASCADE: objek lain yang bergantung padanya (misal
+      view buatan user) membuat swap gagal dan rollback, bukan ikut terhapus diam-diam.
+    - lock_timeout = CLEAN_SWAP_LOCK_TIMEOUT agar swap tidak mengantri lama di belakang
+      query pembaca (dan memblokir pembaca berikutnya); dicoba ulang CLEAN_SWAP_RETRIES kali.
+    - Watermark disimpan di transaksi yang sama.
+
+    Returns: None
+    """
+    shadow_prefix, live_prefix = f"{src_table}_shadow_", f"{src_table}_"
+    for attempt in range(1, CLEAN_SWAP_RETRIES + 1):
+        start = time.perf_counter()
+        try:
+            cur.execute("BEGIN")
+            cur.execute("SELECT set_config('lock_timeout', %s, true)", (CLEAN_SWAP_LOCK_TIMEOUT,))
+            cur.execute("SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)", (mview,))
+            row = cur.fetchone()
+            if row is not None and row[0] == "m":
+                cur.execute(f"DROP MATERIALIZED VIEW {mview}")
+            cur.execute(f"CREATE OR REPLACE VIEW {mview} AS SELECT * FROM {shadow_summary}")
+            cur.execute(f"DROP TABLE IF EXISTS {clean_table}")
+            cur.execute(f"DROP TABLE IF EXISTS {summary}")
+            cur.execute("""
+                SELECT c.relname, c.relkind IN ('i', 'I')
+                FROM pg_class c
+                JOIN pg_namespace n ON n.oid = c.relnamespace
+                WHERE n.nspname = %s AND c.relkind IN ('r', 'p', 'i', 'I')
+                  AND strpos(c.relname, %s) > 0
+            """, (SCHEMA_CLEAN, shadow_prefix))
+            for relname, is_index in cur.fetchall():
+                kind = "INDEX" if is_index else "TABLE"
+                new_name = relname.replace(shadow_prefix, live_prefix, 1)
+                cur.execute(f'ALTER {kind} "{SCHEMA_CLEAN}"."{relname}" RENAME TO "{new_name}"')
+            set_watermark(cur, src_table, last_entry_time, rows, "full")
+            cur.execute("COMMIT")
+            log(f"✓ Shadow clean table published as {clean_table} ({rows:,} rows), "
+                f"swap took {(time.perf_counter() - start) * 1000:.0f} ms.")
+            return
+        except pg_errors.LockNotAvailable:
+            cur.execute("ROLLBACK")
+            log(f"Swap attempt {attempt}/{CLEAN_SWAP_RETRIES}: lock not available within "
+                f"{CLEAN_SWAP_LOCK_TIMEOUT}, retrying...", "WARNING")
+            time.sleep(attempt)
+    raise RuntimeError(f"could not acquire locks to publish {clean_table}")
+
+
+def dedup_key_columns(pickup_col, dropoff_col):
+    """Kolom kunci duplicate trip (urutan index: pickup dulu agar juga melayani filter tanggal)."""
+    return f'"{pickup_col}", "{dropoff_col}", "VendorID", trip_distance'
+
+
+def create_dedup_index(cur, clean_table, src_table, pickup_col, dropoff_col):
+    """
+    Buat unique index trip di clean table (jika belum ada).
+
+    Behavior:
+    - NULL di VendorID/trip_distance dianggap berbeda (sama seperti dedup lama).
+    - Dipakai ON CONFLICT DO NOTHING saat insert incremental.
+    - Jika index sudah ada, tidak ada DDL.
+    """
+    if index_exists(cur, SCHEMA_CLEAN, f"uq_{src_table}_trip"):
+        return
+    cur.execute(f"""
+        CREATE UNIQUE INDEX IF NOT EXISTS uq_{src_table}_trip
+        ON {clean_table} ({dedup_key_columns(pickup_col, dropoff_col)});
+    """)
+
+
+def create_clean_table(cur, clean_table, src_table, pickup_col, select_sql, window):
+    """
+    Buat clean table kosong PARTITION BY RANGE (pickup) beserta partisi bulanan window.
+
+    Behavior:
+    - Tipe kolom diambil dari SELECT cleaning (temp table WITH NO DATA sebagai template),
+      karena CREATE TABLE AS tidak bisa membuat tabel berpartisi.
 
-def deduplicate_table(cur, clean_table, pickup_col, dropoff_col):
-    """Hapus duplicate rows dari clean table."""
+    Returns: None
+    """
+    cur.execute(f"CREATE TEMP TABLE clean_template ON COMMIT DROP AS{select_sql}\n            WITH NO DATA;")
+    cur.execute(f'CREATE TABLE {clean_table} (LIKE clean_template) PARTITION BY RANGE ("{pickup_col}");')
+    cur.execute("DROP TABLE clean_template")
+    create_month_partitions(cur, clean_table, src_table, window)
+
+
+def build_clean_table(cur, raw_table, clean_table, src_table, pickup_col, dropoff_col, window):
+    """
+    Buat clean table berpartisi dari RAW (retention window) dengan duplicate dibuang saat insert.
+
+    Parameters:
+    - window (tuple): Retention window (lihat retention_window).
+
+    Behavior:
+    - INSERT ... SELECT DISTINCT ON kunci trip; hasil tersimpan urut pickup.
+    - Dijalankan dalam satu transaksi dengan SET LOCAL work_mem = CLEAN_WORK_MEM
+      (sort DISTINCT ON tidak spill ke disk); jika gagal, rollback.
+    - Diakhiri unique index trip (create_dedup_index), yang dipakai incremental clean.
+
+    Returns:
+    - bool: True jika clean table berhasil dibuat; False jika gagal (tabel tidak ada).
+    """
+    select_sql = clean_select_sql(raw_table, pickup_col, dropoff_col, window)
+    keys = dedup_key_columns(pickup_col, dropoff_col)
+    start = time.perf_counter()
     try:
-        log("Removing duplicates...")
-        dedup_sql = f"""
-            DELETE FROM {clean_table} a
-            USING {clean_table} b
-            WHERE a.ctid < b.ctid
-              AND a."{pickup_col}" = b."{pickup_col}"
-              AND a."{dropoff_col}" = b."{dropoff_col}"
-              AND a.trip_distance = b.trip_distance
-              AND a."VendorID" = b."VendorID";
-        """
-        cur.execute(dedup_sql)
-        log("✓ Dedup done.")
+        log("Processing & inserting into clean table (dedup: DISTINCT ON)...")
+        cur.execute("BEGIN")
+        cur.execute("SELECT set_config('work_mem', %s, true)", (CLEAN_WORK_MEM,))
+        create_clean_table(cur, clean_table, src_table, pickup_col, select_sql, window)
+        # Baris dengan NULL di kunci tidak pernah dianggap duplicate: diberi kunci unik
+        cur.execute(f"""
+            INSERT INTO {clean_table}
+            SELECT DISTINCT ON ({keys}, CASE WHEN "VendorID" IS NULL OR trip_distance IS NULL
+                                             THEN gen_random_uuid() END) *
+            FROM ({select_sql}
+            ) s
+            ORDER BY {keys};
+        """)
+        create_dedup_index(cur, clean_table, src_table, pickup_col, dropoff_col)
+        cur.execute("COMMIT")
+        cur.execute(f"SELECT COUNT(*) FROM {clean_table}")
+        log(f"✓ Clean table created with entry_time and load_date (retention window): "
+            f"{cur.fetchone()[0]:,} rows in {time.perf_counter() - start:.2f}s.")
+        return True
     except Exception as e:
-        log(f"Error in deduplication: {e}", "ERROR")
+        cur.execute("ROLLBACK")
+        log(f"Error creating clean table: {e}", "ERROR")
+        return False
+
+
+def index_definitions(clean_table, src_table, pickup_col):
+    """
+    Index clean table sesuai akses analytics (selain uq_{src_table}_trip): {nama_index: DDL}.
+
+    - Filter range per hari (DBUtils.day_filter) dan MIN/MAX pickup sudah dilayani
+      uq_{src_table}_trip, yang diawali kolom pickup (lihat create_dedup_index).
+    - idx_{src_table}_pickup_cover (hanya jika CLEAN_INDEX_INCLUDE diisi): B-tree pickup dengan
+      INCLUDE kolom tersebut, sehingga query aggregator bisa index-only scan tanpa baca heap.
+    - idx_{src_table}_pickup_brin (CLEAN_PICKUP_BRIN): BRIN pickup untuk scan range panjang
+      (refresh summary banyak tanggal); data disimpan hampir urut waktu.
+    """
+    indexes = {}
+    if CLEAN_INDEX_INCLUDE:
+        include = ", ".join(f'"{c}"' for c in CLEAN_INDEX_INCLUDE)
+        indexes[f"idx_{src_table}_pickup_cover"] = (
+            f'CREATE INDEX IF NOT EXISTS idx_{src_table}_pickup_cover ON {clean_table} ("{pickup_col}") '
+            f"INCLUDE ({include})"
+        )
+    if CLEAN_PICKUP_BRIN:
+        indexes[f"idx_{src_table}_pickup_brin"] = (
+            f'CREATE INDEX IF NOT EXISTS idx_{src_table}_pickup_brin ON {clean_table} USING brin ("{pickup_col}")'
+        )
+    return indexes
 
 
-def create_indexes(cur, clean_table, src_table, pickup_col):
-    """Buat index untuk pickup_col dan VendorID."""
+def explain_day_query(cur, clean_table, pickup_col, label):
+    """
+    Log EXPLAIN ANALYZE query harian aggregator (revenue + avg fare) untuk tanggal pickup terakhir.
+
+    Returns: None
+    """
+    cur.execute(f'SELECT MAX("{pickup_col}")::date FROM {clean_table}')
+    day = cur.fetchone()[0]
+    if day is None:
+        return
+    cur.execute(f"""
+        EXPLAIN (ANALYZE, BUFFERS, COSTS OFF)
+        SELECT COUNT(*), SUM(fare_amount + total_amount), AVG(fare_amount)
+        FROM {clean_table}
+        WHERE "{pickup_col}" >= %(day)s AND "{pickup_col}" < %(day)s::date + 1
+    """, {"day": day})
+    plan = "\n    ".join(row[0] for row in cur.fetchall())
+    log(f"Plan {label} ({day}):\n    {plan}")
+
+
+def create_indexes(cur, clean_table, src_table, pickup_col, explain_before=True):
+    """
+    Pastikan index clean table sesuai index_definitions.
+
+    Behavior:
+    - Jika semua index sudah ada, tidak ada DDL (jalur incremental steady state).
+    - Index lama idx_{src_table}_{pickup_col} dan idx_{src_table}_vendor (tidak ada query
+      yang filter VendorID) di-drop, begitu juga idx_{src_table}_pickup_cover jika
+      CLEAN_INDEX_INCLUDE kosong (range pickup dilayani uq_{src_table}_trip).
+    - VACUUM ANALYZE dulu (statistik dan visibility map untuk index-only scan), lalu
+      index dibuat dalam satu transaksi dengan SET LOCAL maintenance_work_mem =
+      CLEAN_MAINTENANCE_WORK_MEM. Index di tabel berpartisi ikut dibuat di partisi baru.
+    - CLEAN_INDEX_EXPLAIN: plan query harian aggregator dicatat sebelum (jika
+      explain_before; False untuk shadow table yang belum dibaca siapa pun) dan sesudah.
+
+    Returns: None
+    """
+    indexes = index_definitions(clean_table, src_table, pickup_col)
+    legacy = [f"idx_{src_table}_{pickup_col}", f"idx_{src_table}_pickup_cover", f"idx_{src_table}_vendor"]
+    legacy = [name for name in legacy if name not in indexes]
+    cur.execute(
+        "SELECT relname FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace "
+        "WHERE n.nspname = %s AND c.relname = ANY(%s)",
+        (SCHEMA_CLEAN, list(indexes) + legacy)
+    )
+    existing = {row[0] for row in cur.fetchall()}
+    if set(indexes) <= existing and not existing & set(legacy):
+        return
     try:
         log("Creating indexes...")
-        idx_sql = f"""
-            CREATE INDEX IF NOT EXISTS idx_{src_table}_{pickup_col}
-            ON {clean_table} ("{pickup_col}");
-
-            CREATE INDEX IF NOT EXISTS idx_{src_table}_vendor
-            ON {clean_table} ("VendorID");
-        """
-        cur.execute(idx_sql)
-        log("✓ Indexes created.")
+        start = time.perf_counter()
+        cur.execute(f"VACUUM (ANALYZE) {clean_table}")
+        if CLEAN_INDEX_EXPLAIN and explain_before:
+            explain_day_query(cur, clean_table, pickup_col, "before indexes")
+        cur.execute("BEGIN")
+        cur.execute("SELECT set_config('maintenance_work_mem', %s, true)", (CLEAN_MAINTENANCE_WORK_MEM,))
+        for name in legacy:
+            cur.execute(f'DROP INDEX IF EXISTS "{SCHEMA_CLEAN}"."{name}"')
+        for sql in indexes.values():
+            cur.execute(sql)
+        cur.execute("COMMIT")
+        log(f"✓ Indexes created: {', '.join(indexes)} in {time.perf_counter() - start:.2f}s.")
+        if CLEAN_INDEX_EXPLAIN:
+            explain_day_query(cur, clean_table, pickup_col, "after indexes")
     except Exception as e:
+        cur.execute("ROLLBACK")
         log(f"Error creating indexes: {e}", "ERROR")
 
 
-def create_materialized_view(cur, clean_table, mview, pickup_col, dropoff_col):
-    """Buat materialized view untuk aggregasi trip data per tanggal."""
-    try:
-        log("Creating materialized view...")
-        mview_sql = f"""
-            CREATE MATERIALIZED VIEW {mview} AS
+def daily_summary_sql(clean_table, pickup_col, dropoff_col, where=""):
+    """SELECT agregasi trip per (tanggal, VendorID, payment_type), kolom sama dengan _mv lama."""
+    return f"""
             SELECT
                 "{pickup_col}"::date AS date,
                 "VendorID",
@@ -134,10 +619,86 @@ def create_materialized_view(cur, clean_table, mview, pickup_col, dropoff_col):
                 AVG(trip_distance) AS avg_distance,
                 AVG(total_amount) AS avg_fare,
                 EXTRACT(EPOCH FROM AVG("{dropoff_col}" - "{pickup_col}")) AS avg_duration
-            FROM {clean_table}
-            GROUP BY date, "VendorID", payment_type;
-        """
-        cur.execute(mview_sql)
-        log("✓ Materialized view created.")
-    except Exception as e:
-        log(f"Error creating materialized view: {e}", "ERROR")
+            FROM {clean_table}{where}
+            GROUP BY date, "VendorID", payment_type"""
+
+
+def create_summary_table(cur, clean_table, summary, src_table, pickup_col, dropoff_col):
+    """Buat daily summary table kosong dari daily_summary_sql WITH NO DATA (tipe kolom mengikuti clean table)."""
+    log(f"Creating daily summary table {summary}...")
+    cur.execute(f"CREATE TABLE {summary} AS{daily_summary_sql(clean_table, pickup_col, dropoff_col)}\n            WITH NO DATA;")
+    cur.execute(f"CREATE INDEX IF NOT EXISTS idx_{src_table}_summary_date ON {summary} (date);")
+
+
+def ensure_daily_summary(cur, clean_table, summary, mview, src_table, pickup_col, dropoff_col):
+    """
+    Pastikan daily summary table dan view _mv di atasnya ada (jalur incremental).
+
+    Behavior:
+    - Summary yang belum ada dibuat dan diisi penuh dari clean table.
+    - _mv lama (materialized view) diganti sekali menjadi view biasa: SELECT * FROM summary.
+    - Create, isi dan replace view dalam satu transaksi: jika gagal, rollback dan
+      summary belum ada, sehingga dicoba lagi di run berikutnya (view tidak pernah
+      menunjuk summary kosong).
+    - Jika keduanya sudah ada, tidak ada DDL (tidak ada lock pada view yang dibaca dashboard).
+
+    Returns: None
+    """
+    cur.execute("SELECT to_regclass(%s)", (summary,))
+    missing = cur.fetchone()[0] is None
+    cur.execute("SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)", (mview,))
+    row = cur.fetchone()
+    is_view = row is not None and row[0] == "v"
+    if not missing and is_view:
+        return
+
+    cur.execute("BEGIN")
+    if missing:
+        create_summary_table(cur, clean_table, summary, src_table, pickup_col, dropoff_col)
+        refresh_daily_summary(cur, clean_table, summary, pickup_col, dropoff_col)
+    if not is_view:
+        if row is not None and row[0] == "m":
+            cur.execute(f"DROP MATERIALIZED VIEW {mview}")
+        cur.execute(f"CREATE OR REPLACE VIEW {mview} AS SELECT * FROM {summary}")
+    cur.execute("COMMIT")
+    if not is_view:
+        log(f"✓ View {mview} now reads from {summary}.")
+
+
+def refresh_daily_summary(cur, clean_table, summary, pickup_col, dropoff_col, days=None):
+    """
+    Hitung ulang daily summary untuk tanggal tertentu (atau semua tanggal).
+
+    Parameters:
+    - days (list[datetime.date], optional): Tanggal yang mendapat baris baru. None = semua.
+
+    Behavior:
+    - Baris summary tanggal tersebut di-DELETE lalu di-INSERT dari clean table; AVG
+      tidak bisa dijumlahkan, sehingga satu tanggal selalu dihitung dari seluruh barisnya.
+    - Filter clean memakai range pickup [min(days), max(days) + 1) agar hanya partisi
+      bulan yang tersentuh yang dibaca.
+    - Tidak memakai TRUNCATE/DROP: pembaca view tetap melihat summary lama sampai commit.
+    - Jika dipanggil di luar transaksi, dijalankan dalam transaksi sendiri.
+
+    Returns: None
+    """
+    start = time.perf_counter()
+    own_transaction = cur.connection.info.transaction_status == TRANSACTION_STATUS_IDLE
+    if own_transaction:
+        cur.execute("BEGIN")
+    if days is None:
+        cur.execute(f"DELETE FROM {summary}")
+        cur.execute(f"INSERT INTO {summary}{daily_summary_sql(clean_table, pickup_col, dropoff_col)}")
+    else:
+        cur.execute(f"DELETE FROM {summary} WHERE date = ANY(%s)", (days,))
+        where = (f'\n            WHERE "{pickup_col}" >= %(first)s AND "{pickup_col}" < %(last)s::date + 1'
+                 f'\n              AND "{pickup_col}"::date = ANY(%(days)s)')
+        cur.execute(
+            f"INSERT INTO {summary}{daily_summary_sql(clean_table, pickup_col, dropoff_col, where)}",
+            {"first": min(days), "last": max(days), "days": days}
+        )
+    rows = cur.rowcount
+    if own_transaction:
+        cur.execute("COMMIT")
+    scope = "all dates" if days is None else f"{len(days)} date(s) {min(days)} .. {max(days)}"
+    log(f"✓ Daily summary refreshed for {scope}: {rows:,} rows in {time.perf_counter() - start:.2f}s.")
@@ -13,3 +13,29 @@ DB_CONFIG = {
     "password": os.getenv("DB_PASSWORD"),
     "dbname": os.getenv("DB_NAME"),
 }
+
+# CLEAN_FULL_REBUILD: drop & rebuild clean table dari seluruh RAW setiap run.
+# Default false: hanya baris RAW dengan entry_time > watermark yang di-clean (incremental).
+CLEAN_FULL_REBUILD = os.getenv("CLEAN_FULL_REBUILD", "false").strip().lower() in ("1", "true", "yes")
+# CLEAN_WORK_MEM: work_mem (SET LOCAL) untuk sort DISTINCT ON / hash join saat full rebuild
+CLEAN_WORK_MEM = os.getenv("CLEAN_WORK_MEM", "256MB").strip()
+# CLEAN_RETENTION_START: pickup paling awal di clean table (inklusif, YYYY-MM-DD)
+CLEAN_RETENTION_START = os.getenv("CLEAN_RETENTION_START", "2024-01-01").strip()
+# CLEAN_RETENTION_MONTHS: simpan N bulan terakhir (termasuk bulan ini); partisi lebih lama di-drop.
+# 0 = tanpa rolling window (hanya CLEAN_RETENTION_START). Batas atas selalu awal bulan depan.
+CLEAN_RETENTION_MONTHS = int(os.getenv("CLEAN_RETENTION_MONTHS", 0))
+# CLEAN_SWAP_LOCK_TIMEOUT: lock_timeout transaksi swap shadow → live (full rebuild);
+# jika pembaca lama menahan lock, swap dicoba ulang CLEAN_SWAP_RETRIES kali
+CLEAN_SWAP_LOCK_TIMEOUT = os.getenv("CLEAN_SWAP_LOCK_TIMEOUT", "5s").strip()
+CLEAN_SWAP_RETRIES = int(os.getenv("CLEAN_SWAP_RETRIES", 3))
+# CLEAN_INDEX_INCLUDE: kolom INCLUDE untuk covering index pickup (index-only scan query aggregator,
+# misal "fare_amount,total_amount,trip_distance"); kosong = tanpa covering index (default:
+# uq_{src}_trip sudah melayani filter harian, covering index ~1/3 ukuran heap per bulan)
+CLEAN_INDEX_INCLUDE = [x.strip() for x in os.getenv("CLEAN_INDEX_INCLUDE", "").split(",") if x.strip()]
+# CLEAN_PICKUP_BRIN: tambah BRIN index pickup (kecil, untuk scan range panjang pada data urut waktu)
+CLEAN_PICKUP_BRIN = os.getenv("CLEAN_PICKUP_BRIN", "true").strip().lower() in ("1", "true", "yes")
+# CLEAN_MAINTENANCE_WORK_MEM: maintenance_work_mem (SET LOCAL) saat build index clean table
+CLEAN_MAINTENANCE_WORK_MEM = os.getenv("CLEAN_MAINTENANCE_WORK_MEM", "512MB").strip()
+# CLEAN_INDEX_EXPLAIN: log EXPLAIN ANALYZE query harian aggregator sebelum dan sesudah build index
+# (diagnosa; setiap EXPLAIN ANALYZE menjalankan query, default nonaktif)
+CLEAN_INDEX_EXPLAIN = os.getenv("CLEAN_INDEX_EXPLAIN", "false").strip().lower() in ("1", "true", "yes")
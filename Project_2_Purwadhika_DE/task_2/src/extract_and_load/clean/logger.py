@@ -1,9 +1,7 @@
 import os
 from datetime import datetime
 
-# Buat folder log jika belum ada
 LOG_DIR = "resources/logs"
-os.makedirs(LOG_DIR, exist_ok=True)
 LOG_FILE = os.path.join(LOG_DIR, "clean_process.log")
 
 def log(message, level="INFO"):
@@ -26,5 +24,6 @@ def log(message, level="INFO"):
     ts = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     line = f"[{ts}] [{level}] {message}"
     print(line)
+    os.makedirs(LOG_DIR, exist_ok=True)  # Buat folder log jika belum ada
     with open(LOG_FILE, "a", encoding="utf-8") as f:
         f.write(line + "\n")
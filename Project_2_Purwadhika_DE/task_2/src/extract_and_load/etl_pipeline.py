@@ -1,7 +1,9 @@
 import os
-from src.extract_and_load.raw import downloader, splitter, uploader, config as raw_config, logger as raw_logger
-from src.extract_and_load.clean import cleaner
-from src.extract_and_load.raw.db_utils import mark_parquet_done, migrate_parquet_tracking
+from src.extract_and_load.raw import downloader, migrations, config as raw_config, logger as raw_logger
+from src.extract_and_load.raw.db_utils import mark_parquet_done, apply_raw_retention
+
+# splitter, uploader, ingestor dan cleaner (pandas/pyarrow) di-import di stage yang
+# memakainya, sehingga run tanpa parquet baru cukup memuat downloader.
 
 log = raw_logger.log
 
@@ -10,25 +12,72 @@ class Extractor:
     Class untuk menjalankan pipeline ETL: RAW → CLEAN.
     """
 
-    def run_pipeline(self):
+    def run_pipeline(self, full_rebuild=None):
         """
         Jalankan seluruh pipeline ETL: download parquet → split CSV → upload → clean → update tracking.
+        Jika INGEST_MODE="parquet", tahap split CSV dan upload diganti ingest parquet langsung ke RAW.
+
+        Parameters:
+        - full_rebuild (bool, optional): Rebuild clean table dari seluruh RAW (lihat clean_data).
 
         Returns: None
         """
+        migrations.migrate(raw_config.engine)
         result = self.download_parquet()
         if not result:
             log("No parquet to process, exiting")
             return
 
         month_to_process, downloaded_files = result
-        self.ensure_csv_folders(month_to_process)
-
-        self.split_parquet(month_to_process)
-        self.upload_csvs(month_to_process)
-        self.clean_data()
+        self.load_raw(month_to_process)
+        self.clean_data(full_rebuild)
         self.update_parquet_tracking(downloaded_files, month_to_process)
 
+    def run_backfill(self, start_month, end_month, full_rebuild=None):
+        """
+        Jalankan pipeline untuk rentang bulan (backfill): download semua bulan secara
+        paralel → load RAW per bulan (urut) → clean sekali → update tracking.
+
+        Parameters:
+        - start_month (str): Bulan awal 'YYYY-MM'.
+        - end_month (str): Bulan akhir 'YYYY-MM' (inklusif).
+        - full_rebuild (bool, optional): Rebuild clean table dari seluruh RAW (lihat clean_data).
+
+        Returns: None
+        """
+        migrations.migrate(raw_config.engine)
+        results = downloader.download_backfill(start_month, end_month)
+        if not results:
+            log("No parquet to backfill, exiting")
+            return
+
+        for month, _ in results:
+            log(f"=== BACKFILL RAW LOAD {month} ===")
+            self.load_raw(month)
+        self.clean_data(full_rebuild)
+        for month, downloaded_files in results:
+            self.update_parquet_tracking(downloaded_files, month)
+
+    def load_raw(self, month):
+        """
+        Load parquet satu bulan ke RAW table: split CSV → upload, atau
+        ingest parquet langsung jika INGEST_MODE="parquet". Setelah load, partisi
+        bulan di luar RAW_RETENTION_MONTHS dilepas (lihat apply_raw_retention).
+
+        Parameters:
+        - month (str): Bulan format 'YYYY-MM'.
+
+        Returns: None
+        """
+        if raw_config.INGEST_MODE == "parquet":
+            self.ingest_parquet(month)
+        else:
+            self.ensure_csv_folders(month)
+            self.split_parquet(month)
+            self.upload_csvs(month)
+        for cfg in raw_config.folders.values():
+            apply_raw_retention(cfg["table"], raw_config.engine)
+
     def download_parquet(self):
         """
         Download file parquet dari TLC website.
@@ -52,6 +101,7 @@ class Extractor:
         """
         Split semua parquet yang sudah didownload menjadi daily CSV.
         """
+        from src.extract_and_load.raw import splitter
         download_dir = os.path.join(raw_config.DOWNLOAD_DIR, month)
         log("Splitting parquet files into daily CSVs...")
         splitter.split_parquet_files(download_dir=download_dir)
@@ -59,27 +109,53 @@ class Extractor:
     def upload_csvs(self, month):
         """
         Upload semua CSV bulanan ke RAW table.
+        File bulan ini yang sebelumnya gagal (folder failed) ikut di-upload ulang
+        jika RETRY_FAILED_UPLOADS, dilanjutkan dari checkpoint chunk terakhir.
         """
+        from src.extract_and_load.raw import uploader
         log("Uploading CSVs into RAW tables...")
-        for taxi_type, cfg in raw_config.folders.items():
-            uploader.upload_and_archive(cfg, raw_config.engine, month=month)
+        if raw_config.RETRY_FAILED_UPLOADS:
+            for cfg in raw_config.folders.values():
+                uploader.requeue_failed_files(cfg, month)
+        if raw_config.UPLOAD_WORKERS > 1 and not raw_config.UPLOAD_STAGE_TABLE:
+            uploader.upload_parallel(list(raw_config.folders.values()), raw_config.engine, month=month)
+        else:
+            for taxi_type, cfg in raw_config.folders.items():
+                uploader.upload_and_archive(cfg, raw_config.engine, month=month)
+
+        log("✓ RAW ETL complete.")
+
+    def ingest_parquet(self, month):
+        """
+        Load semua parquet bulan ini langsung ke RAW table (tanpa daily CSV).
+        """
+        from src.extract_and_load.raw import ingestor
+        download_dir = os.path.join(raw_config.DOWNLOAD_DIR, month)
+        log("Ingesting parquet files directly into RAW tables...")
+        ingestor.ingest_parquet_files(download_dir, raw_config.engine, raw_config.PARQUET_BATCH_SIZE)
 
         log("✓ RAW ETL complete.")
 
-    def clean_data(self):
+    def clean_data(self, full_rebuild=None):
         """
         Jalankan proses cleaning: RAW → CLEAN.
+        Default incremental (hanya baris RAW setelah watermark); full_rebuild=True
+        atau CLEAN_FULL_REBUILD=true membangun ulang clean table dari seluruh RAW.
         """
+        from src.extract_and_load.clean import cleaner
+        migrations.migrate(raw_config.engine)
         log("Starting CLEANING process (RAW → CLEAN)...")
         cleaner.clean_tripdata(
             src_table="yellow_tripdata",
             pickup_col="tpep_pickup_datetime",
-            dropoff_col="tpep_dropoff_datetime"
+            dropoff_col="tpep_dropoff_datetime",
+            full_rebuild=full_rebuild
         )
         cleaner.clean_tripdata(
             src_table="green_tripdata",
             pickup_col="lpep_pickup_datetime",
-            dropoff_col="lpep_dropoff_datetime"
+            dropoff_col="lpep_dropoff_datetime",
+            full_rebuild=full_rebuild
         )
         log("✓ CLEAN ETL complete.")
 
@@ -93,7 +169,6 @@ class Extractor:
 
         Returns: None
         """
-        migrate_parquet_tracking()
         for file in downloaded_files:
             mark_parquet_done(file)
             log(f"Marked parquet done: {file}")
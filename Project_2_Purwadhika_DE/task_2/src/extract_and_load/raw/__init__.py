@@ -1,15 +1,22 @@
-from . import logger
-from . import config
-from . import downloader
-from . import splitter
-from . import db_utils
-from . import uploader
+import importlib
 
+# Submodule di-import saat pertama kali diakses (misal raw.uploader), sehingga
+# import package ini tidak memuat pandas/pyarrow/sqlalchemy.
 __all__ = [
     "logger",
     "config",
+    "http_cache",
+    "migrations",
     "downloader",
     "splitter",
+    "schema_registry",
     "db_utils",
     "uploader",
+    "ingestor",
 ]
+
+
+def __getattr__(name):
+    if name in __all__:
+        return importlib.import_module(f".{name}", __name__)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,8 +1,9 @@
 import os
 from dotenv import load_dotenv
-from sqlalchemy import create_engine, text
-from sqlalchemy.pool import QueuePool
 
+# Modul ini bebas side effect: hanya membaca environment. engine dan folders
+# dibuat saat pertama kali diakses (lihat __getattr__), sehingga import config
+# tidak membuka koneksi DB, tidak menjalankan DDL, dan tidak membuat folder.
 load_dotenv()
 # DB Environment
 DB_USER = os.getenv("DB_USER")
@@ -15,23 +16,13 @@ SCHEMA_CLEAN = os.getenv("SCHEMA_CLEAN", "clean")
 
 DB_URL = f"postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
 
-# DB engine
-engine = create_engine(
-    DB_URL,
-    poolclass=QueuePool,
-    pool_size=5,
-    max_overflow=10
-)
-
-# Checking schema exist
-with engine.connect() as conn:
-    conn.execute(text(f'CREATE SCHEMA IF NOT EXISTS "{SCHEMA_RAW}"'))
-    conn.execute(text(f'CREATE SCHEMA IF NOT EXISTS "{SCHEMA_CLEAN}"'))
-    conn.commit()
+# DB engine (lazy, lihat create_db_engine); schema RAW/CLEAN dibuat oleh migrations.migrate
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 5))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 10))
 
 # Folder environment
 TLC_URL = os.getenv("TLC_URL")
-PARQUET_NAMES = [x.strip() for x in os.getenv("PARQUET_NAMES").split(",")]
+PARQUET_NAMES = [x.strip() for x in os.getenv("PARQUET_NAMES", "yellow,green").split(",") if x.strip()]
 YELLOW_URL = os.getenv("YELLOW_URL")
 GREEN_URL = os.getenv("GREEN_URL")
 RAW_DIR = os.getenv("RAW_DIR")
@@ -43,24 +34,120 @@ FAILED_DIR = os.getenv("FAILED_DIR")
 YELLOW_TABLE = os.getenv("YELLOW_TABLE")
 GREEN_TABLE = os.getenv("GREEN_TABLE")
 
-folders = {
-    "yellow": {
-        "input": YELLOW_DIR,
-        "old": os.path.join(OLD_DIR, "yellow"),
-        "failed": os.path.join(FAILED_DIR, "yellow"),
-        "table": YELLOW_TABLE
-    },
-    "green": {
-        "input": GREEN_DIR,
-        "old": os.path.join(OLD_DIR, "green"),
-        "failed": os.path.join(FAILED_DIR, "green"),
-        "table": GREEN_TABLE
+# Download environment
+# DOWNLOAD_WORKERS: jumlah thread download paralel (mode backfill)
+DOWNLOAD_WORKERS = int(os.getenv("DOWNLOAD_WORKERS", 4))
+# DOWNLOAD_CHUNK_SIZE: ukuran buffer iter_content saat download (bytes)
+DOWNLOAD_CHUNK_SIZE = int(os.getenv("DOWNLOAD_CHUNK_SIZE", 1024 * 1024))
+# DOWNLOAD_RETRIES: jumlah percobaan per file; setiap percobaan melanjutkan file .part (HTTP Range)
+DOWNLOAD_RETRIES = int(os.getenv("DOWNLOAD_RETRIES", 3))
+# DOWNLOAD_RETRY_BACKOFF: jeda awal sebelum percobaan download berikutnya (detik), dikali 2 setiap percobaan
+DOWNLOAD_RETRY_BACKOFF = float(os.getenv("DOWNLOAD_RETRY_BACKOFF", 2.0))
+# HTTP_CACHE_DIR: cache halaman TLC (ETag/Last-Modified + index link) dan metadata parquet
+HTTP_CACHE_DIR = os.getenv("HTTP_CACHE_DIR", os.path.join(RAW_DIR or "resources/raw", "cache"))
+
+# Upload environment
+# UPLOAD_METHOD: "copy" (COPY ... FROM STDIN, default) atau "to_sql" (INSERT via pandas)
+UPLOAD_METHOD = os.getenv("UPLOAD_METHOD", "copy").strip().lower()
+# INGEST_MODE: "csv" (split daily CSV → upload, default) atau "parquet" (parquet langsung ke RAW)
+INGEST_MODE = os.getenv("INGEST_MODE", "csv").strip().lower()
+PARQUET_BATCH_SIZE = int(os.getenv("PARQUET_BATCH_SIZE", 100000))
+# UPLOAD_RETRIES: percobaan load per file untuk error koneksi; setiap percobaan lanjut dari checkpoint chunk
+UPLOAD_RETRIES = int(os.getenv("UPLOAD_RETRIES", 3))
+# UPLOAD_RETRY_BACKOFF: jeda awal retry (detik), dikali 2 setiap percobaan
+UPLOAD_RETRY_BACKOFF = float(os.getenv("UPLOAD_RETRY_BACKOFF", 2.0))
+# RETRY_FAILED_UPLOADS: upload ulang file di folder failed/ bulan yang sama sebelum upload baru
+RETRY_FAILED_UPLOADS = os.getenv("RETRY_FAILED_UPLOADS", "true").strip().lower() in ("1", "true", "yes")
+# RAW_PARTITIONED: RAW table baru dibuat PARTITION BY RANGE (pickup), satu partisi per bulan
+RAW_PARTITIONED = os.getenv("RAW_PARTITIONED", "true").strip().lower() in ("1", "true", "yes")
+# RAW_RETENTION_MONTHS: jumlah partisi bulan terbaru yang tetap ter-attach di RAW table (0 = nonaktif);
+# partisi lebih lama di-DETACH setelah load RAW (lihat db_utils.apply_raw_retention)
+RAW_RETENTION_MONTHS = int(os.getenv("RAW_RETENTION_MONTHS", 0))
+# RAW_RETENTION_DROP: DROP partisi yang di-detach; false = simpan sebagai tabel arsip "<table>_YYYYMM"
+RAW_RETENTION_DROP = os.getenv("RAW_RETENTION_DROP", "false").strip().lower() in ("1", "true", "yes")
+# UPLOAD_STAGE_TABLE: load satu bulan ke UNLOGGED stage table lalu publish dalam satu transaksi
+# (stage di-ATTACH sebagai partisi bulan jika RAW table berpartisi dan bulan belum ada).
+# Manfaatnya bulan ter-publish atomic (pembaca tidak melihat bulan setengah jadi, gagal cukup drop stage).
+# Bukan pengurang WAL: dengan wal_level=replica/logical SET LOGGED menulis seluruh stage ke WAL,
+# sehingga WAL lebih besar dari load langsung (yellow 2025-01: 64 MB vs 49 MB); hanya dengan
+# wal_level=minimal hampir tanpa WAL. Default nonaktif.
+UPLOAD_STAGE_TABLE = os.getenv("UPLOAD_STAGE_TABLE", "false").strip().lower() in ("1", "true", "yes")
+# UPLOAD_WORKERS: jumlah thread upload paralel (1 = serial); sebaiknya <= DB_POOL_SIZE + DB_MAX_OVERFLOW
+UPLOAD_WORKERS = int(os.getenv("UPLOAD_WORKERS", 1))
+# PARQUET_COLUMNS: kolom parquet yang dibaca (selain pickup/dropoff), "*" = semua kolom.
+# Default: kolom yang dipakai clean layer.
+PARQUET_COLUMNS = os.getenv(
+    "PARQUET_COLUMNS",
+    "VendorID,passenger_count,trip_distance,fare_amount,tip_amount,tolls_amount,"
+    "total_amount,payment_type,extra,mta_tax,improvement_surcharge"
+).strip()
+PARQUET_COLUMNS = None if PARQUET_COLUMNS == "*" else [x.strip() for x in PARQUET_COLUMNS.split(",") if x.strip()]
+# PARQUET_MONTH_FILTER: hanya baca pickup di bulan file (baris nyasar 2007/2009 dibuang saat read)
+PARQUET_MONTH_FILTER = os.getenv("PARQUET_MONTH_FILTER", "true").strip().lower() in ("1", "true", "yes")
+# COMPACT_DTYPES: cast kolom kode ke int8/int16 dan flag ke categorical setelah read parquet
+COMPACT_DTYPES = os.getenv("COMPACT_DTYPES", "true").strip().lower() in ("1", "true", "yes")
+# COMPACT_FLOAT32: kolom uang → float32 (aman untuk nilai 2 desimal), default off
+COMPACT_FLOAT32 = os.getenv("COMPACT_FLOAT32", "false").strip().lower() in ("1", "true", "yes")
+
+# Split environment
+# SPLIT_MEMORY_LIMIT_MB: batas buffer daily CSV sebelum di-flush ke disk
+SPLIT_MEMORY_LIMIT_MB = int(os.getenv("SPLIT_MEMORY_LIMIT_MB", 256))
+# SPLIT_WORKERS: jumlah process untuk split parallel (1 = serial)
+SPLIT_WORKERS = int(os.getenv("SPLIT_WORKERS", 1))
+# STAGING_FORMAT: "csv" ({date}.csv, default) atau "parquet" (date={date}/part-*.parquet, zstd)
+STAGING_FORMAT = os.getenv("STAGING_FORMAT", "csv").strip().lower()
+
+
+def create_db_engine():
+    """
+    Buat SQLAlchemy engine (QueuePool) dari DB_URL.
+
+    Returns:
+    - sqlalchemy.engine.Engine: Engine; koneksi baru dibuka saat query pertama.
+    """
+    from sqlalchemy import create_engine
+    from sqlalchemy.pool import QueuePool
+    return create_engine(
+        DB_URL,
+        poolclass=QueuePool,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW
+    )
+
+
+def build_folders():
+    """
+    Konfigurasi folder dan tabel per warna taxi.
+
+    Behavior:
+    - Folder tidak dibuat di sini; setiap stage membuat folder yang ditulisnya
+      (split, move_file, downloader).
+
+    Returns:
+    - dict: {"yellow": {"input", "old", "failed", "table"}, "green": {...}}
+    """
+    return {
+        "yellow": {
+            "input": YELLOW_DIR,
+            "old": os.path.join(OLD_DIR, "yellow"),
+            "failed": os.path.join(FAILED_DIR, "yellow"),
+            "table": YELLOW_TABLE
+        },
+        "green": {
+            "input": GREEN_DIR,
+            "old": os.path.join(OLD_DIR, "green"),
+            "failed": os.path.join(FAILED_DIR, "green"),
+            "table": GREEN_TABLE
+        }
     }
-}
 
-for cfg in folders.values():
-    os.makedirs(cfg["input"], exist_ok=True)
-    os.makedirs(cfg["old"], exist_ok=True)
-    os.makedirs(cfg["failed"], exist_ok=True)
 
-os.makedirs(DOWNLOAD_DIR, exist_ok=True)
+LAZY_SETTINGS = {"engine": create_db_engine, "folders": build_folders}
+
+
+def __getattr__(name):
+    """Resolve engine/folders saat pertama kali diakses (config.engine, config.folders), lalu di-cache."""
+    if name in LAZY_SETTINGS:
+        value = globals()[name] = LAZY_SETTINGS[name]()
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
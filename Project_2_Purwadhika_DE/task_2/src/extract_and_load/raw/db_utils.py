@@ -1,120 +1,519 @@
 from sqlalchemy import text
 from datetime import datetime
 from .logger import log
-from . import config
-import pandas as pd
+from . import config, migrations
 
 
 def ensure_table_exists(df_sample, table_name, engine):
     """
-    Pastikan tabel ada di database; jika belum, buat dengan kolom metadata.
+    Pastikan tabel ada di database dengan kolom dan tipe dari schema registry.
 
     Parameters:
-    - df_sample (pd.DataFrame): Contoh dataframe untuk menentukan struktur tabel.
+    - df_sample (pd.DataFrame): Contoh dataframe untuk menentukan kolom tabel.
     - table_name (str): Nama tabel yang akan dicek atau dibuat.
     - engine (SQLAlchemy engine): Koneksi ke database.
 
     Behavior:
-    - Membuat tabel jika belum ada.
-    - Menambahkan kolom 'entry_time' dan 'source_file' jika belum ada.
-    - Commit perubahan ke database.
+    - Tipe kolom diambil dari schema parquet sumber (schema_registry.register_source_schema),
+      bukan dari inferensi sample; kolom *_datetime menjadi TIMESTAMP.
+    - Tabel baru dibuat PARTITION BY RANGE (pickup) jika config.RAW_PARTITIONED.
+    - Kolom baru di-ALTER TABLE ADD COLUMN otomatis, termasuk 'entry_time' dan 'source_file'.
+    - Hasil di-cache per proses, sehingga pemanggilan per file harian tidak query ke database.
 
     Returns: None
     """
-    schema = config.SCHEMA_RAW
-    full_table = f'"{schema}"."{table_name}"'
-
+    # schema_registry memuat pyarrow; di-import di sini agar stage download tidak ikut memuatnya
+    from . import schema_registry
+    migrations.migrate(engine)
     try:
-        with engine.connect() as conn:
-            # Cek apakah tabel ada
-            exists = conn.execute(
-                text("SELECT to_regclass(:full_table)"),
-                {"full_table": full_table}
-            ).scalar()
-
-            if not exists:
-                log(f"Creating new table {full_table} ...")
-                df_sample.head(0).to_sql(
-                    table_name,
-                    engine,
-                    schema=schema,
-                    if_exists="replace",
-                    index=False
-                )
-                log(f"Table {full_table} created.")
-
-            # Cek kolom entry_time dan source_file
-            col_check = conn.execute(text("""
-                SELECT column_name
-                FROM information_schema.columns
-                WHERE table_schema = :schema
-                AND table_name = :table
-                AND column_name IN ('entry_time', 'source_file')
-            """), {"schema": schema, "table": table_name}).fetchall()
-            existing_cols = [c[0] for c in col_check]
-
-            if "entry_time" not in existing_cols:
-                conn.execute(text(f'ALTER TABLE {full_table} ADD COLUMN entry_time TIMESTAMP'))
-                log(f"Added column entry_time to {full_table}")
-
-            if "source_file" not in existing_cols:
-                conn.execute(text(f'ALTER TABLE {full_table} ADD COLUMN source_file TEXT'))
-                log(f"Added column source_file to {full_table}")
-
-            conn.commit()
-
+        schema_registry.ensure_table_schema(table_name, df_sample, engine)
     except Exception as e:
         log(f"Error creating or updating table {table_name}: {e}", "ERROR")
 
 
-def is_file_already_inserted(table_name, filename, engine):
+# Partisi bulanan yang sudah dipastikan ada di proses ini: {(table_name, "YYYY-MM")}
+PARTITIONS_READY = set()
+
+
+def month_partition_name(table_name, month):
+    """Nama partisi bulanan RAW table, misal "yellow_tripdata_202501"."""
+    return f"{table_name}_{month.replace('-', '')}"
+
+
+def month_bounds(month):
+    """Batas partisi bulan: ('YYYY-MM-01', awal bulan berikutnya)."""
+    year, mon = (int(x) for x in month.split("-")[:2])
+    next_year, next_mon = (year + 1, 1) if mon == 12 else (year, mon + 1)
+    return f"{year:04d}-{mon:02d}-01", f"{next_year:04d}-{next_mon:02d}-01"
+
+
+def get_partition_key(table_name, conn):
+    """
+    Kolom partition key RAW table.
+
+    Returns:
+    - str | None: Nama kolom, None jika tabel tidak dipartisi (atau belum ada).
     """
-    Cek apakah file sudah pernah dimasukkan ke tabel tertentu.
+    return conn.execute(text("""
+        SELECT a.attname
+        FROM pg_partitioned_table p
+        JOIN pg_attribute a ON a.attrelid = p.partrelid AND a.attnum = p.partattrs[0]
+        WHERE p.partrelid = to_regclass(:full_table)
+    """), {"full_table": f'"{config.SCHEMA_RAW}"."{table_name}"'}).scalar()
+
+
+def ensure_month_partition(table_name, month, engine):
+    """
+    Pastikan partisi bulanan RAW table ada (dibuat on demand oleh upload/ingest).
 
     Parameters:
-    - table_name (str): Nama tabel yang akan dicek.
-    - filename (str): Nama file yang ingin dicek.
+    - table_name (str): Nama RAW table (parent).
+    - month (str): Bulan format 'YYYY-MM'.
     - engine (SQLAlchemy engine): Koneksi ke database.
 
+    Behavior:
+    - Tabel yang tidak dipartisi (tabel lama) dilewati.
+    - Jika partisi DEFAULT sudah berisi baris bulan tersebut, baris itu dipindah
+      ke partisi baru dalam transaksi yang sama sebelum ATTACH.
+    - Hasil di-cache per proses (PARTITIONS_READY), sehingga aman dipanggil per file.
+
+    Returns: None
+    """
+    if (table_name, month) in PARTITIONS_READY:
+        return
+    schema = config.SCHEMA_RAW
+    parent = f'"{schema}"."{table_name}"'
+    partition = f'"{schema}"."{month_partition_name(table_name, month)}"'
+    default = f'"{schema}"."{table_name}_default"'
+    start, end = month_bounds(month)
+
+    with engine.begin() as conn:
+        key = get_partition_key(table_name, conn)
+        exists = conn.execute(text("SELECT to_regclass(:p)"), {"p": partition}).scalar()
+        if key and not exists:
+            has_default = conn.execute(text("SELECT to_regclass(:p)"), {"p": default}).scalar()
+            in_default = has_default and conn.execute(text(f"""
+                SELECT 1 FROM {default} WHERE "{key}" >= :start AND "{key}" < :end LIMIT 1
+            """), {"start": start, "end": end}).scalar()
+            if in_default:
+                conn.execute(text(f"CREATE TABLE {partition} (LIKE {parent} INCLUDING DEFAULTS)"))
+                moved = conn.execute(text(f"""
+                    WITH moved AS (
+                        DELETE FROM {default} WHERE "{key}" >= :start AND "{key}" < :end RETURNING *
+                    )
+                    INSERT INTO {partition} SELECT * FROM moved
+                """), {"start": start, "end": end}).rowcount
+                conn.execute(text(
+                    f"ALTER TABLE {parent} ATTACH PARTITION {partition} FOR VALUES FROM ('{start}') TO ('{end}')"
+                ))
+                log(f"Created partition {partition}, moved {moved:,} rows from {default}")
+            else:
+                conn.execute(text(
+                    f"CREATE TABLE {partition} PARTITION OF {parent} FOR VALUES FROM ('{start}') TO ('{end}')"
+                ))
+                log(f"Created partition {partition}")
+    PARTITIONS_READY.add((table_name, month))
+
+
+def detach_month_partition(table_name, month, engine, drop=False):
+    """
+    Lepas (dan opsional drop) partisi bulanan RAW table, misal untuk arsip bulan lama.
+
+    Parameters:
+    - table_name (str): Nama RAW table (parent).
+    - month (str): Bulan format 'YYYY-MM'.
+    - engine (SQLAlchemy engine): Koneksi ke database.
+    - drop (bool): True untuk DROP partisi setelah detach.
+
+    Behavior:
+    - DETACH hanya mengubah katalog (tanpa scan/rewrite data); tabel hasil detach
+      tetap ada sebagai tabel biasa "<table>_YYYYMM" kecuali drop=True.
+    - Baris load ledger bulan tersebut tidak dihapus.
+
     Returns:
-    - bool: True jika file sudah ada di tabel, False jika belum.
+    - bool: True jika partisi ada dan dilepas.
     """
     schema = config.SCHEMA_RAW
+    partition = f'"{schema}"."{month_partition_name(table_name, month)}"'
+    with engine.begin() as conn:
+        attached = conn.execute(text("""
+            SELECT 1 FROM pg_inherits WHERE inhrelid = to_regclass(:p) AND inhparent = to_regclass(:parent)
+        """), {"p": partition, "parent": f'"{schema}"."{table_name}"'}).scalar()
+        if not attached:
+            log(f"Partition {partition} not attached, nothing to detach", "WARNING")
+            return False
+        conn.execute(text(f'ALTER TABLE "{schema}"."{table_name}" DETACH PARTITION {partition}'))
+        if drop:
+            conn.execute(text(f"DROP TABLE {partition}"))
+    PARTITIONS_READY.discard((table_name, month))
+    log(f"Detached partition {partition}" + (" and dropped it" if drop else ""))
+    return True
+
+
+def apply_raw_retention(table_name, engine):
+    """
+    Lepas partisi bulanan RAW table di luar jendela retensi (config.RAW_RETENTION_MONTHS).
+
+    Parameters:
+    - table_name (str): Nama RAW table (parent).
+    - engine (SQLAlchemy engine): Koneksi ke database.
+
+    Behavior:
+    - Jendela dihitung dari partisi bulan terbaru yang ter-attach (bukan tanggal hari ini),
+      sehingga backfill bulan lama tidak langsung terlepas.
+    - Partisi default tidak pernah dilepas.
+    - Setiap partisi dilepas lewat detach_month_partition; drop mengikuti config.RAW_RETENTION_DROP.
+
+    Returns:
+    - list[str]: Bulan ('YYYY-MM') yang dilepas.
+    """
+    keep = config.RAW_RETENTION_MONTHS
+    if keep <= 0:
+        return []
+
+    prefix = f"{table_name}_"
+    with engine.connect() as conn:
+        names = conn.execute(text("""
+            SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+            WHERE i.inhparent = to_regclass(:parent)
+        """), {"parent": f'"{config.SCHEMA_RAW}"."{table_name}"'}).scalars().all()
+
+    months = sorted(
+        f"{name[-6:-2]}-{name[-2:]}" for name in names
+        if name.startswith(prefix) and len(name) == len(prefix) + 6 and name[-6:].isdigit()
+    )
+    expired = months[:-keep]
+    for month in expired:
+        detach_month_partition(table_name, month, engine, drop=config.RAW_RETENTION_DROP)
+    if expired:
+        log(f"Retention {table_name}: kept {keep} month partition(s), detached {len(expired)}")
+    return expired
+
+
+# RAW table yang sudah dicek/di-backfill ke load ledger di proses ini
+LEDGER_BACKFILLED = set()
+
+
+def ensure_load_ledger(table_name, engine):
+    """
+    Pastikan tabel 'load_ledger' sudah berisi file lama dari RAW table.
+
+    Columns (dibuat oleh migrasi 003, lihat migrations.py):
+    - table_name (TEXT), file_name (TEXT): nilai source_file; UNIQUE (table_name, file_name)
+    - checksum (TEXT): md5 isi staging file
+    - row_count (BIGINT), status (VARCHAR(10): 'LOADED' / 'PARTIAL' / 'FAILED'), loaded_at (TIMESTAMP)
+    - rows_committed (BIGINT): jumlah baris staging file yang sudah di-commit (checkpoint chunk)
+
+    Behavior:
+    - Backfill satu kali per RAW table: jika ledger belum punya baris untuk table_name,
+      isi dari SELECT source_file, COUNT(*) ... GROUP BY source_file (status 'LOADED').
+
+    Parameters:
+    - table_name (str): Nama RAW table.
+    - engine (SQLAlchemy engine): Koneksi ke database.
+
+    Returns: None
+    """
+    if table_name in LEDGER_BACKFILLED:
+        return
+
+    migrations.migrate(engine)
+    schema = config.SCHEMA_RAW
     full_table = f'"{schema}"."{table_name}"'
+    with engine.connect() as conn:
+        has_rows = conn.execute(text(f"""
+        SELECT 1 FROM "{schema}".load_ledger WHERE table_name = :table LIMIT 1
+        """), {"table": table_name}).fetchone()
+        raw_exists = conn.execute(text("SELECT to_regclass(:full_table)"), {"full_table": full_table}).scalar()
+
+        if not has_rows and raw_exists:
+            result = conn.execute(text(f"""
+            INSERT INTO "{schema}".load_ledger (table_name, file_name, row_count, status)
+            SELECT :table, source_file, COUNT(*), 'LOADED'
+            FROM {full_table}
+            WHERE source_file IS NOT NULL
+            GROUP BY source_file
+            ON CONFLICT (table_name, file_name) DO NOTHING
+            """), {"table": table_name})
+            if result.rowcount:
+                log(f"Backfilled load_ledger with {result.rowcount:,} files from {full_table}")
+        conn.commit()
+
+    LEDGER_BACKFILLED.add(table_name)
+
+
+def get_loaded_files(table_name, file_names, engine):
+    """
+    Ambil file (source_file) yang sudah berstatus 'LOADED' di load ledger.
+
+    Parameters:
+    - table_name (str): Nama RAW table.
+    - file_names (iterable[str]): Nilai source_file yang ingin dicek.
+    - engine (SQLAlchemy engine): Koneksi ke database.
+
+    Returns:
+    - set[str]: Subset file_names yang sudah di-load.
+    """
+    file_names = list(file_names)
+    if not file_names:
+        return set()
+    with engine.connect() as conn:
+        rows = conn.execute(text(f"""
+        SELECT file_name FROM "{config.SCHEMA_RAW}".load_ledger
+        WHERE table_name = :table AND file_name = ANY(:names) AND status = 'LOADED'
+        """), {"table": table_name, "names": file_names}).fetchall()
+    return {row[0] for row in rows}
+
+
+def record_loads(cur, table_name, row_counts, checksum=None):
+    """
+    Catat file yang berhasil di-load ke load ledger, di transaksi yang sama dengan load.
+
+    Parameters:
+    - cur: Cursor psycopg2 dari koneksi yang sedang melakukan load (belum commit).
+    - table_name (str): Nama RAW table.
+    - row_counts (dict): {source_file: jumlah baris (None jika tidak diketahui)}.
+    - checksum (str, optional): Checksum staging file.
+
+    Returns: None
+    """
+    for file_name, row_count in row_counts.items():
+        cur.execute(f"""
+        INSERT INTO "{config.SCHEMA_RAW}".load_ledger
+            (table_name, file_name, checksum, row_count, status, rows_committed)
+        VALUES (%(table)s, %(fname)s, %(checksum)s, %(rows)s, 'LOADED', COALESCE(%(rows)s, 0))
+        ON CONFLICT (table_name, file_name) DO UPDATE
+        SET checksum = EXCLUDED.checksum, row_count = EXCLUDED.row_count,
+            status = 'LOADED', rows_committed = EXCLUDED.rows_committed, loaded_at = NOW()
+        """, {"table": table_name, "fname": file_name, "checksum": checksum,
+              "rows": int(row_count) if row_count is not None else None})
+
+
+def record_checkpoint(cur, table_name, file_names, rows_committed, checksum=None):
+    """
+    Catat checkpoint chunk (offset baris yang sudah di-commit) di transaksi yang sama dengan chunk.
+
+    Parameters:
+    - cur: Cursor psycopg2 dari transaksi chunk (belum commit).
+    - table_name (str): Nama RAW table.
+    - file_names (iterable[str]): Nilai source_file di staging file.
+    - rows_committed (int): Total baris staging file yang sudah di-commit termasuk chunk ini.
+    - checksum (str, optional): Checksum staging file.
+
+    Returns: None
+    """
+    for file_name in file_names:
+        cur.execute(f"""
+        INSERT INTO "{config.SCHEMA_RAW}".load_ledger (table_name, file_name, checksum, status, rows_committed)
+        VALUES (%(table)s, %(fname)s, %(checksum)s, 'PARTIAL', %(rows)s)
+        ON CONFLICT (table_name, file_name) DO UPDATE
+        SET checksum = EXCLUDED.checksum, status = 'PARTIAL',
+            rows_committed = EXCLUDED.rows_committed, loaded_at = NOW()
+        """, {"table": table_name, "fname": file_name, "checksum": checksum, "rows": int(rows_committed)})
+
+
+def get_checkpoint(table_name, file_names, checksum, engine):
+    """
+    Ambil offset resume (baris yang sudah di-commit) untuk staging file yang belum selesai.
+
+    Parameters:
+    - table_name (str): Nama RAW table.
+    - file_names (iterable[str]): Nilai source_file di staging file.
+    - checksum (str): Checksum staging file saat ini.
+    - engine (SQLAlchemy engine): Koneksi ke database.
+
+    Behavior:
+    - Hanya baris 'PARTIAL'/'FAILED' dengan rows_committed > 0 yang dipakai.
+    - Jika checksum berbeda (staging file berubah sejak load parsial), raise ValueError:
+      resume tidak aman dan load ulang akan menduplikasi baris.
+
+    Returns:
+    - int: Jumlah baris yang di-skip saat resume (0 jika mulai dari awal).
+    """
+    file_names = list(file_names)
+    with engine.connect() as conn:
+        rows = conn.execute(text(f"""
+        SELECT file_name, rows_committed, checksum FROM "{config.SCHEMA_RAW}".load_ledger
+        WHERE table_name = :table AND file_name = ANY(:names)
+          AND status IN ('PARTIAL', 'FAILED') AND rows_committed > 0
+        """), {"table": table_name, "names": file_names}).fetchall()
+    if not rows:
+        return 0
+    if any(row[2] != checksum for row in rows):
+        raise ValueError(f"staging file changed since partial load of {rows[0][0]} "
+                         f"({rows[0][1]:,} rows committed), cannot resume")
+    return min(row[1] for row in rows)
+
+
+def mark_load_failed(table_name, file_names, engine, checksum=None):
+    """
+    Tandai file yang gagal di-load sebagai 'FAILED' (file yang sudah 'LOADED' tidak diubah).
 
+    Parameters:
+    - table_name (str): Nama RAW table.
+    - file_names (iterable[str]): Nilai source_file.
+    - engine (SQLAlchemy engine): Koneksi ke database.
+    - checksum (str, optional): Checksum staging file.
+
+    Returns: None
+    """
     try:
         with engine.connect() as conn:
-            q = text(f'SELECT 1 FROM {full_table} WHERE source_file = :fname LIMIT 1')
-            return conn.execute(q, {"fname": filename}).fetchone() is not None
+            for file_name in file_names:
+                conn.execute(text(f"""
+                INSERT INTO "{config.SCHEMA_RAW}".load_ledger (table_name, file_name, checksum, status)
+                VALUES (:table, :fname, :checksum, 'FAILED')
+                ON CONFLICT (table_name, file_name) DO UPDATE
+                SET status = 'FAILED', checksum = EXCLUDED.checksum, loaded_at = NOW()
+                WHERE load_ledger.status <> 'LOADED'
+                """), {"table": table_name, "fname": file_name, "checksum": checksum})
+            conn.commit()
     except Exception as e:
-        log(f"Error checking duplicate file {filename}: {e}", "ERROR")
-        return False
+        log(f"Error marking failed load in load_ledger: {e}", "ERROR")
 
 
-def create_parquet_tracking_table():
+def create_stage_table(table_name, stage_name, engine):
     """
-    Pastikan tabel 'parquet_tracking' ada di database dengan struktur standar.
-    
-    Columns:
-    - id (SERIAL PRIMARY KEY)
-    - file_name (TEXT UNIQUE)
-    - month (VARCHAR(7))
-    - status (VARCHAR(10), default 'DONE')
-    - processed_time (TIMESTAMP, default NOW())
+    Buat (ulang) UNLOGGED stage table dengan struktur yang sama seperti RAW table.
+
+    Parameters:
+    - table_name (str): Nama RAW table tujuan (harus sudah ada).
+    - stage_name (str): Nama stage table, misal "yellow_tripdata_stage_202501".
+    - engine (SQLAlchemy engine): Koneksi ke database.
+
+    Behavior:
+    - Stage lama (sisa load yang gagal) di-drop dulu, lalu CREATE UNLOGGED TABLE ... (LIKE ...).
+    - UNLOGGED: insert ke stage tidak menulis WAL; isi stage hilang jika server crash,
+      yang aman karena stage hanya dipakai sampai publish (lihat publish_stage_table).
 
     Returns: None
     """
-    with config.engine.connect() as conn:
+    schema = config.SCHEMA_RAW
+    with engine.begin() as conn:
+        conn.execute(text(f'DROP TABLE IF EXISTS "{schema}"."{stage_name}"'))
         conn.execute(text(f"""
-        CREATE TABLE IF NOT EXISTS "{config.SCHEMA_RAW}".parquet_tracking (
-            id SERIAL PRIMARY KEY,
-            file_name TEXT NOT NULL UNIQUE,
-            month VARCHAR(7) NOT NULL,
-            status VARCHAR(10) NOT NULL DEFAULT 'DONE',
-            processed_time TIMESTAMP DEFAULT NOW()
-        )
+        CREATE UNLOGGED TABLE "{schema}"."{stage_name}"
+        (LIKE "{schema}"."{table_name}" INCLUDING DEFAULTS)
         """))
-        conn.commit()
+
+
+def drop_stage_table(stage_name, engine):
+    """Drop stage table (cleanup setelah load gagal)."""
+    with engine.begin() as conn:
+        conn.execute(text(f'DROP TABLE IF EXISTS "{config.SCHEMA_RAW}"."{stage_name}"'))
+
+
+def count_rows(table_name, engine):
+    """Hitung jumlah baris RAW/stage table."""
+    with engine.connect() as conn:
+        return conn.execute(text(f'SELECT COUNT(*) FROM "{config.SCHEMA_RAW}"."{table_name}"')).scalar()
+
+
+def count_month_rows(table_name, month, engine):
+    """
+    Hitung baris RAW table untuk satu bulan pickup (partition pruning ke partisi bulan itu).
+
+    Returns:
+    - int | None: Jumlah baris, None jika tabel tidak dipartisi (partition key tidak diketahui).
+    """
+    start, end = month_bounds(month)
+    with engine.connect() as conn:
+        key = get_partition_key(table_name, conn)
+        if key is None:
+            return None
+        return conn.execute(text(f"""
+            SELECT COUNT(*) FROM "{config.SCHEMA_RAW}"."{table_name}" WHERE "{key}" >= :start AND "{key}" < :end
+        """), {"start": start, "end": end}).scalar()
+
+
+def publish_stage_table(stage_name, table_name, month, engine, before_commit=None):
+    """
+    Publish isi stage table ke RAW table dalam satu transaksi.
+
+    Parameters:
+    - stage_name (str): Nama stage table.
+    - table_name (str): Nama RAW table tujuan.
+    - month (str): Bulan stage, format 'YYYY-MM'.
+    - engine (SQLAlchemy engine): Koneksi ke database.
+    - before_commit (callable, optional): Dipanggil dengan cursor psycopg2 sebelum commit
+      (misal record_loads ke load ledger).
+
+    Behavior:
+    - RAW table berpartisi dan partisi bulan belum ada (serta partisi DEFAULT tidak berisi
+      baris bulan tersebut): stage menjadi partisi bulan itu — SET LOGGED, rename ke
+      "<table>_YYYYMM", lalu ATTACH PARTITION. Baris tidak ditulis ulang; WAL hanya dari
+      SET LOGGED (satu kali isi tabel, tanpa WAL jika wal_level=minimal). Baris stage di
+      luar bulan (staging tanpa PARQUET_MONTH_FILTER) dipindah lewat parent lebih dulu.
+    - Selain itu (tabel tidak dipartisi atau bulan sudah berisi data): INSERT ... SELECT *
+      ke RAW table lalu DROP stage.
+    - Publish dan pencatatan ledger di-commit bersama: reader tidak pernah melihat
+      bulan yang setengah ter-load.
+
+    Returns:
+    - int: Jumlah baris yang di-publish.
+    """
+    schema = config.SCHEMA_RAW
+    parent = f'"{schema}"."{table_name}"'
+    stage = f'"{schema}"."{stage_name}"'
+    partition_name = month_partition_name(table_name, month)
+    default = f'"{schema}"."{table_name}_default"'
+    start, end = month_bounds(month)
+
+    with engine.connect() as conn:
+        key = get_partition_key(table_name, conn)
+        attach = key is not None and not conn.execute(
+            text("SELECT to_regclass(:p)"), {"p": f'"{schema}"."{partition_name}"'}
+        ).scalar()
+        if attach and conn.execute(text("SELECT to_regclass(:p)"), {"p": default}).scalar():
+            attach = not conn.execute(text(f"""
+                SELECT 1 FROM {default} WHERE "{key}" >= :start AND "{key}" < :end LIMIT 1
+            """), {"start": start, "end": end}).scalar()
+    if key is not None and not attach:
+        ensure_month_partition(table_name, month, engine)
+
+    with engine.begin() as conn:
+        if attach:
+            outside = f'"{key}" IS NULL OR NOT ("{key}" >= :start AND "{key}" < :end)'
+            rows = conn.execute(text(f"INSERT INTO {parent} SELECT * FROM {stage} WHERE {outside}"),
+                                {"start": start, "end": end}).rowcount
+            if rows:
+                conn.execute(text(f"DELETE FROM {stage} WHERE {outside}"), {"start": start, "end": end})
+            rows += conn.execute(text(f"SELECT COUNT(*) FROM {stage}")).scalar()
+            conn.execute(text(f"ALTER TABLE {stage} SET LOGGED"))
+            conn.execute(text(f'ALTER TABLE {stage} RENAME TO "{partition_name}"'))
+            conn.execute(text(
+                f'ALTER TABLE {parent} ATTACH PARTITION "{schema}"."{partition_name}" '
+                f"FOR VALUES FROM ('{start}') TO ('{end}')"
+            ))
+        else:
+            rows = conn.execute(text(f"INSERT INTO {parent} SELECT * FROM {stage}")).rowcount
+            conn.execute(text(f"DROP TABLE {stage}"))
+        if before_commit:
+            with conn.connection.cursor() as cur:
+                before_commit(cur)
+    if attach:
+        PARTITIONS_READY.add((table_name, month))
+        log(f'Stage attached as partition "{schema}"."{partition_name}"')
+    return rows
+
+
+def get_wal_level(engine):
+    """Setting wal_level server (minimal, replica atau logical)."""
+    with engine.connect() as conn:
+        return conn.execute(text("SHOW wal_level")).scalar()
+
+
+def get_wal_lsn(engine):
+    """Ambil posisi WAL saat ini (pg_current_wal_lsn) untuk mengukur volume WAL sebuah load."""
+    with engine.connect() as conn:
+        return conn.execute(text("SELECT pg_current_wal_lsn()::text")).scalar()
+
+
+def wal_bytes_since(lsn, engine):
+    """Jumlah byte WAL yang ditulis sejak lsn (pg_wal_lsn_diff)."""
+    with engine.connect() as conn:
+        return conn.execute(text("SELECT pg_wal_lsn_diff(pg_current_wal_lsn(), CAST(:lsn AS pg_lsn))"),
+                            {"lsn": lsn}).scalar()
 
 
 def get_last_processed_month():
@@ -124,7 +523,7 @@ def get_last_processed_month():
     Returns:
     - str: Bulan terakhir yang diproses dalam format 'YYYY-MM', atau None jika belum ada data.
     """
-    create_parquet_tracking_table()
+    migrations.migrate()
     with config.engine.connect() as conn:
         q = text(f"""
         SELECT month FROM "{config.SCHEMA_RAW}".parquet_tracking
@@ -148,7 +547,7 @@ def mark_parquet_done(file_name):
     - Menentukan bulan dari nama file.
     - Insert atau update status file menjadi 'DONE'.
     """
-    create_parquet_tracking_table()
+    migrations.migrate()
     month = file_name.split("_")[-1].replace(".parquet", "")
 
     with config.engine.connect() as conn:
@@ -162,54 +561,42 @@ def mark_parquet_done(file_name):
         conn.commit()
 
 
-def migrate_parquet_tracking():
+def mark_parquet_downloaded(file_name):
     """
-    Migrasi tabel 'raw.parquet_tracking' lama ke struktur baru:
-    - Tambahkan kolom month dan processed_time jika belum ada.
-    - Isi month dari file_name jika kosong.
-    - Tambahkan UNIQUE constraint pada file_name jika belum ada.
+    Tandai file parquet sudah di-download tapi belum diproses (mode backfill).
 
-    Returns: None
+    Parameters:
+    - file_name (str): Path file parquet yang di-download.
+
+    Behavior:
+    - Insert status 'DOWNLOADED'; file yang sudah 'DONE' tidak diturunkan statusnya.
     """
+    migrations.migrate()
+    month = file_name.split("_")[-1].replace(".parquet", "")
+
     with config.engine.connect() as conn:
-        log("=== ADD COLUMN month IF NOT EXISTS ===")
-        conn.execute(text("""
-        ALTER TABLE raw.parquet_tracking
-        ADD COLUMN IF NOT EXISTS month VARCHAR(7)
-        """))
+        q = text(f"""
+        INSERT INTO "{config.SCHEMA_RAW}".parquet_tracking (file_name, month, status)
+        VALUES (:fname, :month, 'DOWNLOADED')
+        ON CONFLICT (file_name) DO UPDATE
+        SET status='DOWNLOADED', processed_time=NOW()
+        WHERE parquet_tracking.status <> 'DONE'
+        """)
+        conn.execute(q, {"fname": file_name, "month": month})
         conn.commit()
 
-        log("=== ADD COLUMN processed_time IF NOT EXISTS ===")
-        conn.execute(text("""
-        ALTER TABLE raw.parquet_tracking
-        ADD COLUMN IF NOT EXISTS processed_time TIMESTAMP DEFAULT NOW()
-        """))
-        conn.commit()
 
-        log("=== POPULATE month COLUMN FROM file_name ===")
-        conn.execute(text("""
-        UPDATE raw.parquet_tracking
-        SET month = replace(split_part(file_name, '_', 3), '.parquet', '')
-        WHERE month IS NULL
-        """))
-        conn.commit()
-
-        log("=== ADD UNIQUE CONSTRAINT ON file_name ===")
-        result = conn.execute(text("""
-        SELECT 1 
-        FROM information_schema.table_constraints
-        WHERE table_schema='raw' AND table_name='parquet_tracking' 
-        AND constraint_type='UNIQUE' AND constraint_name='parquet_tracking_file_name_unique'
-        """)).fetchone()
-
-        if not result:
-            conn.execute(text("""
-            ALTER TABLE raw.parquet_tracking
-            ADD CONSTRAINT parquet_tracking_file_name_unique UNIQUE (file_name)
-            """))
-            conn.commit()
-            log("UNIQUE constraint added to file_name")
-        else:
-            log("UNIQUE constraint on file_name already exists")
+def get_done_months():
+    """
+    Ambil semua bulan yang sudah selesai diproses dari tabel 'parquet_tracking'.
 
-        log("=== Migration complete ===")
+    Returns:
+    - set[str]: Bulan format 'YYYY-MM' dengan status 'DONE'.
+    """
+    migrations.migrate()
+    with config.engine.connect() as conn:
+        rows = conn.execute(text(f"""
+        SELECT DISTINCT month FROM "{config.SCHEMA_RAW}".parquet_tracking
+        WHERE status='DONE'
+        """)).fetchall()
+    return {row[0] for row in rows}
@@ -1,21 +1,246 @@
-import os, requests
-from bs4 import BeautifulSoup
+import os, time, requests
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from .logger import log
-from . import config
-from .db_utils import mark_parquet_done, get_last_processed_month
+from . import config, http_cache
+from .db_utils import mark_parquet_done, mark_parquet_downloaded, get_last_processed_month, get_done_months
+
+def next_month(month):
+    """
+    Hitung bulan berikutnya.
+
+    Parameters:
+    - month (str): Bulan format 'YYYY-MM'.
+
+    Returns:
+    - str: Bulan berikutnya format 'YYYY-MM'.
+    """
+    year, month = map(int, month.split("-"))
+    if month == 12:
+        year += 1
+        month = 1
+    else:
+        month += 1
+    return f"{year:04d}-{month:02d}"
+
+
+def month_range(start_month, end_month):
+    """
+    List semua bulan dari start_month sampai end_month (inklusif).
+
+    Parameters:
+    - start_month (str): Bulan awal 'YYYY-MM'.
+    - end_month (str): Bulan akhir 'YYYY-MM'.
+
+    Returns:
+    - list[str]: Bulan-bulan format 'YYYY-MM' (urut).
+    """
+    months = []
+    month = start_month
+    while month <= end_month:
+        months.append(month)
+        month = next_month(month)
+    return months
+
+
+def find_month_links(link_index, month):
+    """
+    Pilih link yellow dan green untuk satu bulan.
+
+    Parameters:
+    - link_index (dict): {month: {color: url}} dari http_cache.fetch_link_index.
+    - month (str): Bulan format 'YYYY-MM'.
+
+    Returns:
+    - list[tuple]: [(link, color), ...] hanya untuk link yang ditemukan.
+    """
+    month_links = link_index.get(month, {})
+    return [(month_links[color], color) for color in ("yellow", "green") if color in month_links]
+
+
+def validate_parquet(path, expected_size=None):
+    """
+    Validasi file parquet hasil download dengan membaca footer-nya.
+
+    Parameters:
+    - path (str): File parquet (atau .part).
+    - expected_size (int, optional): Ukuran file dari server (Content-Length/Content-Range).
+
+    Behavior:
+    - Ukuran file harus sama dengan expected_size (jika diketahui).
+    - Footer parquet harus terbaca (row count dan schema), dan schema harus
+      punya kolom pickup datetime (tpep_/lpep_).
+
+    Returns:
+    - int: Jumlah baris di file. Raise ValueError jika file tidak valid.
+    """
+    size = os.path.getsize(path)
+    if expected_size is not None and size != expected_size:
+        raise ValueError(f"size mismatch: {size:,} bytes, expected {expected_size:,}")
+    import pyarrow.parquet as pq
+    try:
+        metadata = pq.ParquetFile(path).metadata
+    except Exception as e:
+        raise ValueError(f"unreadable parquet footer — {e}")
+    if not any(name.endswith("pickup_datetime") for name in metadata.schema.names):
+        raise ValueError("pickup datetime column not found in parquet schema")
+    return metadata.num_rows
+
+
+def fetch_to_part(link, part, chunk_size):
+    """
+    Download (atau lanjutkan) isi link ke file .part dengan HTTP Range.
+
+    Parameters:
+    - link (str): URL file parquet.
+    - part (str): Path file .part.
+    - chunk_size (int): Ukuran buffer iter_content (bytes).
+
+    Behavior:
+    - Validator (ETag/Last-Modified) response 200 disimpan di samping .part
+      (http_cache.parquet_meta_path(part)).
+    - Jika .part sudah ada, request "Range: bytes=<size>-" dengan If-Range validator
+      tersebut dan append (206). Jika file di server sudah berubah, server membalas
+      200 dan .part ditulis ulang dari awal (byte baru tidak disambung ke byte lama).
+    - .part tanpa validator tersimpan, atau 206 dengan ETag berbeda, dimulai dari nol.
+    - 416 (range di luar file) berarti .part sudah lengkap.
+
+    Returns:
+    - dict: Validator HTTP {"etag", "last_modified", "size"}; size = total ukuran
+      file menurut server (None jika tidak diketahui).
+    """
+    part_meta = http_cache.parquet_meta_path(part)
+    offset = os.path.getsize(part) if os.path.exists(part) else 0
+    cached = http_cache.read_json(part_meta) if offset else None
+    if_range = http_cache.if_range_value(cached)
+    if offset and not if_range:
+        log(f"No validator saved for {os.path.basename(part)}, downloading from the start", "WARNING")
+        offset = 0
+    headers = {"Range": f"bytes={offset}-", "If-Range": if_range} if offset else {}
+
+    with requests.get(link, stream=True, timeout=60, headers=headers) as r:
+        meta = http_cache.validators(r.headers)
+        if r.status_code == 416:
+            total = r.headers.get("Content-Range", "").rpartition("/")[2]
+            return {**meta, "size": int(total) if total.isdigit() else None}
+        r.raise_for_status()
+
+        if r.status_code == 206 and meta["etag"] and cached.get("etag") and meta["etag"] != cached["etag"]:
+            os.remove(part)
+            raise ValueError(f"ETag changed on server ({cached['etag']} → {meta['etag']}), restarting")
+
+        if r.status_code == 206:
+            log(f"Resuming {os.path.basename(part)} from byte {offset:,}")
+            total = r.headers.get("Content-Range", "").rpartition("/")[2]
+            total = int(total) if total.isdigit() else None
+            mode = "ab"
+        else:
+            if offset:
+                log(f"{os.path.basename(part)} changed on server or Range not supported, downloading from the start",
+                    "WARNING")
+            length = r.headers.get("Content-Length")
+            total = int(length) if length and length.isdigit() else None
+            mode = "wb"
+            http_cache.write_json(part_meta, meta)
+
+        with open(part, mode) as f:
+            for chunk in r.iter_content(chunk_size):
+                f.write(chunk)
+    return {**meta, "size": total}
+
+
+def download_file(link, filename, chunk_size=None, retries=None):
+    """
+    Download satu file parquet secara resumable dan tervalidasi.
+
+    Parameters:
+    - link (str): URL file parquet.
+    - filename (str): Path tujuan lokal.
+    - chunk_size (int, optional): Ukuran buffer iter_content (bytes). Default: config.DOWNLOAD_CHUNK_SIZE.
+    - retries (int, optional): Jumlah percobaan (resume) jika koneksi putus. Default: config.DOWNLOAD_RETRIES.
+
+    Behavior:
+    - Data ditulis ke filename + ".part"; jika koneksi putus/timeout, percobaan
+      berikutnya (atau run berikutnya) melanjutkan dari ukuran .part.
+    - Antar percobaan ada jeda DOWNLOAD_RETRY_BACKOFF * 2^(n-1) detik (exponential backoff).
+    - Sebelum rename atomic (os.replace) ke filename, ukuran dan footer parquet
+      divalidasi (validate_parquet). .part yang tidak valid dihapus.
+    - File lama yang sudah ada tapi tidak valid (misal terpotong) dipindah ke .part
+      dan dilanjutkan.
+    - File yang sudah ada dan valid hanya di-download ulang jika ETag/ukuran di
+      server berubah (HEAD, lihat http_cache.is_parquet_unchanged).
+
+    Returns:
+    - str: filename jika berhasil (atau sudah ada dan valid), None jika gagal.
+    """
+    chunk_size = chunk_size or config.DOWNLOAD_CHUNK_SIZE
+    retries = retries or config.DOWNLOAD_RETRIES
+    part = filename + ".part"
+
+    if os.path.exists(filename):
+        try:
+            validate_parquet(filename)
+        except ValueError as e:
+            log(f"Existing file {filename} is invalid ({e}), resuming download", "WARNING")
+            os.replace(filename, part)
+            cached = http_cache.read_json(http_cache.parquet_meta_path(filename))
+            if cached:
+                http_cache.write_json(http_cache.parquet_meta_path(part), cached)
+        else:
+            if http_cache.is_parquet_unchanged(link, filename):
+                log(f"Skipping download (exists, unchanged): {filename}")
+                return filename
+            log(f"{link} changed on server, downloading again", "WARNING")
+            if os.path.exists(part):
+                os.remove(part)
+
+    log(f"Downloading {link} -> {filename}")
+    for attempt in range(1, retries + 1):
+        if attempt > 1:
+            wait = config.DOWNLOAD_RETRY_BACKOFF * 2 ** (attempt - 2)
+            log(f"Retrying {link} in {wait:.1f}s (attempt {attempt}/{retries})", "WARNING")
+            time.sleep(wait)
+        try:
+            meta = fetch_to_part(link, part, chunk_size)
+            total = meta["size"]
+        except Exception as e:
+            log(f"Download interrupted {link} (attempt {attempt}/{retries}) — {e}", "WARNING")
+            continue
+
+        if total is not None and os.path.getsize(part) < total:
+            log(f"Download incomplete {link} ({os.path.getsize(part):,}/{total:,} bytes, "
+                f"attempt {attempt}/{retries})", "WARNING")
+            continue
+
+        try:
+            rows = validate_parquet(part, total)
+        except ValueError as e:
+            log(f"Downloaded file {part} is invalid ({e}), discarding", "ERROR")
+            os.remove(part)
+            continue
+
+        os.replace(part, filename)
+        http_cache.save_parquet_meta(filename, link, meta)
+        if os.path.exists(http_cache.parquet_meta_path(part)):
+            os.remove(http_cache.parquet_meta_path(part))
+        log(f"Saved {filename} ({os.path.getsize(filename):,} bytes, {rows:,} rows)")
+        return filename
+
+    log(f"Failed downloading {link} after {retries} attempts", "ERROR")
+    return None
+
 
 def download_parquet_files():
     """
-    Download file parquet dari TLC (Taxi & Limousine Commission) untuk bulan berikutnya 
+    Download file parquet dari TLC (Taxi & Limousine Commission) untuk bulan berikutnya
     setelah bulan terakhir yang sudah diproses.
 
     Steps:
     1. Ambil bulan terakhir yang sudah diproses dari DB (via get_last_processed_month).
     2. Tentukan bulan berikutnya yang akan diproses.
-    3. Scrape halaman TLC untuk mendapatkan semua link parquet.
+    3. Ambil index link parquet TLC (conditional GET + cache lokal, lihat http_cache).
     4. Pilih link file yellow dan green sesuai bulan.
     5. Buat direktori lokal untuk menyimpan file (format: DOWNLOAD_DIR/YYYY-MM).
-    6. Download file jika belum ada di folder lokal.
+    6. Download file jika belum ada di folder lokal (atau berubah di server).
     7. Kembalikan bulan yang diproses dan list file yang berhasil di-download.
 
     Returns:
@@ -25,34 +250,16 @@ def download_parquet_files():
     - None jika gagal fetch halaman atau tidak ada link untuk bulan tersebut
     """
     last_month = get_last_processed_month()
-    if last_month:
-        year, month = map(int, last_month.split("-"))
-        if month == 12:
-            year += 1
-            month = 1
-        else:
-            month += 1
-        month_to_process = f"{year:04d}-{month:02d}"
-    else:
-        month_to_process = "2025-01"
+    month_to_process = next_month(last_month) if last_month else "2025-01"
 
     log(f"Processing month: {month_to_process}")
 
-    log("Fetching TLC data page...")
-    try:
-        response = requests.get(config.TLC_URL, timeout=30)
-        response.raise_for_status()
-    except Exception as e:
-        log(f"Failed to fetch TLC page — {e}", level="ERROR")
+    link_index = http_cache.fetch_link_index()
+    if link_index is None:
         return None
 
-    soup = BeautifulSoup(response.text, "html.parser")
-    all_links = [a["href"] for a in soup.find_all("a", href=True) if ".parquet" in a["href"]]
-
-    yellow_link = next((l for l in all_links if f"yellow_tripdata_{month_to_process}" in l), None)
-    green_link = next((l for l in all_links if f"green_tripdata_{month_to_process}" in l), None)
-
-    if not yellow_link and not green_link:
+    links = find_month_links(link_index, month_to_process)
+    if not links:
         log(f"No parquet links found for {month_to_process}", "ERROR")
         return None
 
@@ -61,25 +268,70 @@ def download_parquet_files():
 
     downloaded_files = []
 
-    for link, color in [(yellow_link, "yellow"), (green_link, "green")]:
-        if not link:
-            continue
-        filename = os.path.join(month_dir, os.path.basename(link))
-        if os.path.exists(filename):
-            log(f"Skipping download (exists): {filename}")
+    for link, color in links:
+        filename = download_file(link, os.path.join(month_dir, os.path.basename(link)))
+        if filename:
             downloaded_files.append(filename)
+
+    return month_to_process, downloaded_files
+
+
+def download_backfill(start_month, end_month, workers=None):
+    """
+    Download parquet yellow/green untuk banyak bulan sekaligus secara concurrent (mode backfill).
+
+    Parameters:
+    - start_month (str): Bulan awal 'YYYY-MM'.
+    - end_month (str): Bulan akhir 'YYYY-MM' (inklusif).
+    - workers (int, optional): Jumlah thread download. Default: config.DOWNLOAD_WORKERS.
+
+    Behavior:
+    - Index link TLC hanya diambil sekali untuk semua bulan (conditional GET, http_cache).
+    - Bulan yang sudah 'DONE' di parquet_tracking dilewati.
+    - Semua file di-download paralel dengan thread pool terbatas (I/O bound).
+    - File yang berhasil dicatat ke parquet_tracking dengan status 'DOWNLOADED',
+      sehingga Extractor bisa memproses bulan-bulan tersebut berurutan.
+
+    Returns:
+    - list[tuple]: [(month, downloaded_files), ...] urut per bulan, hanya bulan
+      dengan minimal satu file berhasil. None jika gagal fetch halaman.
+    """
+    workers = workers or config.DOWNLOAD_WORKERS
+    done_months = get_done_months()
+    months = [m for m in month_range(start_month, end_month) if m not in done_months]
+    skipped = len(month_range(start_month, end_month)) - len(months)
+    log(f"Backfill {start_month} → {end_month}: {len(months)} month(s) to download"
+        + (f", {skipped} already DONE" if skipped else ""))
+    if not months:
+        return []
+
+    link_index = http_cache.fetch_link_index()
+    if link_index is None:
+        return None
+
+    jobs = []
+    for month in months:
+        links = find_month_links(link_index, month)
+        if not links:
+            log(f"No parquet links found for {month}", "WARNING")
             continue
+        month_dir = os.path.join(config.DOWNLOAD_DIR, month)
+        os.makedirs(month_dir, exist_ok=True)
+        jobs.extend((month, link, os.path.join(month_dir, os.path.basename(link))) for link, _ in links)
 
-        log(f"Downloading {link} -> {filename}")
-        try:
-            with requests.get(link, stream=True, timeout=60) as r:
-                r.raise_for_status()
-                with open(filename, "wb") as f:
-                    for chunk in r.iter_content(8192):
-                        f.write(chunk)
-            log(f"Saved {filename}")
-            downloaded_files.append(filename)
-        except Exception as e:
-            log(f"Failed downloading {link} — {e}", "ERROR")
+    log(f"Downloading {len(jobs)} file(s) with {workers} worker(s)...")
+    downloaded = set()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(download_file, link, filename) for _, link, filename in jobs]
+        for future in as_completed(futures):
+            filename = future.result()
+            if filename:
+                mark_parquet_downloaded(filename)
+                downloaded.add(filename)
 
-    return month_to_process, downloaded_files
+    result = []
+    for month in months:
+        files = [filename for m, _, filename in jobs if m == month and filename in downloaded]
+        if files:
+            result.append((month, files))
+    return result
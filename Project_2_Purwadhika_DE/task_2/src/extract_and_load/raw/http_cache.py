@@ -0,0 +1,183 @@
+import os, re, json, requests
+from .logger import log
+from . import config
+
+PARQUET_LINK_PATTERN = re.compile(r"(yellow|green)_tripdata_(\d{4}-\d{2})\.parquet")
+
+
+def read_json(path):
+    """Baca file JSON cache, None jika belum ada atau rusak."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def write_json(path, data):
+    """Tulis file JSON cache secara atomic (tmp + os.replace)."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+    os.replace(tmp, path)
+
+
+def validators(headers):
+    """
+    Ambil validator HTTP dari response headers.
+
+    Returns:
+    - dict: {"etag", "last_modified", "size"} (None jika tidak ada di header).
+    """
+    size = headers.get("Content-Length")
+    return {
+        "etag": headers.get("ETag"),
+        "last_modified": headers.get("Last-Modified"),
+        "size": int(size) if size and size.isdigit() else None,
+    }
+
+
+def conditional_headers(cached):
+    """Buat header If-None-Match / If-Modified-Since dari entry cache."""
+    headers = {}
+    if cached and cached.get("etag"):
+        headers["If-None-Match"] = cached["etag"]
+    if cached and cached.get("last_modified"):
+        headers["If-Modified-Since"] = cached["last_modified"]
+    return headers
+
+
+def parse_link_index(html):
+    """
+    Parse halaman TLC menjadi index link parquet.
+
+    Parameters:
+    - html (str): Isi halaman TLC.
+
+    Returns:
+    - dict: {month: {color: url}}, misal {"2025-01": {"yellow": "...", "green": "..."}}.
+      Jika ada beberapa link untuk bulan/warna yang sama, link pertama dipakai.
+    """
+    from bs4 import BeautifulSoup  # hanya dibutuhkan saat halaman TLC berubah (bukan 304)
+    soup = BeautifulSoup(html, "html.parser")
+    index = {}
+    for a in soup.find_all("a", href=True):
+        match = PARQUET_LINK_PATTERN.search(a["href"])
+        if match:
+            color, month = match.groups()
+            index.setdefault(month, {}).setdefault(color, a["href"].strip())
+    return index
+
+
+def fetch_link_index(url=None):
+    """
+    Ambil index link parquet TLC dengan conditional GET.
+
+    Parameters:
+    - url (str, optional): URL halaman TLC. Default: config.TLC_URL.
+
+    Behavior:
+    - ETag/Last-Modified halaman terakhir disimpan di HTTP_CACHE_DIR/tlc_page.json
+      bersama index link yang sudah di-parse.
+    - 304 Not Modified → index dari cache dipakai tanpa download dan parse ulang.
+    - Jika halaman gagal di-fetch tapi cache ada, index cache dipakai (dengan warning).
+
+    Returns:
+    - dict | None: {month: {color: url}}, None jika gagal dan tidak ada cache.
+    """
+    url = url or config.TLC_URL
+    cache_path = os.path.join(config.HTTP_CACHE_DIR, "tlc_page.json")
+    cached = read_json(cache_path)
+    if cached and cached.get("url") != url:
+        cached = None
+
+    log("Fetching TLC data page...")
+    try:
+        response = requests.get(url, timeout=30, headers=conditional_headers(cached))
+        if response.status_code == 304 and cached:
+            log(f"TLC page not modified, using cached link index ({len(cached['links'])} months)")
+            return cached["links"]
+        response.raise_for_status()
+    except Exception as e:
+        if cached:
+            log(f"Failed to fetch TLC page — {e}; using cached link index", "WARNING")
+            return cached["links"]
+        log(f"Failed to fetch TLC page — {e}", level="ERROR")
+        return None
+
+    links = parse_link_index(response.text)
+    write_json(cache_path, {"url": url, **validators(response.headers), "links": links})
+    log(f"TLC page fetched, link index updated ({len(links)} months)")
+    return links
+
+
+def parquet_meta_path(filename):
+    """Path metadata cache untuk satu file parquet lokal."""
+    return os.path.join(config.HTTP_CACHE_DIR, "parquet", os.path.basename(filename) + ".json")
+
+
+def save_parquet_meta(filename, link, meta):
+    """
+    Simpan validator HTTP (ETag/Last-Modified/size) file parquet yang sudah di-download.
+
+    Parameters:
+    - filename (str): Path file parquet lokal.
+    - link (str): URL sumber.
+    - meta (dict): Hasil validators(); size diisi ukuran file lokal.
+
+    Returns: None
+    """
+    write_json(parquet_meta_path(filename), {**meta, "url": link, "size": os.path.getsize(filename)})
+
+
+def if_range_value(cached):
+    """
+    Nilai header If-Range dari validator yang tersimpan.
+
+    Returns:
+    - str | None: ETag kuat, atau Last-Modified jika ETag tidak ada/lemah (W/);
+      None jika tidak ada validator.
+    """
+    if not cached:
+        return None
+    etag = cached.get("etag")
+    if etag and not etag.startswith("W/"):
+        return etag
+    return cached.get("last_modified")
+
+
+def is_parquet_unchanged(link, filename):
+    """
+    Cek (HEAD) apakah file parquet di server masih sama dengan file lokal.
+
+    Parameters:
+    - link (str): URL file parquet.
+    - filename (str): Path file parquet lokal (sudah ada dan valid).
+
+    Behavior:
+    - Bandingkan ETag (jika ada di cache dan server), lalu ukuran file.
+    - Jika HEAD gagal, file lokal dianggap tidak berubah (tidak ada download ulang).
+    - File lama tanpa metadata cache dicatat ke cache jika ukurannya sama.
+
+    Returns:
+    - bool: True jika tidak perlu download ulang.
+    """
+    cached = read_json(parquet_meta_path(filename))
+    try:
+        response = requests.head(link, timeout=30, allow_redirects=True)
+        response.raise_for_status()
+    except Exception as e:
+        log(f"HEAD {link} failed — {e}; keeping local file", "WARNING")
+        return True
+
+    remote = validators(response.headers)
+    local_size = os.path.getsize(filename)
+    if cached and cached.get("etag") and remote["etag"]:
+        unchanged = cached["etag"] == remote["etag"]
+    else:
+        unchanged = remote["size"] is None or remote["size"] == local_size
+
+    if unchanged and not cached:
+        save_parquet_meta(filename, link, remote)
+    return unchanged
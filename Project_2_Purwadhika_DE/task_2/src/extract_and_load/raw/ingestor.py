@@ -0,0 +1,193 @@
+import io
+import os
+import hashlib
+import glob
+import time
+from datetime import datetime
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pacsv
+from .logger import log
+from .db_utils import (
+    ensure_table_exists, ensure_load_ledger, ensure_month_partition,
+    get_loaded_files, record_loads, mark_load_failed
+)
+from .splitter import source_file_prefix, process_parquet_batch, iter_parquet_batches, log_memory_report, file_month
+from . import config, schema_registry
+
+
+def with_entry_time(table, entry_time):
+    """
+    Tambahkan kolom entry_time (nilai konstan) ke pa.Table.
+
+    Parameters:
+    - table (pa.Table)
+    - entry_time (datetime): Waktu load.
+
+    Returns:
+    - pa.Table
+    """
+    return table.append_column(
+        "entry_time",
+        pc.fill_null(pa.nulls(table.num_rows, pa.timestamp("us")), pa.scalar(entry_time, pa.timestamp("us")))
+    )
+
+
+def file_checksum(paths, chunk_size=1024 * 1024):
+    """
+    Hitung checksum md5 isi satu atau beberapa file (misal semua part parquet satu hari).
+
+    Parameters:
+    - paths (list[str]): File yang di-hash berurutan.
+    - chunk_size (int): Ukuran buffer baca (bytes).
+
+    Returns:
+    - str: Hex digest md5.
+    """
+    digest = hashlib.md5()
+    for path in paths:
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(chunk_size), b""):
+                digest.update(chunk)
+    return digest.hexdigest()
+
+
+def filter_loaded_days(days, table_name, engine, loaded_cache):
+    """
+    Buang hari yang source_file-nya sudah pernah di-load (menurut load ledger).
+
+    Parameters:
+    - days (list): [(date_str, source_file, offset, length)] hasil process_parquet_batch.
+    - table_name (str): Nama RAW table.
+    - engine: SQLAlchemy engine.
+    - loaded_cache (dict): Cache {source_file: bool} agar tiap hari hanya dicek sekali.
+
+    Returns:
+    - list: Hari yang belum di-load.
+    """
+    new_labels = [day[1] for day in days if day[1] not in loaded_cache]
+    if new_labels:
+        loaded = get_loaded_files(table_name, new_labels, engine)
+        for label in new_labels:
+            loaded_cache[label] = label in loaded
+            if loaded_cache[label]:
+                log(f"Skipping {label}, already inserted based on load ledger.")
+    return [day for day in days if not loaded_cache[day[1]]]
+
+
+def copy_table(cur, table, table_name):
+    """
+    COPY satu pa.Table ke RAW table melalui buffer CSV in-memory (writer C++ Arrow).
+
+    Parameters:
+    - cur: Cursor psycopg2.
+    - table (pa.Table): Data yang akan di-load.
+    - table_name (str): Nama RAW table.
+
+    Returns: None
+    """
+    buf = io.BytesIO()
+    pacsv.write_csv(table, buf, pacsv.WriteOptions(include_header=False))
+    buf.seek(0)
+    column_list = ", ".join(f'"{c}"' for c in table.column_names)
+    cur.copy_expert(
+        f'COPY "{config.SCHEMA_RAW}"."{table_name}" ({column_list}) FROM STDIN WITH (FORMAT csv)',
+        buf
+    )
+
+
+def ingest_parquet_file(path, table_name, datetime_col, engine, batch_size=100000):
+    """
+    Load satu file parquet langsung ke RAW table tanpa CSV harian.
+
+    Parameters:
+    - path (str): File parquet.
+    - table_name (str): Nama RAW table.
+    - datetime_col (str): Nama kolom datetime pickup.
+    - engine: SQLAlchemy engine.
+    - batch_size (int): Jumlah baris per record batch.
+
+    Behavior:
+    - Baca parquet per record batch (iter_parquet_batches: column projection
+      dan filter bulan di-push-down), tambahkan kolom date/source_file
+      dengan kernel Arrow splitter dan entry_time, lalu COPY ke RAW table per hari.
+    - Seluruh file di-load dalam satu transaksi, bersama pencatatan load ledger
+      (satu baris per source_file, checksum = md5 file parquet).
+
+    Returns:
+    - int: Total rows inserted.
+    """
+    basename = os.path.basename(path)
+    prefix = source_file_prefix(basename)
+    entry_time = datetime.now()
+    loaded_cache = {}
+    memory = {}
+    row_counts = {}
+    total_rows = 0
+    checksum = file_checksum([path])
+    schema_registry.register_source_schema(table_name, [path])
+
+    raw_conn = engine.raw_connection()
+    try:
+        with raw_conn.cursor() as cur:
+            table_ready = False
+            for batch in iter_parquet_batches(path, datetime_col, batch_size, memory=memory):
+                table, days = process_parquet_batch(batch, datetime_col, prefix)
+                if not table_ready and table.num_rows:
+                    ensure_table_exists(table.slice(0, 5).to_pandas(), table_name, engine)
+                    ensure_month_partition(table_name, file_month(os.path.basename(path)).strftime("%Y-%m"), engine)
+                    ensure_load_ledger(table_name, engine)
+                    table_ready = True
+
+                for _, label, offset, length in filter_loaded_days(days, table_name, engine, loaded_cache):
+                    copy_table(cur, with_entry_time(table.slice(offset, length), entry_time), table_name)
+                    row_counts[label] = row_counts.get(label, 0) + length
+                    total_rows += length
+            record_loads(cur, table_name, row_counts, checksum)
+        raw_conn.commit()
+    except Exception:
+        raw_conn.rollback()
+        if row_counts:
+            mark_load_failed(table_name, row_counts, engine, checksum)
+        raise
+    finally:
+        raw_conn.close()
+
+    log_memory_report(basename, memory)
+    return total_rows
+
+
+def ingest_parquet_files(download_dir, engine, batch_size=100000):
+    """
+    Function utama mode ingest "parquet": load semua parquet di folder bulan langsung ke RAW table.
+
+    Parameters:
+    - download_dir (str): Folder tempat file parquet berada (DOWNLOAD_DIR/YYYY-MM).
+    - engine: SQLAlchemy engine.
+    - batch_size (int): Jumlah baris per record batch.
+
+    Returns: None
+    """
+    parquet_files = sorted(glob.glob(os.path.join(download_dir, "*.parquet")))
+    if not parquet_files:
+        log(f"No parquet files found in {download_dir}", level="ERROR")
+        return
+
+    for path in parquet_files:
+        basename = os.path.basename(path)
+        color = "yellow" if "yellow" in basename.lower() else "green"
+        datetime_col = "tpep_pickup_datetime" if color == "yellow" else "lpep_pickup_datetime"
+        table_name = config.folders[color]["table"]
+        full_table = f'"{config.SCHEMA_RAW}"."{table_name}"'
+
+        log(f"Ingesting {basename} directly into table {full_table}")
+        try:
+            start = time.perf_counter()
+            total_rows = ingest_parquet_file(path, table_name, datetime_col, engine, batch_size)
+            elapsed = time.perf_counter() - start
+            log(f"Inserted {total_rows:,} rows from {basename} in {elapsed:.2f}s "
+                f"({total_rows / max(elapsed, 1e-9):,.0f} rows/s)")
+        except Exception as e:
+            log(f"Error ingesting {basename}: {e}", "ERROR")
+
+    log("All parquet files ingested.")
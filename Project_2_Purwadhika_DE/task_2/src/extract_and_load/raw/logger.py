@@ -2,7 +2,6 @@ import os
 from datetime import datetime
 
 LOG_DIR = "resources/logs"
-os.makedirs(LOG_DIR, exist_ok=True)
 LOG_FILE = os.path.join(LOG_DIR, "extract_load.log")
 
 def log(message, level="INFO"):
@@ -23,6 +22,7 @@ def log(message, level="INFO"):
     """
     ts = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     line = f"[{ts}] [{level}] {message}"
+    os.makedirs(LOG_DIR, exist_ok=True)
     with open(LOG_FILE, "a", encoding="utf-8") as f:
         f.write(line + "\n")
 
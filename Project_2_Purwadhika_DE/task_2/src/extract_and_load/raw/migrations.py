@@ -0,0 +1,332 @@
+from sqlalchemy import text
+from .logger import log
+from . import config
+
+# Key pg_advisory_xact_lock agar dua proses tidak menjalankan migrasi yang sama bersamaan
+MIGRATION_LOCK_KEY = 727001
+
+
+def migration_001(schema):
+    """parquet_tracking dengan struktur standar."""
+    return [f"""
+    CREATE TABLE IF NOT EXISTS "{schema}".parquet_tracking (
+        id SERIAL PRIMARY KEY,
+        file_name TEXT NOT NULL UNIQUE,
+        month VARCHAR(7) NOT NULL,
+        status VARCHAR(10) NOT NULL DEFAULT 'DONE',
+        processed_time TIMESTAMP DEFAULT NOW()
+    )
+    """]
+
+
+def migration_002(schema):
+    """Upgrade parquet_tracking lama: kolom month/processed_time, isi month, UNIQUE file_name."""
+    return [
+        f'ALTER TABLE "{schema}".parquet_tracking ADD COLUMN IF NOT EXISTS month VARCHAR(7)',
+        f'ALTER TABLE "{schema}".parquet_tracking ADD COLUMN IF NOT EXISTS processed_time TIMESTAMP DEFAULT NOW()',
+        f"""
+        UPDATE "{schema}".parquet_tracking
+        SET month = replace(split_part(file_name, '_', 3), '.parquet', '')
+        WHERE month IS NULL
+        """,
+        f"""
+        DO $$
+        BEGIN
+            IF NOT EXISTS (
+                SELECT 1 FROM pg_constraint c
+                JOIN pg_attribute a ON a.attrelid = c.conrelid AND a.attname = 'file_name'
+                WHERE c.conrelid = '"{schema}".parquet_tracking'::regclass
+                  AND c.contype IN ('u', 'p') AND c.conkey = ARRAY[a.attnum]
+            ) THEN
+                ALTER TABLE "{schema}".parquet_tracking
+                ADD CONSTRAINT parquet_tracking_file_name_unique UNIQUE (file_name);
+            END IF;
+        END $$
+        """,
+    ]
+
+
+def migration_003(schema):
+    """load_ledger (source_file yang sudah di-load per RAW table) dengan checkpoint chunk."""
+    return [
+        f"""
+        CREATE TABLE IF NOT EXISTS "{schema}".load_ledger (
+            id SERIAL PRIMARY KEY,
+            table_name TEXT NOT NULL,
+            file_name TEXT NOT NULL,
+            checksum TEXT,
+            row_count BIGINT,
+            status VARCHAR(10) NOT NULL DEFAULT 'LOADED',
+            loaded_at TIMESTAMP DEFAULT NOW(),
+            rows_committed BIGINT NOT NULL DEFAULT 0,
+            UNIQUE (table_name, file_name)
+        )
+        """,
+        f'ALTER TABLE "{schema}".load_ledger ADD COLUMN IF NOT EXISTS rows_committed BIGINT NOT NULL DEFAULT 0',
+    ]
+
+
+def migration_004(schema):
+    """clean_watermark: entry_time RAW terakhir yang sudah di-clean per tabel (schema CLEAN)."""
+    return [f"""
+    CREATE TABLE IF NOT EXISTS "{config.SCHEMA_CLEAN}".clean_watermark (
+        table_name TEXT PRIMARY KEY,
+        last_entry_time TIMESTAMP,
+        rows_cleaned BIGINT NOT NULL DEFAULT 0,
+        mode VARCHAR(12) NOT NULL,
+        updated_at TIMESTAMP DEFAULT NOW()
+    )
+    """]
+
+
+def migration_005(schema):
+    """
+    Ubah RAW table lama (heap biasa) menjadi PARTITION BY RANGE (pickup) per bulan.
+
+    - Kandidat: tabel permanen di schema RAW dengan kolom *pickup_datetime (TIMESTAMP, atau
+      TEXT dari to_sql sample CSV lama) yang belum dipartisi (bukan partisi, stage UNLOGGED,
+      atau tabel hasil detach _YYYYMM).
+    - Tabel lama di-rename ke <table>_legacy, parent baru dibuat dengan kolom yang sama
+      (kolom *_datetime TEXT menjadi TIMESTAMP) beserta partisi DEFAULT dan satu partisi
+      per bulan yang ada di data, lalu semua baris dipindah dengan satu INSERT ... SELECT
+      (tuple routing, kolom TEXT di-cast ::timestamp) dan tabel lama di-drop.
+    - Satu kali tulis ulang seluruh RAW (lock eksklusif selama migrasi). Index di tabel
+      lama ikut hilang; index entry_time dibuat ulang oleh cleaner di parent baru.
+    - Jika config.RAW_PARTITIONED = false, migrasi belum berlaku (None): tidak dicatat,
+      sehingga dijalankan saat partisi diaktifkan.
+    """
+    if not config.RAW_PARTITIONED:
+        return None
+    return [f"""
+    DO $$
+    DECLARE
+        t record;
+        col record;
+        m date;
+        legacy text;
+        template text;
+        columns text;
+        pickup text;
+    BEGIN
+        FOR t IN
+            SELECT c.relname, a.attname, a.atttypid = 'text'::regtype AS is_text
+            FROM pg_class c
+            JOIN pg_namespace n ON n.oid = c.relnamespace
+            JOIN pg_attribute a ON a.attrelid = c.oid
+            WHERE n.nspname = '{schema}'
+              AND c.relkind = 'r' AND NOT c.relispartition AND c.relpersistence = 'p'
+              AND c.relname !~ '_([0-9]{{6}}|default|legacy)$'
+              AND a.attname LIKE '%pickup_datetime' AND NOT a.attisdropped
+              AND a.atttypid IN ('timestamp'::regtype, 'text'::regtype)
+        LOOP
+            legacy := t.relname || '_legacy';
+            template := t.relname || '_template';
+            EXECUTE format('ALTER TABLE %I.%I RENAME TO %I', '{schema}', t.relname, legacy);
+
+            -- Kolom parent: sama dengan tabel lama, *_datetime TEXT menjadi TIMESTAMP
+            EXECUTE format('CREATE TEMP TABLE %I (LIKE %I.%I INCLUDING DEFAULTS)', template, '{schema}', legacy);
+            columns := '';
+            FOR col IN
+                SELECT attname, atttypid = 'text'::regtype AND attname LIKE '%\\_datetime' AS to_timestamp
+                FROM pg_attribute
+                WHERE attrelid = format('%I.%I', '{schema}', legacy)::regclass AND attnum > 0 AND NOT attisdropped
+                ORDER BY attnum
+            LOOP
+                IF col.to_timestamp THEN
+                    EXECUTE format('ALTER TABLE %I ALTER COLUMN %I TYPE timestamp USING NULLIF(%I, '''')::timestamp',
+                                   template, col.attname, col.attname);
+                    columns := columns || format(', NULLIF(%I, '''')::timestamp', col.attname);
+                ELSE
+                    columns := columns || format(', %I', col.attname);
+                END IF;
+            END LOOP;
+            columns := substr(columns, 3);
+            pickup := CASE WHEN t.is_text THEN format('NULLIF(%I, '''')::timestamp', t.attname)
+                           ELSE quote_ident(t.attname) END;
+
+            EXECUTE format('CREATE TABLE %I.%I (LIKE %I INCLUDING DEFAULTS) PARTITION BY RANGE (%I)',
+                           '{schema}', t.relname, template, t.attname);
+            EXECUTE format('DROP TABLE %I', template);
+            EXECUTE format('CREATE TABLE %I.%I PARTITION OF %I.%I DEFAULT',
+                           '{schema}', t.relname || '_default', '{schema}', t.relname);
+            FOR m IN EXECUTE format(
+                'SELECT DISTINCT date_trunc(''month'', %s)::date FROM %I.%I WHERE %s IS NOT NULL ORDER BY 1',
+                pickup, '{schema}', legacy, pickup)
+            LOOP
+                EXECUTE format('CREATE TABLE %I.%I PARTITION OF %I.%I FOR VALUES FROM (%L) TO (%L)',
+                               '{schema}', t.relname || '_' || to_char(m, 'YYYYMM'), '{schema}', t.relname,
+                               m, (m + interval '1 month')::date);
+            END LOOP;
+            EXECUTE format('INSERT INTO %I.%I SELECT %s FROM %I.%I', '{schema}', t.relname, columns, '{schema}', legacy);
+            EXECUTE format('DROP TABLE %I.%I', '{schema}', legacy);
+            RAISE NOTICE 'Partitioned %.% by month on %', '{schema}', t.relname, t.attname;
+        END LOOP;
+    END $$
+    """]
+
+
+def migration_006(schema):
+    """
+    DEFAULT entry_time/source_file dari setting transaksi di RAW table yang sudah ada.
+
+    - Sama dengan DEFAULT tabel baru (schema_registry.METADATA_DEFAULTS), sehingga COPY
+      CSV apa adanya (uploader.copy_csv_into_table) tetap mengisi kedua kolom.
+    - Hanya parent/tabel biasa; SET DEFAULT di parent berlaku untuk insert lewat parent.
+      Hanya katalog, baris lama tidak ditulis ulang.
+    """
+    from .schema_registry import METADATA_DEFAULTS
+    sets = "".join(
+        f"""
+            IF EXISTS (SELECT 1 FROM pg_attribute WHERE attrelid = t.oid AND attname = '{name}' AND NOT attisdropped) THEN
+                EXECUTE format('ALTER TABLE %I.%I ALTER COLUMN {name} SET DEFAULT %s', '{schema}', t.relname, '{default.replace("'", "''")}');
+            END IF;"""
+        for name, default in METADATA_DEFAULTS.items()
+    )
+    return [f"""
+    DO $$
+    DECLARE
+        t record;
+    BEGIN
+        FOR t IN
+            SELECT c.oid, c.relname
+            FROM pg_class c
+            JOIN pg_namespace n ON n.oid = c.relnamespace
+            WHERE n.nspname = '{schema}' AND c.relkind IN ('r', 'p') AND NOT c.relispartition
+        LOOP{sets}
+        END LOOP;
+    END $$
+    """]
+
+
+def migration_007(schema):
+    """
+    Kolom *_datetime TEXT (RAW table lama dari to_sql sample CSV) menjadi TIMESTAMP.
+
+    - ALTER COLUMN ... TYPE timestamp USING NULLIF(col, '')::timestamp di parent/tabel biasa
+      (partisi ikut); satu kali tulis ulang tabel yang masih TEXT.
+    - Setelah ini clean layer membaca pickup/dropoff tanpa cast per baris, dan filter
+      range pickup bisa memangkas partisi.
+    """
+    return [f"""
+    DO $$
+    DECLARE
+        t record;
+    BEGIN
+        FOR t IN
+            SELECT c.relname, a.attname
+            FROM pg_class c
+            JOIN pg_namespace n ON n.oid = c.relnamespace
+            JOIN pg_attribute a ON a.attrelid = c.oid
+            WHERE n.nspname = '{schema}' AND c.relkind IN ('r', 'p') AND NOT c.relispartition
+              AND a.attname LIKE '%\\_datetime' AND a.atttypid = 'text'::regtype AND NOT a.attisdropped
+        LOOP
+            EXECUTE format('ALTER TABLE %I.%I ALTER COLUMN %I TYPE timestamp USING NULLIF(%I, '''')::timestamp',
+                           '{schema}', t.relname, t.attname, t.attname);
+            RAISE NOTICE 'Typed %.%.% as timestamp', '{schema}', t.relname, t.attname;
+        END LOOP;
+    END $$
+    """]
+
+
+# (version, description, fungsi yang menghasilkan list SQL untuk schema RAW, atau None jika belum berlaku).
+# Hanya boleh ditambah di akhir.
+MIGRATIONS = [
+    (1, "create parquet_tracking", migration_001),
+    (2, "upgrade legacy parquet_tracking", migration_002),
+    (3, "create load_ledger", migration_003),
+    (4, "create clean_watermark", migration_004),
+    (5, "partition legacy RAW tables by month", migration_005),
+    (6, "default RAW entry_time/source_file from load settings", migration_006),
+    (7, "type legacy TEXT RAW datetime columns as timestamp", migration_007),
+]
+
+# True jika schema sudah dicek up to date di proses ini
+MIGRATED = False
+
+
+def applied_versions(conn):
+    """Versi migrasi yang sudah tercatat di schema_migrations (kosong jika tabel belum ada)."""
+    exists = conn.execute(
+        text("SELECT to_regclass(:t)"), {"t": f'"{config.SCHEMA_RAW}".schema_migrations'}
+    ).scalar()
+    if not exists:
+        return set()
+    rows = conn.execute(text(f'SELECT version FROM "{config.SCHEMA_RAW}".schema_migrations')).fetchall()
+    return {row[0] for row in rows}
+
+
+def pending_migrations(applied, schema):
+    """
+    Migrasi yang belum tercatat dan berlaku saat ini.
+
+    Returns:
+    - list[tuple]: (version, description, list SQL); migrasi yang fungsinya mengembalikan
+      None (belum berlaku, misal migrasi 005 tanpa RAW_PARTITIONED) dilewati dan tidak dicatat.
+    """
+    pending = []
+    for version, description, build in MIGRATIONS:
+        if version in applied:
+            continue
+        statements = build(schema)
+        if statements is not None:
+            pending.append((version, description, statements))
+    return pending
+
+
+def migrate(engine=None):
+    """
+    Jalankan migrasi schema RAW yang belum tercatat di schema_migrations.
+
+    Parameters:
+    - engine (SQLAlchemy engine, optional): Default: config.engine.
+
+    Behavior:
+    - Steady state: satu kali per proses, dua query baca (to_regclass + SELECT version),
+      tanpa DDL; pemanggilan berikutnya tidak query sama sekali.
+    - Migrasi yang belum tercatat dijalankan berurutan dalam satu transaksi bersama
+      INSERT ke schema_migrations, di bawah pg_advisory_xact_lock.
+    - Schema RAW dan CLEAN dibuat di sini (bukan saat import config).
+    - Setiap migrasi idempotent (IF NOT EXISTS), sehingga database lama yang
+      sudah punya tabelnya tetap aman saat pertama kali dicatat.
+    - Migrasi yang belum berlaku (fungsi mengembalikan None) tidak dicatat dan dicek
+      lagi di proses berikutnya (lihat pending_migrations).
+
+    Returns:
+    - list[int]: Versi yang baru dijalankan.
+    """
+    global MIGRATED
+    if MIGRATED:
+        return []
+    engine = engine or config.engine
+    schema = config.SCHEMA_RAW
+
+    with engine.connect() as conn:
+        applied = applied_versions(conn)
+    pending = pending_migrations(applied, schema)
+    if pending:
+        with engine.begin() as conn:
+            conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": MIGRATION_LOCK_KEY})
+            conn.execute(text(f'CREATE SCHEMA IF NOT EXISTS "{schema}"'))
+            conn.execute(text(f'CREATE SCHEMA IF NOT EXISTS "{config.SCHEMA_CLEAN}"'))
+            conn.execute(text(f"""
+            CREATE TABLE IF NOT EXISTS "{schema}".schema_migrations (
+                version INTEGER PRIMARY KEY,
+                description TEXT NOT NULL,
+                applied_at TIMESTAMP DEFAULT NOW()
+            )
+            """))
+            applied = applied_versions(conn)
+            pending = pending_migrations(applied, schema)
+            for version, description, statements in pending:
+                log(f"Applying migration {version:03d}: {description}")
+                for sql in statements:
+                    conn.execute(text(sql))
+                conn.execute(
+                    text(f'INSERT INTO "{schema}".schema_migrations (version, description) VALUES (:v, :d)'),
+                    {"v": version, "d": description}
+                )
+        if pending:
+            log(f"Schema migrated to version {pending[-1][0]}")
+
+    MIGRATED = True
+    return [m[0] for m in pending]
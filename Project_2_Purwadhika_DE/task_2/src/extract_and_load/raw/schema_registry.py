@@ -0,0 +1,230 @@
+import pyarrow as pa
+import pyarrow.parquet as pq
+from sqlalchemy import text
+from .logger import log
+from . import config
+
+# Kolom tambahan staging/RAW yang tidak ada di parquet TLC
+METADATA_COLUMNS = {"date": "DATE", "source_file": "TEXT", "entry_time": "TIMESTAMP"}
+
+# DEFAULT kolom metadata: diisi dari setting transaksi raw.entry_time / raw.source_file
+# (set_config(..., true)), sehingga COPY file CSV apa adanya tetap mengisi kolom ini
+METADATA_DEFAULTS = {
+    "entry_time": "COALESCE(NULLIF(current_setting('raw.entry_time', true), '')::timestamp, LOCALTIMESTAMP)",
+    "source_file": "NULLIF(current_setting('raw.source_file', true), '')",
+}
+
+# Urutan pelebaran tipe numerik (schema evolution hanya boleh melebar)
+NUMERIC_RANK = {"SMALLINT": 1, "INTEGER": 2, "BIGINT": 3, "REAL": 4, "DOUBLE PRECISION": 5}
+
+# Schema parquet sumber per RAW table di proses ini: {table_name: pa.Schema}
+SOURCE_SCHEMAS = {}
+
+# Kolom RAW table di database yang sudah dipastikan di proses ini: {table_name: {column: pg_type}}
+TABLE_COLUMNS = {}
+
+
+def pg_type(arrow_type):
+    """
+    Tipe Postgres untuk satu tipe Arrow.
+
+    Parameters:
+    - arrow_type (pa.DataType)
+
+    Behavior:
+    - Dictionary memakai value type-nya; float32 dibuat DOUBLE PRECISION agar
+      SUM/AVG di clean layer tidak dihitung dalam REAL.
+    - Tipe yang tidak dikenal (termasuk null) menjadi TEXT.
+
+    Returns:
+    - str: Tipe Postgres, misal "BIGINT", "TIMESTAMP".
+    """
+    if pa.types.is_dictionary(arrow_type):
+        return pg_type(arrow_type.value_type)
+    if pa.types.is_boolean(arrow_type):
+        return "BOOLEAN"
+    if pa.types.is_integer(arrow_type):
+        if arrow_type.bit_width <= 8 or arrow_type == pa.int16():
+            return "SMALLINT"
+        if arrow_type.bit_width <= 32 and arrow_type != pa.uint32():
+            return "INTEGER"
+        return "BIGINT"
+    if pa.types.is_floating(arrow_type):
+        return "DOUBLE PRECISION"
+    if pa.types.is_decimal(arrow_type):
+        return "NUMERIC"
+    if pa.types.is_timestamp(arrow_type):
+        return "TIMESTAMPTZ" if arrow_type.tz else "TIMESTAMP"
+    if pa.types.is_date(arrow_type):
+        return "DATE"
+    return "TEXT"
+
+
+def register_source_schema(table_name, parquet_files):
+    """
+    Daftarkan schema parquet sumber (dari footer) sebagai acuan tipe RAW table.
+
+    Parameters:
+    - table_name (str): Nama RAW table.
+    - parquet_files (list[str]): File parquet sumber; kolom dari semua file digabung
+      (kolom pertama yang ditemukan menentukan tipe).
+
+    Returns: None
+    """
+    fields = {}
+    for path in parquet_files:
+        for field in pq.read_schema(path):
+            fields.setdefault(field.name, field)
+    if fields:
+        SOURCE_SCHEMAS[table_name] = pa.schema(list(fields.values()))
+
+
+def column_types(table_name, df_sample):
+    """
+    Tentukan tipe Postgres setiap kolom staging untuk RAW table.
+
+    Parameters:
+    - table_name (str): Nama RAW table.
+    - df_sample (pd.DataFrame): Sample staging (hanya nama kolom dan fallback tipe yang dipakai).
+
+    Behavior:
+    - Urutan sumber tipe: METADATA_COLUMNS, schema parquet sumber (register_source_schema),
+      kolom *_datetime → TIMESTAMP, lalu tipe Arrow hasil inferensi sample.
+    - entry_time dan source_file selalu ada.
+
+    Returns:
+    - dict: {column: pg_type} sesuai urutan kolom staging.
+    """
+    source = SOURCE_SCHEMAS.get(table_name)
+    inferred = pa.Schema.from_pandas(df_sample, preserve_index=False)
+    types = {}
+    for name in df_sample.columns:
+        if name in METADATA_COLUMNS:
+            types[name] = METADATA_COLUMNS[name]
+        elif source is not None and name in source.names:
+            types[name] = pg_type(source.field(name).type)
+        elif name.endswith("_datetime"):
+            types[name] = "TIMESTAMP"
+        else:
+            types[name] = pg_type(inferred.field(name).type)
+    for name in ("source_file", "entry_time"):
+        types.setdefault(name, METADATA_COLUMNS[name])
+    return types
+
+
+def needs_widening(current, wanted):
+    """True jika kolom numerik current harus dilebarkan ke wanted (misal BIGINT → DOUBLE PRECISION)."""
+    return current in NUMERIC_RANK and wanted in NUMERIC_RANK and NUMERIC_RANK[wanted] > NUMERIC_RANK[current]
+
+
+def needs_timestamp(current, wanted):
+    """True jika kolom TEXT (tabel lama dari sample CSV) harus menjadi timestamp sesuai schema sumber."""
+    return current == "TEXT" and wanted in ("TIMESTAMP", "TIMESTAMPTZ")
+
+
+def needs_retype(current, wanted):
+    """True jika tipe kolom di database harus diubah ke wanted (lihat ensure_table_schema)."""
+    return needs_widening(current, wanted) or needs_timestamp(current, wanted)
+
+
+def read_table_columns(conn, table_name):
+    """
+    Kolom RAW table di database.
+
+    Returns:
+    - dict: {column: pg_type} (kosong jika tabel belum ada).
+    """
+    rows = conn.execute(text("""
+        SELECT column_name, data_type
+        FROM information_schema.columns
+        WHERE table_schema = :schema AND table_name = :table
+        ORDER BY ordinal_position
+    """), {"schema": config.SCHEMA_RAW, "table": table_name}).fetchall()
+    names = {"timestamp without time zone": "TIMESTAMP", "timestamp with time zone": "TIMESTAMPTZ"}
+    return {name: names.get(data_type, data_type.upper()) for name, data_type in rows}
+
+
+def create_table(conn, table_name, types):
+    """
+    CREATE TABLE RAW dengan tipe eksplisit.
+
+    Behavior:
+    - entry_time dan source_file diberi DEFAULT dari setting transaksi (METADATA_DEFAULTS).
+    - Jika config.RAW_PARTITIONED dan ada kolom *pickup_datetime bertipe TIMESTAMP,
+      tabel dibuat PARTITION BY RANGE (pickup) dengan partisi DEFAULT; partisi
+      bulanan dibuat on demand (db_utils.ensure_month_partition).
+
+    Returns: None
+    """
+    full_table = f'"{config.SCHEMA_RAW}"."{table_name}"'
+    column_list = ",\n    ".join(
+        f'"{name}" {pg}' + (f" DEFAULT {METADATA_DEFAULTS[name]}" if name in METADATA_DEFAULTS else "")
+        for name, pg in types.items()
+    )
+    pickup_col = next((c for c, pg in types.items() if c.endswith("pickup_datetime") and pg == "TIMESTAMP"), None)
+
+    if config.RAW_PARTITIONED and pickup_col:
+        conn.execute(text(f'CREATE TABLE {full_table} (\n    {column_list}\n) PARTITION BY RANGE ("{pickup_col}")'))
+        conn.execute(text(
+            f'CREATE TABLE "{config.SCHEMA_RAW}"."{table_name}_default" PARTITION OF {full_table} DEFAULT'
+        ))
+        log(f"Table {full_table} created (partitioned by month on {pickup_col}).")
+    else:
+        conn.execute(text(f"CREATE TABLE {full_table} (\n    {column_list}\n)"))
+        log(f"Table {full_table} created.")
+
+
+def ensure_table_schema(table_name, df_sample, engine):
+    """
+    Pastikan RAW table ada dan punya semua kolom staging dengan tipe yang cukup lebar.
+
+    Parameters:
+    - table_name (str): Nama RAW table.
+    - df_sample (pd.DataFrame): Sample staging (lihat column_types).
+    - engine (SQLAlchemy engine): Koneksi ke database.
+
+    Behavior:
+    - Cache per proses (TABLE_COLUMNS): jika semua kolom sudah diketahui ada dengan
+      tipe yang cukup, tidak ada query ke database.
+    - Tabel belum ada → CREATE TABLE dengan tipe eksplisit (create_table).
+    - Kolom baru (misal fee baru dari TLC) → ALTER TABLE ADD COLUMN.
+    - Kolom numerik yang terlalu sempit (misal BIGINT hasil inferensi sample lama,
+      sumber double) → ALTER COLUMN TYPE ke tipe yang lebih lebar.
+    - Kolom TEXT yang di sumber timestamp (pickup/dropoff tabel lama) → ALTER COLUMN
+      TYPE TIMESTAMP USING NULLIF(col, '')::timestamp (satu kali tulis ulang tabel).
+    - Perbedaan tipe lain tidak diubah.
+
+    Returns: None
+    """
+    types = column_types(table_name, df_sample)
+    known = TABLE_COLUMNS.get(table_name)
+    if known is not None and all(c in known and not needs_retype(known[c], t) for c, t in types.items()):
+        return
+
+    full_table = f'"{config.SCHEMA_RAW}"."{table_name}"'
+    with engine.begin() as conn:
+        existing = read_table_columns(conn, table_name)
+        if not existing:
+            log(f"Creating new table {full_table} ...")
+            create_table(conn, table_name, types)
+            existing = dict(types)
+        for name, pg in types.items():
+            if name not in existing:
+                conn.execute(text(f'ALTER TABLE {full_table} ADD COLUMN IF NOT EXISTS "{name}" {pg}'))
+                log(f"Schema evolution: added column {name} {pg} to {full_table}")
+                existing[name] = pg
+                if name in METADATA_DEFAULTS:
+                    conn.execute(text(
+                        f'ALTER TABLE {full_table} ALTER COLUMN "{name}" SET DEFAULT {METADATA_DEFAULTS[name]}'
+                    ))
+            elif needs_widening(existing[name], pg):
+                conn.execute(text(f'ALTER TABLE {full_table} ALTER COLUMN "{name}" TYPE {pg}'))
+                log(f"Schema evolution: widened {full_table}.{name} {existing[name]} → {pg}", "WARNING")
+                existing[name] = pg
+            elif needs_timestamp(existing[name], pg):
+                conn.execute(text(
+                    f'ALTER TABLE {full_table} ALTER COLUMN "{name}" TYPE {pg} USING NULLIF("{name}", \'\')::{pg}'
+                ))
+                log(f"Schema evolution: typed {full_table}.{name} TEXT → {pg}", "WARNING")
+                existing[name] = pg
+    TABLE_COLUMNS[table_name] = existing
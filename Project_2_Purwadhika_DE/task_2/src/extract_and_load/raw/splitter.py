@@ -1,127 +1,715 @@
 import os
+import sys
 import glob
+import time
+import ctypes
+import shutil
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pacsv
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
 from .logger import log
 from . import config
 
-def load_parquet_files(download_dir):
+class ProcessMemoryCounters(ctypes.Structure):
+    """PROCESS_MEMORY_COUNTERS (psapi) untuk membaca RSS di Windows."""
+    _fields_ = [
+        ("cb", ctypes.c_ulong),
+        ("PageFaultCount", ctypes.c_ulong),
+        ("PeakWorkingSetSize", ctypes.c_size_t),
+        ("WorkingSetSize", ctypes.c_size_t),
+        ("QuotaPeakPagedPoolUsage", ctypes.c_size_t),
+        ("QuotaPagedPoolUsage", ctypes.c_size_t),
+        ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t),
+        ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+        ("PagefileUsage", ctypes.c_size_t),
+        ("PeakPagefileUsage", ctypes.c_size_t),
+    ]
+
+
+def windows_memory_counters():
+    """ProcessMemoryCounters proses saat ini (hanya Windows)."""
+    counters = ProcessMemoryCounters()
+    counters.cb = ctypes.sizeof(counters)
+    ctypes.windll.psapi.GetProcessMemoryInfo(
+        ctypes.windll.kernel32.GetCurrentProcess(), ctypes.byref(counters), counters.cb
+    )
+    return counters
+
+
+def rss_mb():
+    """
+    Ambil resident memory (RSS) proses saat ini dalam MB.
+
+    Behavior:
+    - Dipakai untuk sampling selama split satu file (peak per file), berbeda dengan
+      peak_rss_mb yang merupakan peak sepanjang umur proses.
+    - Linux: /proc/self/statm, Windows: WorkingSetSize.
+
+    Returns:
+    - float | None: RSS dalam MB, None jika tidak bisa dibaca di platform ini (misal macOS).
+    """
+    try:
+        if sys.platform == "win32":
+            return windows_memory_counters().WorkingSetSize / (1024 * 1024)
+        with open("/proc/self/statm") as f:
+            resident_pages = int(f.read().split()[1])
+        return resident_pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except Exception:
+        return None
+
+
+def peak_rss_mb():
+    """
+    Ambil peak resident memory (RSS) sepanjang umur proses dalam MB.
+
+    Returns:
+    - float | None: Peak RSS dalam MB, None jika tidak bisa dibaca di platform ini.
+    """
+    try:
+        if sys.platform == "win32":
+            return windows_memory_counters().PeakWorkingSetSize / (1024 * 1024)
+
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux: KB, macOS: bytes
+        return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+    except Exception:
+        return None
+
+
+def source_file_prefix(basename):
     """
-    Load semua file parquet dari folder ke dictionary {basename: DataFrame}.
+    Buat prefix source_file dari nama file parquet.
 
     Parameters:
-    - download_dir (str): Folder tempat file parquet berada.
+    - basename (str): Nama file parquet, misal "yellow_tripdata_2025-01.parquet".
 
     Returns:
-    - dict: Dictionary dengan key = nama file parquet, value = pd.DataFrame.
-      Jika tidak ada file, mengembalikan dictionary kosong.
+    - str: Prefix source_file, misal "parquet012025_".
     """
-    parquet_files = glob.glob(os.path.join(download_dir, "*.parquet"))
-    if not parquet_files:
-        log(f"No parquet files found in {download_dir}", level="ERROR")
-        return {}
+    month_year_part = basename.split("_")[-1].replace(".parquet", "")
+    year_part, month_part = month_year_part.split("-")
+    return "parquet" + month_part + year_part + "_"
 
-    dfs = {}
-    for file in parquet_files:
-        try:
-            log(f"Reading {file} ...")
-            df = pd.read_parquet(file)
-            dfs[os.path.basename(file)] = df
-            log(f"Loaded {len(df):,} rows from {os.path.basename(file)}")
-        except Exception as e:
-            log(f"Failed read parquet file {file} — {e}", level="ERROR")
-    return dfs
 
+def truncate_timestamps(table):
+    """
+    Bulatkan semua kolom timestamp ke detik agar format teks (CSV/COPY) konsisten.
+
+    Parameters:
+    - table (pa.Table)
 
-def process_parquet_file(df, color, datetime_col, basename):
+    Returns:
+    - pa.Table
     """
-    Proses DataFrame parquet: konversi datetime, drop NA, buat kolom date dan source_file.
+    for i, field in enumerate(table.schema):
+        if pa.types.is_timestamp(field.type) and field.type.unit != "s":
+            table = table.set_column(
+                i, field.name, pc.cast(table[field.name], pa.timestamp("s"), safe=False)
+            )
+    return table
+
+
+# Tipe kompak untuk kolom TLC (cast hanya jika lossless, lihat compact_targets)
+COMPACT_TYPES = {
+    "VendorID": pa.int8(),
+    "passenger_count": pa.int8(),
+    "RatecodeID": pa.int8(),
+    "payment_type": pa.int8(),
+    "trip_type": pa.int8(),
+    "PULocationID": pa.int16(),
+    "DOLocationID": pa.int16(),
+}
+CATEGORY_COLUMNS = ("store_and_fwd_flag",)
+MONEY_COLUMNS = (
+    "fare_amount", "extra", "mta_tax", "tip_amount", "tolls_amount", "improvement_surcharge",
+    "total_amount", "congestion_surcharge", "Airport_fee", "airport_fee", "cbd_congestion_fee", "ehail_fee",
+)
+
+
+def float32_lossless(column):
+    """True jika kolom uang float64 tetap sama (dibulatkan 2 desimal) setelah cast ke float32."""
+    compact = pc.cast(column, pa.float32())
+    same = pc.equal(pc.round(pc.cast(compact, pa.float64()), 2), pc.round(column, 2))
+    return pc.all(same).as_py() is not False
+
+
+def compact_targets(dataset, columns=None):
+    """
+    Tentukan tipe kompak kolom satu file parquet, sekali per file.
 
     Parameters:
-    - df (pd.DataFrame): DataFrame yang akan diproses.
-    - color (str): Warna taxi ('yellow' atau 'green') untuk menentukan kolom datetime.
-    - datetime_col (str): Nama kolom datetime pickup di DataFrame.
-    - basename (str): Nama file parquet asli (digunakan untuk membuat kolom source_file).
+    - dataset (pyarrow.dataset.Dataset): Dataset satu file parquet.
+    - columns (list[str], optional): Kolom yang dibaca (projection). Default: semua kolom.
+
+    Behavior:
+    - Kolom di COMPACT_TYPES → int8/int16 hanya jika cast lossless untuk seluruh file
+      (nilai pecahan atau overflow di batch mana pun → kolom dibiarkan).
+    - Kolom di CATEGORY_COLUMNS → dictionary (categorical).
+    - Jika config.COMPACT_FLOAT32, kolom uang → float32 selama nilainya tetap sama
+      setelah dibulatkan ke 2 desimal di seluruh file.
+    - Kandidat int/float32 dicek dengan satu pass streaming yang hanya membaca kolom
+      kandidat (tanpa filter pickup, sehingga keputusan juga berlaku untuk semua worker
+      parallel); semua batch file lalu di-cast ke schema yang sama, sehingga buffer
+      harian bisa di-concat dan part parquet satu hari punya tipe yang sama.
 
     Returns:
-    - pd.DataFrame: DataFrame yang sudah diproses dan siap displit per tanggal.
-      Jika gagal, mengembalikan None.
+    - dict: {column: pa.DataType} tipe target per kolom yang di-compact.
+    """
+    schema = dataset.schema
+    names = columns if columns is not None else schema.names
+    targets, candidates = {}, {}
+    for name in names:
+        field_type = schema.field(name).type
+        if name in COMPACT_TYPES and field_type != COMPACT_TYPES[name]:
+            candidates[name] = COMPACT_TYPES[name]
+        elif name in CATEGORY_COLUMNS and not pa.types.is_dictionary(field_type):
+            targets[name] = pa.dictionary(pa.int32(), field_type)
+        elif name in MONEY_COLUMNS and config.COMPACT_FLOAT32 and field_type == pa.float64():
+            candidates[name] = pa.float32()
+
+    batches = []
+    if candidates:
+        batches = dataset.to_batches(columns=list(candidates), batch_readahead=1, fragment_readahead=1)
+    for batch in batches:
+        for name in list(candidates):
+            column = batch.column(name)
+            try:
+                if candidates[name] == pa.float32():
+                    lossless = float32_lossless(column)
+                else:
+                    pc.cast(column, candidates[name])
+                    lossless = True
+            except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+                lossless = False
+            if not lossless:
+                del candidates[name]
+        if not candidates:
+            break
+    targets.update(candidates)
+    return targets
+
+
+def compact_dtypes(table, targets):
     """
-    if df is None or df.empty:
-        log(f"No data for {color} in {basename} — skipping", level="ERROR")
+    Cast kolom tabel parquet ke tipe kompak file-nya segera setelah dibaca.
+
+    Parameters:
+    - table (pa.Table)
+    - targets (dict): {column: pa.DataType} dari compact_targets (sama untuk semua batch file).
+
+    Returns:
+    - pa.Table
+    """
+    for i, field in enumerate(table.schema):
+        target = targets.get(field.name)
+        if target is None or field.type == target:
+            continue
+        column = table.column(i)
+        if pa.types.is_dictionary(target):
+            column = pc.dictionary_encode(column)
+        else:
+            column = pc.cast(column, target)
+        table = table.set_column(i, field.name, column)
+    return table
+
+
+def log_memory_report(basename, memory):
+    """Log memory tabel parquet sebelum/sesudah compact_dtypes untuk satu file."""
+    if not memory.get("before"):
+        return
+    before, after = memory["before"] / (1024 * 1024), memory["after"] / (1024 * 1024)
+    log(f"Memory {basename}: {before:,.1f} MB → {after:,.1f} MB after dtype compaction "
+        f"({100 * (1 - after / before):.0f}% smaller)")
+
+
+def process_parquet_batch(batch, datetime_col, prefix):
+    """
+    Kernel Arrow: drop pickup NULL, tambah kolom date dan source_file, lalu urutkan per hari.
+
+    Parameters:
+    - batch (pa.RecordBatch | pa.Table): Record batch parquet.
+    - datetime_col (str): Nama kolom datetime pickup.
+    - prefix (str): Prefix source_file (lihat source_file_prefix).
+
+    Behavior:
+    - Tanggal dihitung dengan cast timestamp → date32 (vectorized, tanpa string per baris).
+    - Label date/source_file dibuat sekali per hari unik, lalu di-broadcast sebagai
+      kolom dictionary-encoded.
+    - Baris diurutkan per hari dengan stable sort, sehingga urutan asli dalam satu hari tetap.
+
+    Returns:
+    - tuple: (pa.Table, list[(date_str, source_file, offset, length)])
+      Setiap hari adalah slice [offset, offset + length) dari tabel.
+    """
+    table = batch if isinstance(batch, pa.Table) else pa.Table.from_batches([batch])
+    pickup = table[datetime_col]
+    if not pa.types.is_timestamp(pickup.type):
+        pickup = pc.strptime(pickup, format="%Y-%m-%d %H:%M:%S", unit="s", error_is_null=True)
+        table = table.set_column(table.schema.get_field_index(datetime_col), datetime_col, pickup)
+    table = truncate_timestamps(table.filter(pc.is_valid(pickup)))
+    if table.num_rows == 0:
+        return table, []
+
+    days = pc.cast(table[datetime_col], pa.date32())
+    unique_days = pc.unique(days)
+    unique_days = unique_days.take(pc.sort_indices(unique_days))
+    day_index = pc.index_in(days, value_set=unique_days).combine_chunks().cast(pa.int32())
+
+    order = pc.sort_indices(day_index)
+    table = table.take(order)
+    day_index = day_index.take(order)
+
+    dates = [d.isoformat() for d in unique_days.to_pylist()]
+    labels = [prefix + d.strftime("%d_%m_%Y") for d in unique_days.to_pylist()]
+    table = table.append_column("date", pa.DictionaryArray.from_arrays(day_index, pa.array(dates)))
+    table = table.append_column("source_file", pa.DictionaryArray.from_arrays(day_index, pa.array(labels)))
+
+    counts = np.bincount(day_index.to_numpy(), minlength=len(dates))
+    offsets = np.concatenate([[0], np.cumsum(counts)[:-1]])
+    return table, [
+        (date_str, label, int(offset), int(count))
+        for date_str, label, offset, count in zip(dates, labels, offsets, counts)
+    ]
+
+
+def day_groups(month_folder, n_groups):
+    """
+    Bagi hari-hari dalam satu bulan menjadi beberapa rentang tanggal yang berurutan.
+
+    Parameters:
+    - month_folder (str): Bulan format YYYY-MM.
+    - n_groups (int): Jumlah grup yang diinginkan (maks. jumlah hari dalam bulan).
+
+    Returns:
+    - list[tuple]: [(start, end), ...] dengan start/end pd.Timestamp.
+      Grup pertama tanpa batas bawah dan grup terakhir tanpa batas atas (None),
+      sehingga baris di luar bulan tetap ikut diproses seperti jalur serial.
+    """
+    month_start = pd.Timestamp(f"{month_folder}-01")
+    n_days = month_start.days_in_month
+    n_groups = max(1, min(n_groups, n_days))
+
+    bounds = [month_start + pd.Timedelta(days=(n_days * i) // n_groups) for i in range(1, n_groups)]
+    starts = [None] + bounds
+    ends = bounds + [None]
+    return list(zip(starts, ends))
+
+
+def file_month(basename):
+    """
+    Ambil bulan data dari nama file parquet TLC.
+
+    Parameters:
+    - basename (str): Nama file parquet, misal "yellow_tripdata_2025-01.parquet".
+
+    Returns:
+    - pd.Timestamp: Awal bulan, misal 2025-01-01.
+    """
+    return pd.Timestamp(basename.split("_")[-1].replace(".parquet", "") + "-01")
+
+
+def projected_columns(schema, datetime_col):
+    """
+    Tentukan kolom parquet yang dibaca (column projection).
+
+    Parameters:
+    - schema (pa.Schema): Schema file parquet.
+    - datetime_col (str): Nama kolom datetime pickup.
+
+    Behavior:
+    - Kolom diambil dari config.PARQUET_COLUMNS ditambah kolom pickup/dropoff
+      sesuai warna; urutan mengikuti schema file.
+    - config.PARQUET_COLUMNS = None berarti semua kolom.
+
+    Returns:
+    - list[str] | None: Nama kolom, None untuk semua kolom.
+    """
+    if config.PARQUET_COLUMNS is None:
         return None
+    wanted = set(config.PARQUET_COLUMNS) | {datetime_col, datetime_col.replace("pickup", "dropoff")}
+    return [name for name in schema.names if name in wanted]
 
-    try:
-        df[datetime_col] = pd.to_datetime(df[datetime_col], errors="coerce")
-        df = df.dropna(subset=[datetime_col])
-        df["date"] = df[datetime_col].dt.date.astype(str)
-
-        month_year_part = basename.split("_")[-1].replace(".parquet", "")
-        year_part, month_part = month_year_part.split("-")
-        df["source_file"] = "parquet" + month_part + year_part + "_" + df[datetime_col].dt.strftime("%d_%m_%Y")
-        return df
-    except Exception as e:
-        log(f"Failed processing datetime for {color} — {e}", level="ERROR")
+
+def pickup_filter(schema, datetime_col, basename, day_range=None):
+    """
+    Buat filter pickup untuk dipush-down ke pembacaan parquet.
+
+    Parameters:
+    - schema (pa.Schema): Schema file parquet.
+    - datetime_col (str): Nama kolom datetime pickup.
+    - basename (str): Nama file parquet (untuk rentang bulan).
+    - day_range (tuple, optional): (start, end) pd.Timestamp atau None untuk tanpa batas.
+
+    Behavior:
+    - config.PARQUET_MONTH_FILTER: hanya pickup di bulan file [awal bulan, awal bulan berikutnya),
+      sehingga baris nyasar (misal 2009) tidak dibaca sama sekali.
+    - day_range dipakai mode parallel untuk membagi bulan per grup tanggal.
+    - Jika kolom pickup timestamp, row group di luar rentang dilewati lewat statistik parquet.
+
+    Returns:
+    - ds.Expression | None: Filter, None jika tidak ada batas.
+    """
+    start, end = day_range if day_range is not None else (None, None)
+    if config.PARQUET_MONTH_FILTER:
+        month_start = file_month(basename)
+        month_end = month_start + pd.offsets.MonthBegin(1)
+        start = month_start if start is None else max(start, month_start)
+        end = month_end if end is None else min(end, month_end)
+    if start is None and end is None:
         return None
 
+    pickup_type = schema.field(datetime_col).type
+    pickup = ds.field(datetime_col)
+    if not pa.types.is_timestamp(pickup_type):
+        pickup_type = pa.timestamp("s")
+        pickup = pickup.cast(pickup_type)
+
+    expr = pickup.is_valid()
+    if start is not None:
+        expr = expr & (pickup >= pa.scalar(start.to_pydatetime(), pickup_type))
+    if end is not None:
+        expr = expr & (pickup < pa.scalar(end.to_pydatetime(), pickup_type))
+    return expr
+
 
-def save_daily_csvs(df, color, month_folder):
+def iter_parquet_batches(path, datetime_col, batch_size, day_range=None, memory=None):
     """
-    Split DataFrame per tanggal dan simpan sebagai CSV di folder yellow/green.
+    Baca parquet per record batch dengan column projection dan filter pickup (push-down).
 
     Parameters:
-    - df (pd.DataFrame): DataFrame yang sudah diproses.
-    - color (str): Warna taxi ('yellow' atau 'green').
-    - month_folder (str): Nama folder bulan (YYYY-MM) untuk menyimpan CSV.
+    - path (str): File parquet.
+    - datetime_col (str): Nama kolom datetime pickup.
+    - batch_size (int): Jumlah baris per record batch.
+    - day_range (tuple, optional): (start, end) rentang pickup (mode parallel).
+    - memory (dict, optional): Diisi {"before": bytes, "after": bytes} total ukuran
+      batch sebelum/sesudah compact_dtypes (untuk log_memory_report).
+
+    Behavior:
+    - Memakai pyarrow.dataset (columns=/filter=) dengan readahead 1 batch,
+      sehingga memory tetap terbatas seperti ParquetFile.iter_batches.
+    - Jika config.COMPACT_DTYPES, tipe kompak ditentukan sekali per file (compact_targets)
+      dan setiap batch langsung di-cast ke tipe tersebut (compact_dtypes).
 
     Returns:
-    - None: Semua data disimpan ke file CSV harian. Tidak ada nilai yang dikembalikan.
+    - iterator[pa.Table]: Satu tabel per record batch.
     """
-    if df is None or df.empty:
-        return
+    if memory is None:
+        memory = {}
+    memory.setdefault("before", 0)
+    memory.setdefault("after", 0)
+    basename = os.path.basename(path)
+    dataset = ds.dataset(path, format="parquet")
+    columns = projected_columns(dataset.schema, datetime_col)
+    expr = pickup_filter(dataset.schema, datetime_col, basename, day_range)
+    log(f"Reading {path} ({len(columns) if columns is not None else len(dataset.schema)}/"
+        f"{len(dataset.schema)} columns, filter: {expr if expr is not None else 'none'}) ...")
+    targets = compact_targets(dataset, columns) if config.COMPACT_DTYPES else {}
+    for batch in dataset.to_batches(
+        columns=columns,
+        filter=expr,
+        batch_size=batch_size,
+        batch_readahead=1,
+        fragment_readahead=1
+    ):
+        if not batch.num_rows:
+            continue
+        table = pa.Table.from_batches([batch])
+        memory["before"] += table.nbytes
+        if targets:
+            table = compact_dtypes(table, targets)
+        memory["after"] += table.nbytes
+        yield table
 
-    target_dir = os.path.join(config.YELLOW_DIR if color=="yellow" else config.GREEN_DIR, month_folder)
-    os.makedirs(target_dir, exist_ok=True)
-    log(f"Ensured CSV folder exists: {target_dir}")
 
-    for date_str, group in df.groupby("date"):
-        path = os.path.join(target_dir, f"{date_str}.csv")
+def expected_split_rows(path):
+    """
+    Hitung jumlah baris yang akan ditulis split untuk satu file parquet.
+
+    Parameters:
+    - path (str): File parquet.
+
+    Behavior:
+    - Tanpa PARQUET_MONTH_FILTER, angka diambil dari footer parquet (num_rows dikurangi
+      null_count pickup per row group) tanpa membaca data.
+    - Dengan PARQUET_MONTH_FILTER, baris dihitung dengan filter yang sama seperti
+      iter_parquet_batches (hanya kolom pickup yang dibaca).
+
+    Returns:
+    - int: Jumlah baris.
+    """
+    basename = os.path.basename(path)
+    datetime_col = "tpep_pickup_datetime" if "yellow" in basename.lower() else "lpep_pickup_datetime"
+    dataset = ds.dataset(path, format="parquet")
+    expr = pickup_filter(dataset.schema, datetime_col, basename)
+    if expr is not None:
+        return dataset.count_rows(filter=expr)
+
+    metadata = pq.ParquetFile(path).metadata
+    index = metadata.schema.names.index(datetime_col)
+    rows = 0
+    for i in range(metadata.num_row_groups):
+        row_group = metadata.row_group(i)
+        stats = row_group.column(index).statistics
+        if stats is None or not stats.has_null_count:
+            return dataset.count_rows(filter=ds.field(datetime_col).is_valid())
+        rows += row_group.num_rows - stats.null_count
+    return rows
+
+
+def write_daily_parquet(group, path, first):
+    """
+    Tulis satu buffer harian sebagai part parquet baru di folder hive date=YYYY-MM-DD.
+
+    Parameters:
+    - group (pa.Table): Baris untuk satu tanggal.
+    - path (str): Folder partisi, misal ".../2025-01/date=2025-01-01".
+    - first (bool): True jika ini tulisan pertama di run ini (folder lama dihapus dulu).
+
+    Returns: None
+    """
+    if first and os.path.isdir(path):
+        shutil.rmtree(path)
+    os.makedirs(path, exist_ok=True)
+    part = os.path.join(path, f"part-{len(os.listdir(path)):05d}.parquet")
+    pq.write_table(
+        group,
+        part,
+        compression="zstd",
+        coerce_timestamps="us",
+        allow_truncated_timestamps=True
+    )
+
+
+def flush_daily_buffers(buffers, target_dir, written):
+    """
+    Tulis semua buffer harian ke staging (append jika hari itu sudah ditulis di run ini).
+
+    Parameters:
+    - buffers (dict): {date_str: [pa.Table, ...]} baris yang belum ditulis.
+    - target_dir (str): Folder staging bulanan (yellow/green).
+    - written (dict): {path: total_rows} file yang sudah ditulis di run ini.
+      File yang belum ada di dict ditulis ulang dari awal (dengan header).
+
+    Behavior:
+    - STAGING_FORMAT="csv": satu file {date}.csv per hari.
+    - STAGING_FORMAT="parquet": folder date={date}/ berisi part-*.parquet (zstd, typed).
+
+    Returns: None
+    """
+    for date_str, frames in buffers.items():
+        if config.STAGING_FORMAT == "parquet":
+            path = os.path.join(target_dir, f"date={date_str}")
+        else:
+            path = os.path.join(target_dir, f"{date_str}.csv")
+        group = pa.concat_tables(frames) if len(frames) > 1 else frames[0]
         try:
-            group.to_csv(path, index=False)
-            log(f"Saved {path} ({len(group):,} rows)")
+            first = path not in written
+            if config.STAGING_FORMAT == "parquet":
+                write_daily_parquet(group, path, first)
+            else:
+                with open(path, "wb" if first else "ab") as f:
+                    pacsv.write_csv(group, f, pacsv.WriteOptions(include_header=first))
+            written[path] = written.get(path, 0) + group.num_rows
         except Exception as e:
-            log(f"Failed writing CSV {path} — {e}", level="ERROR")
+            log(f"Failed writing staging file {path} — {e}", level="ERROR")
+    buffers.clear()
 
 
-def split_parquet_files(download_dir=None):
+def split_parquet_file(path, month_folder, written, batch_size, memory_limit_mb, day_range=None):
     """
-    Function utama: load, process, dan split semua parquet menjadi daily CSV.
+    Split satu file parquet menjadi daily CSV/parquet secara streaming (per record batch).
 
     Parameters:
-    - download_dir (str, optional): Folder tempat file parquet berada. 
+    - path (str): File parquet.
+    - month_folder (str): Nama folder bulan (YYYY-MM) untuk menyimpan CSV.
+    - written (dict): {path: total_rows} daily CSV yang sudah ditulis di run ini.
+    - batch_size (int): Jumlah baris per record batch.
+    - memory_limit_mb (int): Batas memory buffer harian sebelum di-flush ke CSV.
+    - day_range (tuple, optional): (start, end) — hanya proses pickup di rentang ini
+      (dipakai mode parallel). Default: semua baris.
+
+    Behavior:
+    - Baca parquet per record batch (iter_parquet_batches): hanya kolom yang
+      dipakai clean layer dan pickup di bulan file, satu batch dalam memory.
+    - Setiap batch diproses dengan kernel Arrow (process_parquet_batch) lalu
+      di-slice per hari tanpa konversi ke pandas.
+    - Baris per tanggal di-buffer; jika buffer melewati memory_limit_mb,
+      semua buffer di-flush (append) ke staging harian (lihat flush_daily_buffers).
+    - Log jumlah baris, memory sebelum/sesudah compaction, dan peak RSS file ini beserta
+      kenaikannya dari awal file (RSS di-sample setiap batch, lihat rss_mb; bukan peak
+      sepanjang umur proses).
+
+    Returns:
+    - int: Total baris yang ditulis ke staging.
+    """
+    basename = os.path.basename(path)
+    color = "yellow" if "yellow" in basename.lower() else "green"
+    datetime_col = "tpep_pickup_datetime" if color == "yellow" else "lpep_pickup_datetime"
+
+    target_dir = os.path.join(config.YELLOW_DIR if color == "yellow" else config.GREEN_DIR, month_folder)
+    os.makedirs(target_dir, exist_ok=True)
+    log(f"Ensured staging folder exists: {target_dir}")
+
+    limit_bytes = memory_limit_mb * 1024 * 1024
+    buffers, buffered_bytes = {}, 0
+    rows_in, rows_out = 0, 0
+
+    prefix = source_file_prefix(basename)
+    memory = {}
+    start_rss = peak = rss_mb()
+    start_time = time.perf_counter()
+
+    for batch in iter_parquet_batches(path, datetime_col, batch_size, day_range, memory):
+        rows_in += batch.num_rows
+        table, days = process_parquet_batch(batch, datetime_col, prefix)
+        if not days:
+            continue
+
+        for date_str, _, offset, length in days:
+            buffers.setdefault(date_str, []).append(table.slice(offset, length))
+        rows_out += table.num_rows
+        buffered_bytes += table.nbytes
+        current = rss_mb()
+        if current is not None and (peak is None or current > peak):
+            peak = current
+
+        if buffered_bytes >= limit_bytes:
+            flush_daily_buffers(buffers, target_dir, written)
+            buffered_bytes = 0
+
+    flush_daily_buffers(buffers, target_dir, written)
+
+    for staged_path in sorted(p for p in written if os.path.dirname(p) == target_dir):
+        log(f"Saved {staged_path} ({written[staged_path]:,} rows)")
+
+    elapsed = time.perf_counter() - start_time
+    log_memory_report(basename, memory)
+    if day_range is not None:
+        start, end = day_range
+        basename = f"{basename} [{start.date() if start is not None else '...'} → {end.date() if end is not None else '...'})"
+    log(f"Split {basename}: {rows_in:,} rows read, {rows_out:,} rows written in {elapsed:.2f}s "
+        f"({rows_in / max(elapsed, 1e-9):,.0f} rows/s), peak RSS "
+        f"{f'{peak:,.0f} MB (+{peak - start_rss:,.0f} MB during this file)' if peak is not None else 'n/a'} "
+        f"(memory limit {memory_limit_mb} MB)")
+    return rows_out
+
+
+def split_day_group(paths, month_folder, batch_size, memory_limit_mb, day_range):
+    """
+    Worker process pool: split semua parquet satu warna untuk satu rentang tanggal.
+
+    Parameters:
+    - paths (list[str]): File parquet dengan warna yang sama (urut).
+    - month_folder (str): Nama folder bulan (YYYY-MM).
+    - batch_size (int): Jumlah baris per record batch.
+    - memory_limit_mb (int): Batas memory buffer harian untuk worker ini.
+    - day_range (tuple): (start, end) rentang pickup yang diproses worker ini.
+
+    Returns:
+    - tuple: (total_rows, peak_rss_mb) — peak RSS sepanjang umur worker process
+    """
+    written = {}
+    total_rows = 0
+    for path in paths:
+        total_rows += split_parquet_file(path, month_folder, written, batch_size, memory_limit_mb, day_range)
+    return total_rows, peak_rss_mb()
+
+
+def split_parquet_files_parallel(parquet_files, month_folder, batch_size, memory_limit_mb, workers):
+    """
+    Split parquet secara parallel dengan process pool, fan-out per warna dan per grup tanggal.
+
+    Parameters:
+    - parquet_files (list[str]): Semua file parquet di folder bulan.
+    - month_folder (str): Nama folder bulan (YYYY-MM).
+    - batch_size (int): Jumlah baris per record batch.
+    - memory_limit_mb (int): Batas memory buffer total, dibagi rata ke semua worker.
+    - workers (int): Jumlah worker process.
+
+    Behavior:
+    - Setiap task = (warna, rentang tanggal). Setiap daily CSV hanya ditulis oleh
+      satu task dengan urutan baris sama seperti parquet, sehingga output identik
+      dengan jalur serial.
+    - Hasil dan kegagalan setiap task dicatat ke log.
+
+    Returns: None
+    """
+    files_by_color = {}
+    for path in parquet_files:
+        color = "yellow" if "yellow" in os.path.basename(path).lower() else "green"
+        files_by_color.setdefault(color, []).append(path)
+
+    groups = day_groups(month_folder, workers)
+    worker_limit_mb = max(1, memory_limit_mb // workers)
+    log(f"Parallel split: {workers} workers, {len(groups)} day groups per color, "
+        f"{worker_limit_mb} MB buffer per worker")
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {
+            pool.submit(split_day_group, paths, month_folder, batch_size, worker_limit_mb, day_range): (color, day_range)
+            for color, paths in files_by_color.items()
+            for day_range in groups
+        }
+        for future in as_completed(futures):
+            color, (start, end) = futures[future]
+            label = f"{color} [{start.date() if start is not None else '...'} → {end.date() if end is not None else '...'})"
+            try:
+                total_rows, peak = future.result()
+                log(f"Split task {label} done: {total_rows:,} rows, "
+                    f"worker process peak RSS {f'{peak:,.0f} MB' if peak is not None else 'n/a'}")
+            except Exception as e:
+                log(f"Split task {label} failed — {e}", level="ERROR")
+
+
+def split_parquet_files(download_dir=None, batch_size=None, memory_limit_mb=None, workers=None):
+    """
+    Function utama: split semua parquet menjadi daily CSV, satu file dan satu batch dalam satu waktu.
+
+    Parameters:
+    - download_dir (str, optional): Folder tempat file parquet berada.
       Default: config.DOWNLOAD_DIR.
+    - batch_size (int, optional): Jumlah baris per record batch. Default: config.PARQUET_BATCH_SIZE.
+    - memory_limit_mb (int, optional): Batas memory buffer harian. Default: config.SPLIT_MEMORY_LIMIT_MB.
+    - workers (int, optional): Jumlah worker process. > 1 mengaktifkan mode parallel.
+      Default: config.SPLIT_WORKERS.
 
     Returns:
-    - None: Semua file CSV harian akan disimpan di folder yellow/green sesuai bulan.
+    - None: Semua staging harian (CSV atau parquet, lihat STAGING_FORMAT) disimpan di folder yellow/green sesuai bulan.
     """
     try:
         if not download_dir:
             download_dir = config.DOWNLOAD_DIR
+        batch_size = batch_size or config.PARQUET_BATCH_SIZE
+        memory_limit_mb = memory_limit_mb or config.SPLIT_MEMORY_LIMIT_MB
+        workers = workers or config.SPLIT_WORKERS
         log(f"Processing parquet files from {download_dir}...")
 
-        dfs = load_parquet_files(download_dir)
-        if not dfs:
+        parquet_files = sorted(glob.glob(os.path.join(download_dir, "*.parquet")))
+        if not parquet_files:
+            log(f"No parquet files found in {download_dir}", level="ERROR")
             return
 
         os.makedirs(config.YELLOW_DIR, exist_ok=True)
         os.makedirs(config.GREEN_DIR, exist_ok=True)
 
         month_folder = os.path.basename(download_dir)
-        for basename, df in dfs.items():
-            color = "yellow" if "yellow" in basename.lower() else "green"
-            datetime_col = "tpep_pickup_datetime" if color=="yellow" else "lpep_pickup_datetime"
+        if workers > 1:
+            split_parquet_files_parallel(parquet_files, month_folder, batch_size, memory_limit_mb, workers)
+            log("All daily CSVs generated.")
+            return
 
-            processed_df = process_parquet_file(df, color, datetime_col, basename)
-            save_daily_csvs(processed_df, color, month_folder)
+        written = {}
+        for path in parquet_files:
+            try:
+                split_parquet_file(path, month_folder, written, batch_size, memory_limit_mb)
+            except Exception as e:
+                log(f"Failed splitting parquet file {path} — {e}", level="ERROR")
 
         log("All daily CSVs generated.")
 
@@ -1,28 +1,97 @@
 import os
+import csv
+import time
 import shutil
+import glob
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import pandas as pd
+import psycopg2
+from sqlalchemy import exc as sa_exc
+import pyarrow as pa
+import pyarrow.parquet as pq
 from datetime import datetime
 from .logger import log
-from .db_utils import ensure_table_exists, is_file_already_inserted
-from . import config
+from .db_utils import (
+    ensure_table_exists, ensure_load_ledger, get_loaded_files, record_loads,
+    record_checkpoint, get_checkpoint, mark_load_failed, ensure_month_partition,
+    create_stage_table, drop_stage_table, count_rows, count_month_rows, publish_stage_table,
+    get_wal_level, get_wal_lsn, wal_bytes_since
+)
+from .ingestor import copy_table, with_entry_time, file_checksum
+from .splitter import (
+    truncate_timestamps, log_memory_report, expected_split_rows,
+    COMPACT_TYPES, CATEGORY_COLUMNS, MONEY_COLUMNS
+)
+from . import config, schema_registry
 
-def get_csv_files(input_folder):
+# Error koneksi yang layak di-retry (server restart, koneksi putus, timeout)
+TRANSIENT_DB_ERRORS = (
+    psycopg2.OperationalError, psycopg2.InterfaceError,
+    sa_exc.OperationalError, sa_exc.InterfaceError,
+)
+
+def is_parquet_partition(path):
+    """Cek apakah path adalah folder staging parquet harian (date=YYYY-MM-DD)."""
+    return os.path.isdir(path) and os.path.basename(path).startswith("date=")
+
+def get_staged_files(input_folder):
     """
-    Ambil semua file CSV dari folder input.
+    Ambil semua staging harian dari folder input: file {date}.csv dan folder date={date}.
 
     Parameters:
-    - input_folder (str): Folder tempat file CSV berada.
+    - input_folder (str): Folder staging bulanan.
 
     Returns:
-    - list: List file CSV (full path) yang diurutkan.
+    - list: List nama file/folder staging yang diurutkan.
     """
     if not os.path.exists(input_folder):
         return []
-    return sorted(f for f in os.listdir(input_folder) if f.endswith(".csv"))
+    return sorted(
+        f for f in os.listdir(input_folder)
+        if f.endswith(".csv") or is_parquet_partition(os.path.join(input_folder, f))
+    )
+
+def get_parquet_parts(path):
+    """Ambil semua part-*.parquet di folder partisi harian (urut)."""
+    return sorted(glob.glob(os.path.join(path, "part-*.parquet")))
+
+def read_staged_sample(path, nrows=1000):
+    """
+    Baca beberapa baris pertama dari staging harian (CSV atau folder parquet).
+
+    Parameters:
+    - path (str): File CSV atau folder date=YYYY-MM-DD.
+    - nrows (int): Jumlah baris sample.
+
+    Returns:
+    - pd.DataFrame: Sample data (kosong jika staging kosong).
+    """
+    if not is_parquet_partition(path):
+        return pd.read_csv(path, nrows=nrows)
+    for part in get_parquet_parts(path):
+        batch = next(pq.ParquetFile(part).iter_batches(batch_size=nrows), None)
+        if batch is not None and batch.num_rows:
+            return batch.to_pandas()
+    return pd.DataFrame()
+
+def read_staged_source_files(path):
+    """
+    Baca hanya kolom source_file dari staging harian.
+
+    Parameters:
+    - path (str): File CSV atau folder date=YYYY-MM-DD.
+
+    Returns:
+    - pd.DataFrame: DataFrame dengan satu kolom source_file.
+    """
+    if not is_parquet_partition(path):
+        return pd.read_csv(path, usecols=["source_file"], dtype={"source_file": "category"})
+    tables = [pq.ParquetFile(part).read(columns=["source_file"]) for part in get_parquet_parts(path)]
+    return pa.concat_tables(tables).to_pandas()
 
 def prepare_table(df_sample, table_name, engine):
     """
-    Pastikan tabel ada di database.
+    Pastikan tabel (dan load ledger-nya) ada di database.
 
     Parameters:
     - df_sample (pd.DataFrame): Sample data untuk membuat schema.
@@ -33,10 +102,34 @@ def prepare_table(df_sample, table_name, engine):
     - None
     """
     ensure_table_exists(df_sample, table_name, engine)
+    ensure_load_ledger(table_name, engine)
+
+def staged_month(path):
+    """Bulan (YYYY-MM) dari nama staging harian ({date}.csv / date={date}), None jika tidak sesuai format."""
+    name = os.path.basename(path)
+    name = name[len("date="):] if name.startswith("date=") else os.path.splitext(name)[0]
+    try:
+        return pd.Timestamp(name).strftime("%Y-%m")
+    except ValueError:
+        return None
+
+def prepare_partitions(paths, table_name, engine):
+    """
+    Pastikan partisi bulanan RAW table ada untuk semua staging harian (on demand).
+
+    Parameters:
+    - paths (list[str]): Staging harian; bulan diambil dari nama file (staged_month).
+    - table_name (str): Nama RAW table.
+    - engine: SQLAlchemy engine.
+
+    Returns: None
+    """
+    for month in sorted({staged_month(path) for path in paths} - {None}):
+        ensure_month_partition(table_name, month, engine)
 
 def check_duplicate(df, table_name, engine):
     """
-    Cek apakah semua source_file di DataFrame sudah ada di DB.
+    Cek apakah semua source_file di DataFrame sudah di-load (satu lookup ke load ledger).
 
     Parameters:
     - df (pd.DataFrame)
@@ -46,99 +139,713 @@ def check_duplicate(df, table_name, engine):
     Returns:
     - bool: True jika semua file sudah ada di DB.
     """
-    source_files = df["source_file"].unique()
-    return all(is_file_already_inserted(table_name, sf, engine) for sf in source_files)
+    source_files = set(df["source_file"].unique())
+    return source_files <= get_loaded_files(table_name, source_files, engine)
 
-def insert_csv_in_chunks(path, table_name, engine, chunksize=100000):
+def compact_csv_dtypes(path):
     """
-    Insert CSV ke table DB per chunk.
+    Tentukan dtype kompak kolom CSV staging untuk pd.read_csv(dtype=...), sekali per file.
+
+    Parameters:
+    - path (str): File CSV.
+
+    Behavior:
+    - Kolom kode → Int8/Int16 (nullable) jika seluruh nilai di file bisa di-cast tanpa
+      kehilangan nilai (dicek dengan satu pass yang hanya membaca kolom kandidat),
+      flag → category. Semua chunk file mendapat dtype yang sama.
+    - Kolom uang tidak di-cast ke float32: to_sql mengirim float32 sebagai
+      double (16.42 → 16.420000076293945).
+
+    Returns:
+    - tuple: (dtypes, saved_bytes) — dtypes {column: dtype} dan selisih memory kolom
+      tersebut dibanding dtype default (untuk log_memory_report).
+    """
+    header = pd.read_csv(path, nrows=0).columns
+    candidates = [c for c in header if c in COMPACT_TYPES or c in CATEGORY_COLUMNS]
+    if not candidates:
+        return {}, 0
+    df = pd.read_csv(path, usecols=candidates)
+    dtypes, saved = {}, 0
+    for col in candidates:
+        dtype = "category" if col in CATEGORY_COLUMNS else str(COMPACT_TYPES[col]).capitalize()
+        try:
+            compact = df[col].astype(dtype)
+        except (TypeError, ValueError):
+            continue
+        dtypes[col] = dtype
+        saved += df[col].memory_usage(index=False, deep=True) - compact.memory_usage(index=False, deep=True)
+    return dtypes, saved
+
+def commit_chunk(chunk, table_name, engine, rows_committed, before_commit=None):
+    """
+    Insert satu chunk (to_sql) dan checkpoint-nya dalam satu transaksi.
+
+    Parameters:
+    - chunk (pd.DataFrame): Data chunk.
+    - table_name (str)
+    - engine
+    - rows_committed (int): Total baris file yang sudah di-commit termasuk chunk ini.
+    - before_commit (callable, optional): before_commit(cur, rows_committed, final=False).
+
+    Returns: None
+    """
+    with engine.begin() as conn:
+        chunk.to_sql(table_name, conn, schema=config.SCHEMA_RAW, if_exists="append", index=False)
+        if before_commit:
+            with conn.connection.cursor() as cur:
+                before_commit(cur, rows_committed, False)
+
+def finish_chunks(engine, rows_committed, before_commit=None):
+    """Transaksi penutup load per chunk: before_commit(cur, rows_committed, final=True)."""
+    if before_commit:
+        with engine.begin() as conn, conn.connection.cursor() as cur:
+            before_commit(cur, rows_committed, True)
+
+def insert_csv_in_chunks(path, table_name, engine, chunksize=100000, before_commit=None, start_row=0):
+    """
+    Insert CSV ke table DB per chunk, satu transaksi per chunk (resumable).
 
     Parameters:
     - path (str): File CSV.
     - table_name (str)
     - engine
     - chunksize (int): Jumlah baris per batch insert.
+    - before_commit (callable, optional): Dipanggil dengan (cursor psycopg2, rows_committed, final)
+      di dalam transaksi setiap chunk (final=False) dan sekali di akhir (final=True),
+      misal untuk mencatat checkpoint/load ledger di transaksi yang sama.
+    - start_row (int): Jumlah baris data yang di-skip (sudah di-commit di percobaan sebelumnya).
+
+    Behavior:
+    - Setiap chunk dan checkpoint-nya di-commit bersama, sehingga jika proses mati di
+      chunk ke-N, chunk 1..N-1 tercatat dan percobaan berikutnya mulai dari chunk N.
+    - Jika config.COMPACT_DTYPES, chunk langsung dibaca dengan dtype kompak
+      (compact_csv_dtypes, sama untuk semua chunk) tanpa frame lebar lebih dulu;
+      memory sebelum/sesudah dicatat ke log per file.
 
     Returns:
-    - int: Total rows inserted.
+    - int: Total rows inserted (di percobaan ini).
     """
     total_rows = 0
-    for chunk in pd.read_csv(path, chunksize=chunksize):
+    memory = {"before": 0, "after": 0}
+    skiprows = range(1, start_row + 1) if start_row else None
+    dtypes, saved = compact_csv_dtypes(path) if config.COMPACT_DTYPES else ({}, 0)
+    for chunk in pd.read_csv(path, chunksize=chunksize, skiprows=skiprows, dtype=dtypes):
         if chunk.empty:
             continue
+        memory["after"] += chunk.memory_usage(index=False, deep=True).sum()
         chunk["entry_time"] = datetime.now()
         if "source_file" not in chunk.columns:
             chunk["source_file"] = os.path.basename(path)
-        chunk.to_sql(table_name, engine, schema=config.SCHEMA_RAW, if_exists="append", index=False)
+        commit_chunk(chunk, table_name, engine, start_row + total_rows + len(chunk), before_commit)
         total_rows += len(chunk)
+    finish_chunks(engine, start_row + total_rows, before_commit)
+    memory["before"] = memory["after"] + saved
+    log_memory_report(os.path.basename(path), memory)
+    return total_rows
+
+def copy_csv_into_table(path, table_name, engine, before_commit=None):
+    """
+    Load CSV ke table DB menggunakan PostgreSQL COPY ... FROM STDIN.
+
+    Parameters:
+    - path (str): File CSV.
+    - table_name (str)
+    - engine
+    - before_commit (callable, optional): Dipanggil dengan (cursor, rows, final=True) sebelum commit.
+
+    Behavior:
+    - Kolom diambil dari header CSV; isi file dikirim apa adanya ke COPY (tanpa parsing
+      atau encode ulang per baris di Python, field CSV ber-quote yang berisi newline aman).
+    - entry_time (dan source_file jika tidak ada di CSV) diisi DEFAULT kolom dari setting
+      transaksi raw.entry_time / raw.source_file (schema_registry.METADATA_DEFAULTS).
+    - Seluruh file di-load dalam satu transaksi.
+
+    Returns:
+    - int: Total rows inserted.
+    """
+    with open(path, "rb") as f:
+        header = next(csv.reader([f.readline().decode("utf-8-sig")]))
+        column_list = ", ".join(f'"{c}"' for c in header)
+        sql = (
+            f'COPY "{config.SCHEMA_RAW}"."{table_name}" ({column_list}) '
+            "FROM STDIN WITH (FORMAT csv)"
+        )
+
+        raw_conn = engine.raw_connection()
+        try:
+            with raw_conn.cursor() as cur:
+                cur.execute(
+                    "SELECT set_config('raw.entry_time', %s, true), set_config('raw.source_file', %s, true)",
+                    (datetime.now().isoformat(sep=" "), os.path.basename(path))
+                )
+                cur.copy_expert(sql, f)
+                rows = cur.rowcount
+                if before_commit:
+                    before_commit(cur, rows, True)
+            raw_conn.commit()
+        except Exception:
+            raw_conn.rollback()
+            raise
+        finally:
+            raw_conn.close()
+
+    return rows
+
+
+def copy_parquet_into_table(path, table_name, engine, batch_size=100000, before_commit=None):
+    """
+    Load folder staging parquet harian ke table DB menggunakan COPY ... FROM STDIN.
+
+    Parameters:
+    - path (str): Folder date=YYYY-MM-DD berisi part-*.parquet.
+    - table_name (str)
+    - engine
+    - batch_size (int): Jumlah baris per record batch.
+    - before_commit (callable, optional): Dipanggil dengan (cursor, rows, final=True) sebelum commit.
+
+    Behavior:
+    - Kolom entry_time ditambahkan on the fly.
+    - Seluruh folder di-load dalam satu transaksi.
+
+    Returns:
+    - int: Total rows inserted.
+    """
+    entry_time = datetime.now()
+    total_rows = 0
+    raw_conn = engine.raw_connection()
+    try:
+        with raw_conn.cursor() as cur:
+            for part in get_parquet_parts(path):
+                for batch in pq.ParquetFile(part).iter_batches(batch_size=batch_size):
+                    table = with_entry_time(truncate_timestamps(pa.Table.from_batches([batch])), entry_time)
+                    copy_table(cur, table, table_name)
+                    total_rows += table.num_rows
+            if before_commit:
+                before_commit(cur, total_rows, True)
+        raw_conn.commit()
+    except Exception:
+        raw_conn.rollback()
+        raise
+    finally:
+        raw_conn.close()
+    return total_rows
+
+def insert_parquet_in_chunks(path, table_name, engine, chunksize=100000, before_commit=None, start_row=0):
+    """
+    Insert folder staging parquet harian ke table DB per chunk (DataFrame.to_sql), resumable.
+
+    Parameters:
+    - path (str): Folder date=YYYY-MM-DD berisi part-*.parquet.
+    - table_name (str)
+    - engine
+    - chunksize (int): Jumlah baris per batch insert.
+    - before_commit (callable, optional): Lihat insert_csv_in_chunks.
+    - start_row (int): Jumlah baris yang di-skip (sudah di-commit di percobaan sebelumnya).
+
+    Behavior:
+    - Satu transaksi per chunk bersama checkpoint-nya (lihat insert_csv_in_chunks).
+    - Kolom uang float32 (COMPACT_FLOAT32) dikembalikan ke float64 dibulatkan 2 desimal
+      sebelum to_sql, agar nilai di DB tetap 16.42 dan bukan 16.420000076293945.
+
+    Returns:
+    - int: Total rows inserted.
+    """
+    total_rows = 0
+    skip = start_row
+    for part in get_parquet_parts(path):
+        for batch in pq.ParquetFile(part).iter_batches(batch_size=chunksize):
+            if skip >= batch.num_rows:
+                skip -= batch.num_rows
+                continue
+            chunk = batch.slice(skip).to_pandas()
+            skip = 0
+            if chunk.empty:
+                continue
+            for col in chunk.columns.intersection(MONEY_COLUMNS):
+                if chunk[col].dtype == "float32":
+                    chunk[col] = chunk[col].astype("float64").round(2)
+            chunk["entry_time"] = datetime.now()
+            commit_chunk(chunk, table_name, engine, start_row + total_rows + len(chunk), before_commit)
+            total_rows += len(chunk)
+    finish_chunks(engine, start_row + total_rows, before_commit)
     return total_rows
 
 def move_file(path, target_folder):
     """
-    Pindahkan file ke folder tujuan.
+    Pindahkan file (atau folder partisi parquet) ke folder tujuan.
 
     Parameters:
-    - path (str): File path.
+    - path (str): File/folder path.
     - target_folder (str): Folder tujuan.
 
     Returns: None
     """
     os.makedirs(target_folder, exist_ok=True)
-    shutil.move(path, os.path.join(target_folder, os.path.basename(path)))
+    target = os.path.join(target_folder, os.path.basename(path))
+    if os.path.isdir(target):
+        shutil.rmtree(target)
+    shutil.move(path, target)
+
+def load_staged_file(path, table_name, engine, method, chunksize=100000, before_commit=None, start_row=0):
+    """
+    Load satu staging harian (CSV atau folder parquet) ke RAW table dengan method yang dipilih.
+
+    Behavior:
+    - COPY me-load satu file dalam satu transaksi (tidak ada commit parsial).
+    - Jika start_row > 0 (resume dari checkpoint), load per chunk (to_sql) dipakai
+      walaupun method "copy", karena hanya path itu yang bisa mulai di tengah file.
+
+    Returns:
+    - int: Total rows inserted.
+    """
+    if start_row:
+        method = "to_sql"
+    if is_parquet_partition(path) and method == "copy":
+        return copy_parquet_into_table(path, table_name, engine, config.PARQUET_BATCH_SIZE, before_commit)
+    if is_parquet_partition(path):
+        return insert_parquet_in_chunks(path, table_name, engine, chunksize, before_commit, start_row)
+    if method == "copy":
+        return copy_csv_into_table(path, table_name, engine, before_commit)
+    return insert_csv_in_chunks(path, table_name, engine, chunksize, before_commit, start_row)
 
-def upload_and_archive(cfg, engine, month=None, chunksize=100000):
+def load_with_retry(path, table_name, engine, method, chunksize, row_counts, checksum, before_commit):
     """
-    Upload semua CSV harian ke RAW table dan arsipkan file.
+    Load staging file dengan retry + exponential backoff untuk error koneksi, resume dari checkpoint.
+
+    Parameters:
+    - path, table_name, engine, method, chunksize: Lihat load_staged_file.
+    - row_counts (dict): {source_file: row_count} untuk lookup checkpoint di load ledger.
+    - checksum (str): Checksum staging file.
+    - before_commit (callable): Lihat insert_csv_in_chunks.
+
+    Behavior:
+    - Setiap percobaan membaca checkpoint (rows_committed) dari load ledger dan
+      melanjutkan dari chunk berikutnya, sehingga baris yang sudah di-commit tidak diduplikasi.
+    - Hanya TRANSIENT_DB_ERRORS yang di-retry (maks config.UPLOAD_RETRIES percobaan,
+      jeda UPLOAD_RETRY_BACKOFF * 2^(n-1) detik); error lain langsung di-raise.
+
+    Returns:
+    - int: Total rows inserted (semua percobaan).
+    """
+    file = os.path.basename(path)
+    first_row = None
+    for attempt in range(1, config.UPLOAD_RETRIES + 1):
+        start_row = get_checkpoint(table_name, row_counts, checksum, engine)
+        first_row = start_row if first_row is None else first_row
+        if start_row:
+            log(f"Resuming {file} from row {start_row:,} (last committed chunk)")
+        try:
+            rows = load_staged_file(path, table_name, engine, method, chunksize, before_commit, start_row)
+            return start_row - first_row + rows
+        except TRANSIENT_DB_ERRORS as e:
+            if attempt == config.UPLOAD_RETRIES:
+                raise
+            wait = config.UPLOAD_RETRY_BACKOFF * 2 ** (attempt - 1)
+            log(f"Transient error loading {file} (attempt {attempt}/{config.UPLOAD_RETRIES}) — {e}; "
+                f"retrying in {wait:.1f}s", "WARNING")
+            time.sleep(wait)
+
+def staged_row_counts(path, table_name, engine, old_folder, failed_folder, prepare=True):
+    """
+    Cek satu staging harian sebelum load: kosong, sudah ter-load, atau perlu di-load.
+
+    Parameters:
+    - path (str): File CSV atau folder date=YYYY-MM-DD.
+    - table_name (str): Nama RAW table.
+    - engine: SQLAlchemy engine.
+    - old_folder (str): Folder arsip jika sudah pernah di-load.
+    - failed_folder (str): Folder arsip jika kosong.
+    - prepare (bool): Pastikan RAW table dan kolomnya ada dari sample (prepare_table).
+
+    Behavior:
+    - File kosong dipindah ke failed, file yang semua source_file-nya sudah 'LOADED'
+      di load ledger dipindah ke old (satu lookup ledger per file).
+
+    Returns:
+    - dict | None: {source_file: jumlah baris} untuk dicatat di ledger ({file: None} jika
+      staging tanpa kolom source_file); None jika file di-skip (sudah dipindah).
+    """
+    file = os.path.basename(path)
+    df_sample = read_staged_sample(path)
+    if df_sample.empty:
+        log(f"Empty file, skipping {file}")
+        move_file(path, failed_folder)
+        return None
+    if prepare:
+        prepare_table(df_sample.head(5), table_name, engine)
+
+    if "source_file" in df_sample.columns:
+        df_source = read_staged_source_files(path)
+    else:
+        df_source = pd.DataFrame({"source_file": [file]})
+    if check_duplicate(df_source, table_name, engine):
+        log(f"Skipping {file}, all rows already inserted based on load ledger.")
+        move_file(path, old_folder)
+        return None
+
+    if "source_file" not in df_sample.columns:
+        return {file: None}
+    counts = df_source["source_file"].value_counts()
+    return counts[counts > 0].to_dict()
+
+def upload_staged_file(path, table_name, engine, method, chunksize, old_folder, failed_folder, prepared=False):
+    """
+    Upload satu staging harian ke RAW table lalu arsipkan ke old/failed.
+
+    Parameters:
+    - path (str): File CSV atau folder date=YYYY-MM-DD.
+    - table_name (str): Nama RAW table.
+    - engine: SQLAlchemy engine.
+    - method (str): "copy" atau "to_sql".
+    - chunksize (int): Jumlah baris per insert chunk (method "to_sql").
+    - old_folder (str): Folder arsip jika berhasil / sudah pernah di-load.
+    - failed_folder (str): Folder arsip jika kosong / gagal.
+    - prepared (bool): True jika tabel sudah dipastikan ada (mode parallel).
+
+    Behavior:
+    - Skip check: satu lookup ke load ledger untuk semua source_file di file.
+    - Load dan pencatatan ledger (source_file, checksum, row_count) di-commit
+      dalam satu transaksi; jika gagal, ledger ditandai 'FAILED'.
+    - Method "to_sql" commit per chunk dengan checkpoint 'PARTIAL' (rows_committed);
+      error koneksi di-retry dengan backoff dan dilanjutkan dari chunk terakhir yang
+      di-commit (load_with_retry), begitu juga saat file di failed/ di-retry.
+    - Setiap file dipindahkan tepat sekali (old atau failed), sehingga aman
+      dipanggil paralel untuk file yang berbeda.
+
+    Returns:
+    - tuple: (rows_inserted, seconds)
+    """
+    file = os.path.basename(path)
+    row_counts, checksum = {}, None
+    log(f"Uploading {file} into table \"{config.SCHEMA_RAW}\".\"{table_name}\" (method={method})")
+
+    try:
+        row_counts = staged_row_counts(path, table_name, engine, old_folder, failed_folder, prepare=not prepared)
+        if row_counts is None:
+            return 0, 0.0
+        if not prepared:
+            prepare_partitions([path], table_name, engine)
+        checksum = file_checksum(get_parquet_parts(path) if is_parquet_partition(path) else [path])
+
+        def before_commit(cur, rows_committed, final):
+            if final:
+                record_loads(cur, table_name, row_counts, checksum)
+            else:
+                record_checkpoint(cur, table_name, row_counts, rows_committed, checksum)
+
+        start = time.perf_counter()
+        total_rows = load_with_retry(path, table_name, engine, method, chunksize, row_counts, checksum, before_commit)
+        elapsed = time.perf_counter() - start
+
+        log(f"Inserted {total_rows:,} rows from {file} in {elapsed:.2f}s "
+            f"({total_rows / max(elapsed, 1e-9):,.0f} rows/s)")
+        move_file(path, old_folder)
+        return total_rows, elapsed
+
+    except Exception as e:
+        log(f"Error inserting {file}: {e}", "ERROR")
+        if row_counts:
+            mark_load_failed(table_name, row_counts, engine, checksum)
+        move_file(path, failed_folder)
+        return 0, 0.0
+
+def requeue_failed_files(cfg, month=None):
+    """
+    Pindahkan staging file di folder failed kembali ke folder input agar di-upload ulang.
+
+    Parameters:
+    - cfg (dict): Konfigurasi folder dan tabel (lihat upload_and_archive).
+    - month (str, optional): Bulan format YYYY-MM. Default: semua bulan di folder failed.
+
+    Behavior:
+    - Load yang sempat commit sebagian dilanjutkan dari checkpoint di load ledger;
+      file yang sudah 'LOADED' di-skip oleh check_duplicate.
+
+    Returns:
+    - list[str]: Bulan yang punya file di-requeue.
+    """
+    if month:
+        months = [month]
+    elif os.path.isdir(cfg["failed"]):
+        months = sorted(d for d in os.listdir(cfg["failed"]) if os.path.isdir(os.path.join(cfg["failed"], d)))
+    else:
+        months = []
+
+    requeued = []
+    for m in months:
+        failed_folder = os.path.join(cfg["failed"], m)
+        files = get_staged_files(failed_folder)
+        if not files:
+            continue
+        for file in files:
+            move_file(os.path.join(failed_folder, file), os.path.join(cfg["input"], m))
+        log(f"Requeued {len(files)} failed file(s) from {failed_folder}")
+        requeued.append(m)
+    return requeued
+
+def month_parquet_files(cfg, month):
+    """File parquet sumber (DOWNLOAD_DIR/YYYY-MM) untuk staging folder cfg (yellow/green)."""
+    color = "yellow" if cfg["input"] == config.YELLOW_DIR else "green"
+    return sorted(
+        path for path in glob.glob(os.path.join(config.DOWNLOAD_DIR, month, "*.parquet"))
+        if color in os.path.basename(path).lower()
+    )
+
+def upload_month_via_stage(cfg, engine, month, chunksize=100000, method=None):
+    """
+    Upload staging harian satu bulan lewat UNLOGGED stage table, lalu publish secara atomic.
+
+    Parameters:
+    - cfg (dict): Konfigurasi folder dan tabel (lihat upload_and_archive).
+    - engine: SQLAlchemy engine.
+    - month (str): Bulan format YYYY-MM.
+    - chunksize (int): Jumlah baris per insert chunk (method "to_sql").
+    - method (str, optional): "copy" atau "to_sql". Default: config.UPLOAD_METHOD.
+
+    Behavior:
+    - Semua file harian yang belum ada di load ledger (staged_row_counts) di-load ke
+      "<table>_stage_YYYYMM" (UNLOGGED, tanpa WAL saat load).
+    - Validasi sebelum publish: jumlah baris stage = jumlah baris file harian
+      (source_file), dan = jumlah baris parquet sumber (expected_split_rows) dikurangi
+      baris bulan itu yang sudah ada di RAW (count_month_rows; tabel tidak dipartisi:
+      hanya jika seluruh bulan ada di stage).
+    - Publish dalam satu transaksi bersama ledger: stage di-ATTACH sebagai partisi bulan
+      (atau INSERT ... SELECT jika tidak bisa), lihat publish_stage_table.
+    - Jika load/validasi gagal, stage di-drop dan semua file dipindah ke failed;
+      RAW table tidak tersentuh.
+    - Bukan pengurang WAL kecuali wal_level=minimal: SET LOGGED saat publish menulis
+      seluruh isi stage ke WAL, sehingga dengan wal_level=replica total WAL sedikit di atas
+      COPY langsung (yellow 2025-01: 64 MB vs 49 MB). Warning dicatat jika wal_level bukan
+      minimal. Volume WAL (pg_current_wal_lsn) dan throughput load + publish dicatat di log.
+
+    Returns: None
+    """
+    method = resolve_method(method)
+    input_folder = os.path.join(cfg["input"], month)
+    old_folder = os.path.join(cfg["old"], month)
+    failed_folder = os.path.join(cfg["failed"], month)
+    table_name = cfg["table"]
+    full_table = f'"{config.SCHEMA_RAW}"."{table_name}"'
+    stage_name = f"{table_name}_stage_{month.replace('-', '')}"
+
+    staged_files = get_staged_files(input_folder)
+    if not staged_files:
+        log(f"No staging files found in {input_folder}")
+        return
+
+    pending, skipped = [], 0
+    for file in staged_files:
+        path = os.path.join(input_folder, file)
+        row_counts = staged_row_counts(path, table_name, engine, old_folder, failed_folder, prepare=not pending)
+        if row_counts is None:
+            skipped += 1
+            continue
+        pending.append((path, row_counts))
+    if not pending:
+        log(f"Finished uploading table {full_table}")
+        return
+
+    row_counts = {}
+    for _, counts in pending:
+        row_counts.update(counts)
+    wal_level = get_wal_level(engine)
+    if wal_level != "minimal":
+        log(f"UPLOAD_STAGE_TABLE with wal_level={wal_level}: publish writes the stage to WAL "
+            "(more WAL than a direct load); stage mode only saves WAL with wal_level=minimal", "WARNING")
+    start_lsn = get_wal_lsn(engine)
+    start = time.perf_counter()
+    log(f"Loading {len(pending)} file(s) into UNLOGGED stage \"{config.SCHEMA_RAW}\".\"{stage_name}\" (method={method})")
+    try:
+        create_stage_table(table_name, stage_name, engine)
+        loaded_rows = 0
+        checksums = {}
+        for path, counts in pending:
+            loaded_rows += load_staged_file(path, stage_name, engine, method, chunksize)
+            checksum = file_checksum(get_parquet_parts(path) if is_parquet_partition(path) else [path])
+            checksums.update(dict.fromkeys(counts, checksum))
+        load_seconds = time.perf_counter() - start
+
+        stage_rows = count_rows(stage_name, engine)
+        expected = {"loaded": loaded_rows}
+        if None not in row_counts.values():
+            expected["staging files"] = sum(row_counts.values())
+        parquet_files = month_parquet_files(cfg, month)
+        already = count_month_rows(table_name, month, engine) if config.PARQUET_MONTH_FILTER else None
+        if parquet_files and already is not None:
+            expected["parquet"] = sum(expected_split_rows(p) for p in parquet_files) - already
+        elif parquet_files and not skipped:
+            expected["parquet"] = sum(expected_split_rows(p) for p in parquet_files)
+        mismatched = {k: v for k, v in expected.items() if v != stage_rows}
+        if mismatched:
+            raise ValueError(f"stage has {stage_rows:,} rows, expected " +
+                             ", ".join(f"{v:,} ({k})" for k, v in mismatched.items()))
+        log(f"Stage validated: {stage_rows:,} rows (" + ", ".join(expected) + ")")
+
+        def before_commit(cur):
+            for file_name, rows in row_counts.items():
+                record_loads(cur, table_name, {file_name: rows}, checksums[file_name])
+
+        # Partisi bulan ini dibuat oleh publish_stage_table (attach stage), bukan di sini
+        prepare_partitions([path for path, _ in pending if staged_month(path) != month], table_name, engine)
+        publish_start = time.perf_counter()
+        published = publish_stage_table(stage_name, table_name, month, engine, before_commit)
+        publish_seconds = time.perf_counter() - publish_start
+    except Exception as e:
+        log(f"Error loading stage for {full_table} {month}: {e}", "ERROR")
+        drop_stage_table(stage_name, engine)
+        mark_load_failed(table_name, row_counts, engine)
+        for path, _ in pending:
+            move_file(path, failed_folder)
+        return
+
+    for path, _ in pending:
+        move_file(path, old_folder)
+    elapsed = time.perf_counter() - start
+    wal_mb = wal_bytes_since(start_lsn, engine) / (1024 * 1024)
+    log(f"Published {published:,} rows into {full_table} (load {load_seconds:.2f}s, publish {publish_seconds:.2f}s, "
+        f"{published / max(elapsed, 1e-9):,.0f} rows/s, WAL {wal_mb:,.1f} MB)")
+    log(f"Finished uploading table {full_table}")
+
+def resolve_method(method):
+    """Ambil upload method (default config.UPLOAD_METHOD), fallback ke "to_sql" jika tidak dikenal."""
+    method = method or config.UPLOAD_METHOD
+    if method not in ("copy", "to_sql"):
+        log(f"Unknown upload method '{method}', fallback to 'to_sql'", "WARNING")
+        method = "to_sql"
+    return method
+
+def upload_and_archive(cfg, engine, month=None, chunksize=100000, method=None):
+    """
+    Upload semua staging harian (CSV atau folder parquet date=YYYY-MM-DD) ke RAW table dan arsipkan.
 
     Parameters:
     - cfg (dict): Konfigurasi folder dan tabel.
       Contoh: {"input": "input_folder", "old": "old_folder", "failed": "failed_folder", "table": "table_name"}
     - engine: SQLAlchemy engine.
     - month (str): Bulan format YYYY-MM.
-    - chunksize (int): Jumlah baris per insert chunk.
+    - chunksize (int): Jumlah baris per insert chunk (hanya untuk method "to_sql").
+    - method (str, optional): "copy" atau "to_sql". Default: config.UPLOAD_METHOD.
+
+    Behavior:
+    - Mencatat throughput (rows/s) per file dan total per tabel ke log,
+      sehingga method "copy" dan "to_sql" bisa dibandingkan.
+    - Tipe kolom RAW table diambil dari schema parquet sumber bulan tersebut
+      (schema_registry); kolom baru di staging di-ADD COLUMN otomatis.
+    - Jika config.UPLOAD_STAGE_TABLE, satu bulan di-load lewat UNLOGGED stage table
+      dan di-publish atomic (lihat upload_month_via_stage).
 
     Returns: None
     """
+    method = resolve_method(method)
+
     if not month:
         log("Month not specified for upload, skipping")
         return
+    schema_registry.register_source_schema(cfg["table"], month_parquet_files(cfg, month))
+    if config.UPLOAD_STAGE_TABLE:
+        return upload_month_via_stage(cfg, engine, month, chunksize, method)
 
     input_folder = os.path.join(cfg["input"], month)
     old_folder = os.path.join(cfg["old"], month)
     failed_folder = os.path.join(cfg["failed"], month)
     table_name = cfg["table"]
 
-    csv_files = get_csv_files(input_folder)
-    if not csv_files:
-        log(f"No CSV files found in {input_folder}")
+    staged_files = get_staged_files(input_folder)
+    if not staged_files:
+        log(f"No staging files found in {input_folder}")
         return
 
     full_table = f'"{config.SCHEMA_RAW}"."{table_name}"'
+    table_rows, table_seconds = 0, 0.0
 
-    for file in csv_files:
-        path = os.path.join(input_folder, file)
-        log(f"Uploading {file} into table {full_table}")
+    for file in staged_files:
+        rows, seconds = upload_staged_file(
+            os.path.join(input_folder, file), table_name, engine, method, chunksize, old_folder, failed_folder
+        )
+        table_rows += rows
+        table_seconds += seconds
 
-        try:
-            df = pd.read_csv(path)
-            if df.empty:
-                log(f"Empty file, skipping {file}")
-                move_file(path, failed_folder)
-                continue
+    if table_rows:
+        log(f"Throughput {full_table} (method={method}): {table_rows:,} rows in {table_seconds:.2f}s "
+            f"({table_rows / max(table_seconds, 1e-9):,.0f} rows/s)")
+    log(f"Finished uploading table {full_table}")
 
-            prepare_table(df.head(5), table_name, engine)
+def upload_parallel(cfgs, engine, month=None, workers=None, chunksize=100000, method=None):
+    """
+    Upload staging harian semua tabel secara paralel (satu koneksi pool per worker).
 
-            if check_duplicate(df, table_name, engine):
-                log(f"Skipping {file}, all rows already inserted based on source_file.")
-                move_file(path, old_folder)
-                continue
+    Parameters:
+    - cfgs (list[dict]): Konfigurasi folder dan tabel (lihat upload_and_archive), misal yellow dan green.
+    - engine: SQLAlchemy engine (QueuePool).
+    - month (str): Bulan format YYYY-MM.
+    - workers (int, optional): Jumlah thread upload. Default: config.UPLOAD_WORKERS.
+    - chunksize (int): Jumlah baris per insert chunk (hanya untuk method "to_sql").
+    - method (str, optional): "copy" atau "to_sql". Default: config.UPLOAD_METHOD.
 
-            total_rows = insert_csv_in_chunks(path, table_name, engine, chunksize)
-            log(f"Inserted {total_rows:,} rows from {file}")
-            move_file(path, old_folder)
+    Behavior:
+    - Setiap tabel dan partisi bulanannya dipastikan ada sekali sebelum fan-out
+      (tidak ada CREATE TABLE paralel).
+    - Setiap file harian = satu task; file berbeda di-load dan diarsipkan independen.
+    - Log throughput agregat (total rows / wall-clock) dan per tabel, untuk sizing
+      UPLOAD_WORKERS terhadap DB_POOL_SIZE + DB_MAX_OVERFLOW.
 
-        except Exception as e:
-            log(f"Error inserting {file}: {e}", "ERROR")
-            move_file(path, failed_folder)
+    Returns: None
+    """
+    method = resolve_method(method)
+    workers = workers or config.UPLOAD_WORKERS
 
-    log(f"Finished uploading table {full_table}")
+    if not month:
+        log("Month not specified for upload, skipping")
+        return
+
+    tasks = []
+    for cfg in cfgs:
+        input_folder = os.path.join(cfg["input"], month)
+        staged_files = get_staged_files(input_folder)
+        if not staged_files:
+            log(f"No staging files found in {input_folder}")
+            continue
+
+        schema_registry.register_source_schema(cfg["table"], month_parquet_files(cfg, month))
+        for file in staged_files:
+            df_sample = read_staged_sample(os.path.join(input_folder, file), nrows=5)
+            if not df_sample.empty:
+                prepare_table(df_sample, cfg["table"], engine)
+                prepare_partitions(staged_files, cfg["table"], engine)
+                break
+
+        tasks.extend(
+            (os.path.join(input_folder, file), cfg["table"],
+             os.path.join(cfg["old"], month), os.path.join(cfg["failed"], month))
+            for file in staged_files
+        )
+    if not tasks:
+        return
+
+    pool_capacity = config.DB_POOL_SIZE + config.DB_MAX_OVERFLOW
+    if workers > pool_capacity:
+        log(f"UPLOAD_WORKERS={workers} exceeds connection pool capacity ({pool_capacity}); "
+            f"workers will wait for connections", "WARNING")
+    log(f"Parallel upload: {len(tasks)} file(s), {workers} worker(s), method={method}")
+
+    table_totals = {}
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {
+            pool.submit(upload_staged_file, path, table_name, engine, method, chunksize, old_folder, failed_folder, True): table_name
+            for path, table_name, old_folder, failed_folder in tasks
+        }
+        for future in as_completed(futures):
+            rows, seconds = future.result()
+            totals = table_totals.setdefault(futures[future], [0, 0.0])
+            totals[0] += rows
+            totals[1] += seconds
+    wall = time.perf_counter() - start
+
+    for table_name, (rows, seconds) in table_totals.items():
+        if rows:
+            log(f"Throughput \"{config.SCHEMA_RAW}\".\"{table_name}\" (method={method}): {rows:,} rows, "
+                f"{seconds:.2f}s busy ({rows / max(seconds, 1e-9):,.0f} rows/s per worker)")
+    total_rows = sum(rows for rows, _ in table_totals.values())
+    log(f"Aggregate upload throughput ({workers} workers, method={method}): {total_rows:,} rows in "
+        f"{wall:.2f}s wall-clock ({total_rows / max(wall, 1e-9):,.0f} rows/s)")
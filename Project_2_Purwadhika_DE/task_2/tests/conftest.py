@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Root task_2 di sys.path agar test bisa import package src (sama seperti main_extract.py)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
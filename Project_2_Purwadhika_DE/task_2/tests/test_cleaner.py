@@ -0,0 +1,49 @@
+from datetime import date
+
+import pytest
+
+from src.extract_and_load.clean import cleaner
+
+
+class FixedDate(date):
+    @classmethod
+    def today(cls):
+        return cls(2025, 3, 15)
+
+
+@pytest.fixture
+def today(monkeypatch):
+    monkeypatch.setattr(cleaner, "date", FixedDate)
+
+
+def test_retention_window_from_start_date(today, monkeypatch):
+    monkeypatch.setattr(cleaner, "CLEAN_RETENTION_START", "2024-01-01")
+    monkeypatch.setattr(cleaner, "CLEAN_RETENTION_MONTHS", 0)
+
+    assert cleaner.retention_window() == (date(2024, 1, 1), date(2025, 4, 1))
+
+
+def test_retention_window_rolling_months(today, monkeypatch):
+    monkeypatch.setattr(cleaner, "CLEAN_RETENTION_START", "2024-01-01")
+    monkeypatch.setattr(cleaner, "CLEAN_RETENTION_MONTHS", 3)
+
+    # 3 bulan terakhir termasuk bulan ini: Januari .. Maret 2025
+    assert cleaner.retention_window() == (date(2025, 1, 1), date(2025, 4, 1))
+
+    monkeypatch.setattr(cleaner, "CLEAN_RETENTION_START", "2025-02-10")
+    assert cleaner.retention_window() == (date(2025, 2, 10), date(2025, 4, 1))
+
+
+def test_add_months_crosses_year():
+    assert cleaner.add_months(date(2025, 1, 1), -1) == date(2024, 12, 1)
+    assert cleaner.add_months(date(2024, 11, 1), 14) == date(2026, 1, 1)
+
+
+def test_index_definitions_cover_index_only_when_include_set(monkeypatch):
+    monkeypatch.setattr(cleaner, "CLEAN_PICKUP_BRIN", True)
+    monkeypatch.setattr(cleaner, "CLEAN_INDEX_INCLUDE", [])
+    assert list(cleaner.index_definitions("t", "yellow_tripdata", "pickup")) == ["idx_yellow_tripdata_pickup_brin"]
+
+    monkeypatch.setattr(cleaner, "CLEAN_INDEX_INCLUDE", ["fare_amount", "total_amount"])
+    indexes = cleaner.index_definitions("t", "yellow_tripdata", "pickup")
+    assert indexes["idx_yellow_tripdata_pickup_cover"].endswith('("pickup") INCLUDE ("fare_amount", "total_amount")')
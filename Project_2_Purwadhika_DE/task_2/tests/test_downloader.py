@@ -0,0 +1,182 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+from src.extract_and_load.raw import config, downloader, http_cache
+
+
+class ParquetHandler(BaseHTTPRequestHandler):
+    """
+    Stand-in server TLC: melayani satu file parquet dengan dukungan HTTP Range.
+
+    Mode (atribut server):
+    - "range": Range dilayani dengan 206, 416 jika offset >= ukuran file; Range diabaikan
+      (200) jika If-Range tidak sama dengan ETag server.
+    - "ignore_range": Range diabaikan, selalu 200 dengan seluruh file.
+    - "cut_first": request pertama memutus koneksi setelah setengah file, lalu seperti "range".
+    - "error": selalu 500.
+    """
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        server = self.server
+        data = server.data
+        server.requests.append(self.headers.get("Range"))
+        server.if_ranges.append(self.headers.get("If-Range"))
+
+        if server.mode == "error":
+            self.send_error(500)
+            return
+
+        offset = 0
+        range_header = self.headers.get("Range")
+        if_range = self.headers.get("If-Range")
+        if range_header and server.mode != "ignore_range" and if_range in (None, server.etag):
+            offset = int(range_header.split("=")[1].rstrip("-"))
+            if offset >= len(data):
+                self.send_response(416)
+                self.send_header("Content-Range", f"bytes */{len(data)}")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {offset}-{len(data) - 1}/{len(data)}")
+        else:
+            self.send_response(200)
+        body = data[offset:]
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", server.etag)
+        self.end_headers()
+
+        if server.mode == "cut_first" and len(server.requests) == 1:
+            self.wfile.write(body[:len(body) // 2])
+            self.wfile.flush()
+            self.close_connection = True
+            return
+        self.wfile.write(body)
+
+
+@pytest.fixture
+def parquet_bytes(tmp_path):
+    """Isi file parquet kecil dengan kolom pickup datetime (lolos validate_parquet)."""
+    table = pa.table({
+        "tpep_pickup_datetime": pa.array(range(50000), pa.timestamp("s")),
+        "fare_amount": pa.array([float(i) for i in range(50000)]),
+    })
+    path = tmp_path / "source.parquet"
+    pq.write_table(table, path, compression="none")
+    return path.read_bytes()
+
+
+@pytest.fixture
+def server(parquet_bytes, tmp_path, monkeypatch):
+    """Jalankan stand-in server di port acak; cache HTTP dan log diarahkan ke tmp_path."""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(config, "HTTP_CACHE_DIR", str(tmp_path / "cache"))
+    monkeypatch.setattr(config, "DOWNLOAD_RETRY_BACKOFF", 0.0)
+
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), ParquetHandler)
+    httpd.data = parquet_bytes
+    httpd.mode = "range"
+    httpd.etag = '"v1"'
+    httpd.requests = []
+    httpd.if_ranges = []
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    httpd.url = f"http://127.0.0.1:{httpd.server_address[1]}/yellow_tripdata_2025-01.parquet"
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def write_part(tmp_path, data, etag='"v1"'):
+    """Tulis .part beserta validator-nya seperti sisa download sebelumnya."""
+    part = tmp_path / "yellow_tripdata_2025-01.parquet.part"
+    part.write_bytes(data)
+    if etag:
+        http_cache.write_json(http_cache.parquet_meta_path(str(part)), {"etag": etag})
+    return part
+
+
+def test_resume_after_interrupted_download(server, tmp_path, parquet_bytes):
+    server.mode = "cut_first"
+    target = tmp_path / "yellow_tripdata_2025-01.parquet"
+
+    assert downloader.download_file(server.url, str(target), chunk_size=4096, retries=3) == str(target)
+
+    assert target.read_bytes() == parquet_bytes
+    assert not (tmp_path / "yellow_tripdata_2025-01.parquet.part").exists()
+    # Percobaan kedua melanjutkan dari byte yang sudah diterima (206), bukan dari awal
+    assert server.requests[0] is None
+    resumed_from = int(server.requests[1].split("=")[1].rstrip("-"))
+    assert 0 < resumed_from <= len(parquet_bytes) // 2
+    assert server.if_ranges[1] == '"v1"'
+
+
+def test_part_rewritten_when_server_ignores_range(server, tmp_path, parquet_bytes):
+    server.mode = "ignore_range"
+    target = tmp_path / "yellow_tripdata_2025-01.parquet"
+    write_part(tmp_path, b"stale partial bytes")
+
+    assert downloader.download_file(server.url, str(target), retries=1) == str(target)
+
+    assert server.requests == ["bytes=19-"]
+    assert target.read_bytes() == parquet_bytes
+
+
+def test_complete_part_is_published_on_416(server, tmp_path, parquet_bytes):
+    target = tmp_path / "yellow_tripdata_2025-01.parquet"
+    write_part(tmp_path, parquet_bytes)
+
+    assert downloader.download_file(server.url, str(target), retries=1) == str(target)
+
+    assert server.requests == [f"bytes={len(parquet_bytes)}-"]
+    assert target.read_bytes() == parquet_bytes
+
+
+def test_part_of_republished_file_is_not_appended(server, tmp_path, parquet_bytes):
+    target = tmp_path / "yellow_tripdata_2025-01.parquet"
+    write_part(tmp_path, b"x" * 1000, etag='"v0"')
+
+    assert downloader.download_file(server.url, str(target), retries=1) == str(target)
+
+    assert server.if_ranges == ['"v0"']
+    assert target.read_bytes() == parquet_bytes
+    assert not (tmp_path / "cache" / "parquet" / "yellow_tripdata_2025-01.parquet.part.json").exists()
+
+
+def test_part_without_validator_starts_from_zero(server, tmp_path, parquet_bytes):
+    target = tmp_path / "yellow_tripdata_2025-01.parquet"
+    write_part(tmp_path, parquet_bytes[:1000], etag=None)
+
+    assert downloader.download_file(server.url, str(target), retries=1) == str(target)
+
+    assert server.requests == [None]
+    assert target.read_bytes() == parquet_bytes
+
+
+def test_invalid_part_is_discarded(server, tmp_path, parquet_bytes):
+    server.data = b"not a parquet file" * 100
+    target = tmp_path / "yellow_tripdata_2025-01.parquet"
+
+    assert downloader.download_file(server.url, str(target), retries=1) is None
+
+    assert not target.exists()
+    assert not (tmp_path / "yellow_tripdata_2025-01.parquet.part").exists()
+
+
+def test_retries_back_off_exponentially(server, tmp_path, monkeypatch):
+    server.mode = "error"
+    monkeypatch.setattr(config, "DOWNLOAD_RETRY_BACKOFF", 1.5)
+    waits = []
+    monkeypatch.setattr(downloader.time, "sleep", waits.append)
+
+    assert downloader.download_file(server.url, str(tmp_path / "x.parquet"), retries=4) is None
+
+    assert len(server.requests) == 4
+    assert waits == [1.5, 3.0, 6.0]
@@ -0,0 +1,27 @@
+from src.extract_and_load.raw import http_cache
+
+
+def test_parse_link_index_keeps_first_link_per_month_and_color():
+    html = """
+    <a href=" https://cdn/trip-data/yellow_tripdata_2025-01.parquet ">Yellow</a>
+    <a href="https://cdn/trip-data/green_tripdata_2025-01.parquet">Green</a>
+    <a href="https://mirror/yellow_tripdata_2025-01.parquet">Yellow mirror</a>
+    <a href="https://cdn/trip-data/fhv_tripdata_2025-01.parquet">FHV</a>
+    <a href="https://cdn/trip-data/yellow_tripdata_2024-12.parquet">Yellow</a>
+    <a>no href</a>
+    """
+
+    assert http_cache.parse_link_index(html) == {
+        "2025-01": {
+            "yellow": "https://cdn/trip-data/yellow_tripdata_2025-01.parquet",
+            "green": "https://cdn/trip-data/green_tripdata_2025-01.parquet",
+        },
+        "2024-12": {"yellow": "https://cdn/trip-data/yellow_tripdata_2024-12.parquet"},
+    }
+
+
+def test_if_range_value_prefers_strong_etag():
+    assert http_cache.if_range_value({"etag": '"abc"', "last_modified": "Mon"}) == '"abc"'
+    assert http_cache.if_range_value({"etag": 'W/"abc"', "last_modified": "Mon"}) == "Mon"
+    assert http_cache.if_range_value({"etag": None, "last_modified": None}) is None
+    assert http_cache.if_range_value(None) is None
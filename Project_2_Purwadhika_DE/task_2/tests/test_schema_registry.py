@@ -0,0 +1,49 @@
+import pandas as pd
+import pyarrow as pa
+
+from src.extract_and_load.raw import schema_registry
+
+
+def test_pg_type():
+    assert schema_registry.pg_type(pa.int8()) == "SMALLINT"
+    assert schema_registry.pg_type(pa.int16()) == "SMALLINT"
+    assert schema_registry.pg_type(pa.int32()) == "INTEGER"
+    assert schema_registry.pg_type(pa.uint32()) == "BIGINT"
+    assert schema_registry.pg_type(pa.int64()) == "BIGINT"
+    assert schema_registry.pg_type(pa.float32()) == "DOUBLE PRECISION"
+    assert schema_registry.pg_type(pa.timestamp("us")) == "TIMESTAMP"
+    assert schema_registry.pg_type(pa.timestamp("us", tz="UTC")) == "TIMESTAMPTZ"
+    assert schema_registry.pg_type(pa.dictionary(pa.int32(), pa.string())) == "TEXT"
+    assert schema_registry.pg_type(pa.null()) == "TEXT"
+
+
+def test_column_types_prefer_source_schema(monkeypatch):
+    monkeypatch.setitem(schema_registry.SOURCE_SCHEMAS, "yellow_tripdata", pa.schema([
+        ("VendorID", pa.int32()), ("fare_amount", pa.float64()),
+    ]))
+    # sample CSV: VendorID terbaca int64, fare_amount kebetulan bulat, pickup masih string
+    sample = pd.DataFrame({
+        "VendorID": [1], "fare_amount": [16], "tpep_pickup_datetime": ["2025-01-01 00:00:00"],
+        "source_file": ["parquet012025_01_01_2025"],
+    })
+
+    assert schema_registry.column_types("yellow_tripdata", sample) == {
+        "VendorID": "INTEGER",
+        "fare_amount": "DOUBLE PRECISION",
+        "tpep_pickup_datetime": "TIMESTAMP",
+        "source_file": "TEXT",
+        "entry_time": "TIMESTAMP",
+    }
+
+
+def test_needs_widening_only_widens_numeric():
+    assert schema_registry.needs_widening("BIGINT", "DOUBLE PRECISION")
+    assert not schema_registry.needs_widening("DOUBLE PRECISION", "BIGINT")
+    assert not schema_registry.needs_widening("TEXT", "TIMESTAMP")
+
+
+def test_needs_retype_types_legacy_text_timestamps():
+    assert schema_registry.needs_retype("TEXT", "TIMESTAMP")
+    assert schema_registry.needs_retype("BIGINT", "DOUBLE PRECISION")
+    assert not schema_registry.needs_retype("TIMESTAMP", "TIMESTAMP")
+    assert not schema_registry.needs_retype("TEXT", "BIGINT")
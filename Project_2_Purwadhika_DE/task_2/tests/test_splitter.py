@@ -0,0 +1,97 @@
+from datetime import datetime
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from src.extract_and_load.raw import config, splitter
+
+
+def test_process_parquet_batch_groups_rows_per_day():
+    batch = pa.record_batch({
+        "tpep_pickup_datetime": pa.array([
+            datetime(2025, 1, 2, 8, 0, 0, 500000), None,
+            datetime(2025, 1, 1, 23, 59, 59), datetime(2025, 1, 2, 7, 0),
+        ], pa.timestamp("us")),
+        "fare_amount": [1.0, 2.0, 3.0, 4.0],
+    })
+
+    table, days = splitter.process_parquet_batch(batch, "tpep_pickup_datetime", "parquet012025_")
+
+    # pickup NULL dibuang, urutan asli dalam satu hari tetap, timestamp dibulatkan ke detik
+    assert table["fare_amount"].to_pylist() == [3.0, 1.0, 4.0]
+    assert table.schema.field("tpep_pickup_datetime").type == pa.timestamp("s")
+    assert days == [
+        ("2025-01-01", "parquet012025_01_01_2025", 0, 1),
+        ("2025-01-02", "parquet012025_02_01_2025", 1, 2),
+    ]
+    assert table["source_file"].to_pylist() == ["parquet012025_01_01_2025"] + ["parquet012025_02_01_2025"] * 2
+
+
+def test_process_parquet_batch_parses_text_pickup():
+    batch = pa.record_batch({"lpep_pickup_datetime": ["2025-01-03 10:00:00", "bukan tanggal"]})
+
+    table, days = splitter.process_parquet_batch(batch, "lpep_pickup_datetime", "p_")
+
+    assert table.num_rows == 1
+    assert days == [("2025-01-03", "p_03_01_2025", 0, 1)]
+
+
+def test_compact_targets_is_decided_for_the_whole_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "COMPACT_FLOAT32", True)
+    path = tmp_path / "yellow_tripdata_2025-01.parquet"
+    pq.write_table(pa.table({
+        "VendorID": pa.array([1, 2, 1, 2], pa.int64()),
+        "passenger_count": pa.array([1.0, 2.0, 1.0, 2.5]),
+        "PULocationID": pa.array([1, 2, 3, 40000], pa.int64()),
+        "fare_amount": [16.42, 7.5, 3.25, 100.1],
+        "total_amount": [16.42, 7.5, 3.25, 16777217.01],
+        "store_and_fwd_flag": ["N", "Y", "N", "N"],
+    }), path, row_group_size=2)
+
+    targets = splitter.compact_targets(ds.dataset(str(path), format="parquet"))
+
+    # nilai pecahan/overflow di row group terakhir membatalkan cast untuk seluruh file
+    assert targets == {
+        "VendorID": pa.int8(),
+        "fare_amount": pa.float32(),
+        "store_and_fwd_flag": pa.dictionary(pa.int32(), pa.string()),
+    }
+
+
+def test_compact_dtypes_gives_every_batch_the_same_schema():
+    targets = {"VendorID": pa.int8(), "store_and_fwd_flag": pa.dictionary(pa.int32(), pa.string())}
+    first = pa.table({"VendorID": pa.array([1, 2], pa.int64()), "store_and_fwd_flag": ["N", "Y"]})
+    second = pa.table({"VendorID": pa.array([2], pa.int64()), "store_and_fwd_flag": ["N"]})
+
+    first, second = splitter.compact_dtypes(first, targets), splitter.compact_dtypes(second, targets)
+
+    assert first.schema == second.schema
+    assert pa.concat_tables([first, second])["VendorID"].to_pylist() == [1, 2, 2]
+
+
+def test_pickup_filter_limits_reads_to_the_file_month(monkeypatch):
+    monkeypatch.setattr(config, "PARQUET_MONTH_FILTER", True)
+    table = pa.table({"tpep_pickup_datetime": pa.array([
+        datetime(2009, 1, 1), datetime(2025, 1, 1), datetime(2025, 1, 31, 23, 59), datetime(2025, 2, 1), None,
+    ], pa.timestamp("us"))})
+
+    expr = splitter.pickup_filter(table.schema, "tpep_pickup_datetime", "yellow_tripdata_2025-01.parquet")
+
+    assert table.filter(expr).num_rows == 2
+
+
+def test_pickup_filter_day_range_and_no_filter(monkeypatch):
+    schema = pa.schema([("tpep_pickup_datetime", pa.timestamp("us"))])
+    monkeypatch.setattr(config, "PARQUET_MONTH_FILTER", False)
+    assert splitter.pickup_filter(schema, "tpep_pickup_datetime", "yellow_tripdata_2025-01.parquet") is None
+
+    monkeypatch.setattr(config, "PARQUET_MONTH_FILTER", True)
+    table = pa.table({"tpep_pickup_datetime": pa.array(
+        [datetime(2025, 1, d) for d in (1, 10, 20, 31)], pa.timestamp("us"))})
+    day_range = (pd.Timestamp("2025-01-10"), pd.Timestamp("2025-02-15"))
+
+    expr = splitter.pickup_filter(table.schema, "tpep_pickup_datetime", "yellow_tripdata_2025-01.parquet", day_range)
+
+    assert table.filter(expr).num_rows == 3